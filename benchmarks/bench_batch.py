@@ -0,0 +1,98 @@
+"""Fetch 200 channels one command at a time vs with ``Client.batch()``.
+
+Run with ``python benchmarks/bench_batch.py`` from a checkout installed with
+``pip install -e .``. The client talks over a socket pair to a stand-in
+server thread that answers every command. After each read it waits
+``latency`` seconds before replying. That stands in for the time Discord
+takes to wake up and handle what it received.
+"""
+
+import json
+import socket
+import struct
+import threading
+import time
+
+from pypresence import Client
+from pypresence.baseclient import _SocketReader, _SocketWriter
+from pypresence.payloads import Payload
+
+CHANNELS = 200
+
+
+def _serve(sock, latency):
+    buf = bytearray()
+    while True:
+        chunk = sock.recv(1 << 16)
+        if not chunk:
+            return
+        buf += chunk
+        if latency:
+            time.sleep(latency)
+        replies = []
+        while len(buf) >= 8:
+            op, length = struct.unpack_from("<II", buf)
+            if len(buf) < 8 + length:
+                break
+            payload = json.loads(buf[8 : 8 + length])
+            del buf[: 8 + length]
+            body = json.dumps(
+                {
+                    "cmd": payload["cmd"],
+                    "evt": None,
+                    "nonce": payload["nonce"],
+                    "data": {"id": payload["args"]["channel_id"], "name": "general"},
+                }
+            ).encode("utf-8")
+            replies.append(struct.pack("<II", 1, len(body)) + body)
+        sock.sendall(b"".join(replies))
+
+
+def _client(latency):
+    ours, theirs = socket.socketpair()
+    threading.Thread(target=_serve, args=(theirs, latency), daemon=True).start()
+    client = Client("0")
+    client.sock_reader = _SocketReader(ours)
+    client.sock_writer = _SocketWriter(ours)
+    return client
+
+
+def serial(client):
+    return [client.get_channel(str(i)) for i in range(CHANNELS)]
+
+
+def batched(client):
+    with client.batch() as batch:
+        for i in range(CHANNELS):
+            batch.add(Payload.get_channel(str(i)))
+    return batch.results
+
+
+def main(rounds: int = 5):
+    for latency in (0.0, 0.0001, 0.001):
+        client = _client(latency)
+        times = {}
+        for name, fetch in (("serial", serial), ("batched", batched)):
+            best = float("inf")
+            for _ in range(rounds):
+                start = time.perf_counter()
+                results = fetch(client)
+                best = min(best, time.perf_counter() - start)
+            assert [r["data"]["id"] for r in results] == [
+                str(i) for i in range(CHANNELS)
+            ]
+            times[name] = best
+        client.sock_writer.close()
+        print(
+            "latency {0:>6.1f} ms: serial {1:8.2f} ms, batched {2:8.2f} ms "
+            "({3:.1f}x)".format(
+                latency * 1000,
+                times["serial"] * 1000,
+                times["batched"] * 1000,
+                times["serial"] / times["batched"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Per-update cost of building a SET_ACTIVITY frame body.
+
+Run with ``python benchmarks/bench_payloads.py`` from a checkout installed with
+``pip install -e .``. Compares building the payload with
+``Payload.set_activity`` and serializing it against rendering a precompiled
+``ActivityTemplate``.
+"""
+
+import time
+import timeit
+
+from pypresence.payloads import ActivityTemplate, Payload
+
+STATIC = dict(
+    name="Toontown",
+    large_image="logo",
+    large_text="Toontown Infinite",
+    small_image="toon",
+    small_text="Level 42",
+    party_id="party-1",
+    party_size=[2, 8],
+    buttons=[
+        {"label": "Website", "url": "https://example.com"},
+        {"label": "Join", "url": "https://example.com/join"},
+    ],
+)
+START = int(time.time())
+TEMPLATE = ActivityTemplate(**STATIC)
+
+
+def build_with_set_activity(i):
+    return Payload.set_activity(
+        state="Playground", details="Building {0}".format(i), start=START, **STATIC
+    ).encode()
+
+
+def build_with_template(i):
+    return TEMPLATE.render(
+        state="Playground", details="Building {0}".format(i), start=START
+    ).encode()
+
+
+def main(number: int = 100_000):
+    for label, func in (
+        ("Payload.set_activity", build_with_set_activity),
+        ("ActivityTemplate.render", build_with_template),
+    ):
+        counter = iter(range(number))
+        seconds = timeit.timeit(lambda: func(next(counter)), number=number)
+        print(
+            "{0:<24} {1:8.2f} us/update ({2} updates)".format(
+                label, seconds / number * 1e6, number
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
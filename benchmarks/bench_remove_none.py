@@ -0,0 +1,164 @@
+"""Compare the old recursive remove_none with the current implementation.
+
+Run with ``python benchmarks/bench_remove_none.py`` from a checkout installed
+with ``pip install -e .``. Covers a shallow dict, a command with its
+``args``, a typical (deep) activity payload and a wide dict, plus building
+the command and the deep payload with ``pruned``.
+"""
+
+import gc
+import time
+import timeit
+
+from pypresence.payloads import Payload
+from pypresence.utils import pruned, remove_none
+
+
+def old_remove_none(d: dict):
+    for item in d.copy():
+        if isinstance(d[item], dict):
+            if len(d[item]):
+                d[item] = old_remove_none(d[item])
+            if not len(d[item]):
+                del d[item]
+        elif d[item] is None:
+            del d[item]
+    return d
+
+
+def shallow():
+    return {
+        "cmd": "SET_ACTIVITY",
+        "state": "Playground",
+        "details": None,
+        "name": "Toontown",
+        "instance": True,
+        "nonce": "1",
+    }
+
+
+def command():
+    # What most Payload classmethods used to build and then prune
+    return {
+        "cmd": "SET_USER_VOICE_SETTINGS",
+        "args": {
+            "user_id": "1",
+            "pan": {"left": None, "right": None},
+            "volume": None,
+            "mute": True,
+        },
+        "nonce": "1",
+    }
+
+
+def deep():
+    # A typical activity payload: few keys, several nested levels
+    return {
+        "cmd": "SET_ACTIVITY",
+        "args": {
+            "pid": 1234,
+            "activity": {
+                "type": 0,
+                "state": "Playground",
+                "details": None,
+                "timestamps": {"start": 1700000000, "end": None},
+                "assets": {
+                    "large_image": "logo",
+                    "large_text": None,
+                    "small_image": None,
+                    "small_text": None,
+                },
+                "party": {"id": None, "size": None},
+                "secrets": {"join": None, "spectate": None, "match": None},
+                "buttons": [{"label": "Website", "url": "https://example.com"}],
+                "instance": True,
+            },
+        },
+        "nonce": "1",
+    }
+
+
+def wide():
+    return {
+        "key{0}".format(i): (None if i % 3 else {"a": i, "b": None})
+        for i in range(200)
+    }
+
+
+def _time_per_call(func, build, number, repeat=5):
+    # Inputs are built up front so only the pruning itself is timed. Best of
+    # several runs, with the GC off, to keep noise down.
+    best = float("inf")
+    for _ in range(repeat):
+        inputs = [build() for _ in range(number)]
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for d in inputs:
+                func(d)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return best / number * 1e6
+
+
+def _deep_pruned():
+    # The deep case built with pruned(), so no remove_none pass is needed
+    return pruned(
+        pid=1234,
+        activity=pruned(
+            type=0,
+            state="Playground",
+            details=None,
+            timestamps=pruned(start=1700000000, end=None),
+            assets=pruned(
+                large_image="logo", large_text=None, small_image=None, small_text=None
+            ),
+            party=pruned(id=None, size=None),
+            secrets=pruned(join=None, spectate=None, match=None),
+            buttons=[{"label": "Website", "url": "https://example.com"}],
+            instance=True,
+        ),
+    )
+
+
+def main(number: int = 5000):
+    cases = (("shallow", shallow), ("command", command), ("deep", deep), ("wide", wide))
+    for name, build in cases:
+        print(
+            "{0:<8} old {1:8.2f} us/call, new {2:8.2f} us/call".format(
+                name,
+                _time_per_call(old_remove_none, build, number),
+                _time_per_call(remove_none, build, number),
+            )
+        )
+
+    command_then_prune = min(
+        timeit.repeat(lambda: remove_none(command()), number=number, repeat=5)
+    )
+    command_pruned = min(
+        timeit.repeat(
+            lambda: Payload.set_user_voice_settings("1", mute=True),
+            number=number,
+            repeat=5,
+        )
+    )
+    print(
+        "command  build + remove_none {0:8.2f} us, Payload (pruned) {1:8.2f} us".format(
+            command_then_prune / number * 1e6, command_pruned / number * 1e6
+        )
+    )
+
+    build_then_prune = min(
+        timeit.repeat(lambda: remove_none(deep()), number=number, repeat=5)
+    )
+    build_pruned = min(timeit.repeat(_deep_pruned, number=number, repeat=5))
+    print(
+        "deep     build + remove_none {0:8.2f} us, built with pruned() {1:8.2f} us".format(
+            build_then_prune / number * 1e6, build_pruned / number * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
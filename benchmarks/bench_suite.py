@@ -0,0 +1,225 @@
+"""End-to-end latency and throughput of Presence and Client, as JSON.
+
+Run with ``python benchmarks/bench_suite.py`` from a checkout installed with
+``pip install -e .``; pass ``--output results.json`` to keep the results and
+``--quick`` for a fast smoke run. Everything that talks to Discord runs
+against :class:`pypresence.fakeserver.FakeDiscordServer`, so it needs a UNIX
+socket but no Discord. Measures:
+
+- ``handshake``: ``Presence.connect()`` from a fresh instance
+- ``update``: ``Presence.update()`` round-trip latency
+- ``throughput``: updates per second, one at a time and threaded
+- ``events``: frames per second through ``Client.on_event``
+- ``payloads``: build and encode cost of every ``Payload`` classmethod
+
+Latencies are in microseconds. Compare two runs to spot regressions between
+releases; only numbers from the same machine are comparable.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import struct
+import time
+import timeit
+
+import pypresence
+from pypresence import Client, Presence
+from pypresence.fakeserver import FakeDiscordServer
+from pypresence.payloads import Payload
+
+CLIENT_ID = "123456789012345678"
+
+PAYLOAD_ARGS = {
+    "set_activity": dict(
+        pid=1234,
+        state="Playground",
+        details="Building",
+        start=1700000000,
+        large_image="logo",
+        large_text="Toontown Infinite",
+        party_size=[2, 8],
+        buttons=[{"label": "Website", "url": "https://example.com"}],
+    ),
+    "authorize": ("1", ["rpc", "identify"]),
+    "authenticate": ("token",),
+    "get_guilds": (),
+    "get_guild": ("1",),
+    "get_channels": ("1",),
+    "get_channel": ("1",),
+    "set_user_voice_settings": ("1", 0.5, 0.5, 100, False),
+    "select_voice_channel": ("1",),
+    "get_selected_voice_channel": (),
+    "select_text_channel": ("1",),
+    "subscribe": ("ACTIVITY_JOIN",),
+    "unsubscribe": ("ACTIVITY_JOIN",),
+    "get_voice_settings": (),
+    "set_voice_settings": dict(mute=True, deaf=False),
+    "capture_shortcut": ("start",),
+    "send_activity_join_invite": ("1",),
+    "close_activity_request": ("1",),
+}
+
+
+def summarize(samples: list) -> dict:
+    """Mean and percentiles of a list of seconds, in microseconds"""
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "mean_us": statistics.fmean(samples) * 1e6,
+        "p50_us": cuts[49] * 1e6,
+        "p90_us": cuts[89] * 1e6,
+        "p99_us": cuts[98] * 1e6,
+        "max_us": samples[-1] * 1e6,
+    }
+
+
+def bench_handshake(rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        RPC = Presence(CLIENT_ID)
+        start = time.perf_counter()
+        RPC.connect()
+        samples.append(time.perf_counter() - start)
+        RPC.close()
+    return summarize(samples)
+
+
+def bench_update(rounds: int) -> dict:
+    RPC = Presence(CLIENT_ID)
+    RPC.connect()
+    samples = []
+    try:
+        for i in range(rounds):
+            start = time.perf_counter()
+            RPC.update(state="Playground", details="Update {0}".format(i))
+            samples.append(time.perf_counter() - start)
+    finally:
+        RPC.close()
+    return summarize(samples)
+
+
+def bench_throughput(rounds: int) -> dict:
+    RPC = Presence(CLIENT_ID)
+    RPC.connect()
+    try:
+        start = time.perf_counter()
+        for i in range(rounds):
+            RPC.update(state="Playground", details="Update {0}".format(i))
+        serial = rounds / (time.perf_counter() - start)
+    finally:
+        RPC.close()
+
+    RPC = Presence(CLIENT_ID, threaded=True, queue_size=rounds)
+    RPC.connect()
+    try:
+        start = time.perf_counter()
+        futures = [
+            RPC.update(state="Playground", details="Update {0}".format(i))
+            for i in range(rounds)
+        ]
+        for future in futures:
+            future.result()
+        threaded = rounds / (time.perf_counter() - start)
+    finally:
+        RPC.close()
+    return {"serial_per_s": serial, "threaded_per_s": threaded}
+
+
+def bench_events(rounds: int) -> dict:
+    frames = []
+    for i in range(rounds):
+        body = json.dumps(
+            {
+                "cmd": "DISPATCH",
+                "evt": "ACTIVITY_JOIN",
+                "data": {"secret": "s{0}".format(i)},
+            }
+        ).encode("utf-8")
+        frames.append(struct.pack("<II", 1, len(body)) + body)
+    stream = b"".join(frames)
+
+    seen = []
+    client = Client(CLIENT_ID)
+    client._events["activity_join"] = seen.append
+
+    start = time.perf_counter()
+    for frame in frames:
+        client.on_event(frame)
+    per_frame = rounds / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    # Many frames per read, split at arbitrary points as a socket would
+    for offset in range(0, len(stream), 4096):
+        client.on_event(stream[offset : offset + 4096])
+    chunked = rounds / (time.perf_counter() - start)
+
+    assert len(seen) == 2 * rounds
+    return {"per_frame_per_s": per_frame, "chunked_per_s": chunked}
+
+
+def bench_payloads(number: int) -> dict:
+    names = sorted(
+        name
+        for name, member in vars(Payload).items()
+        if isinstance(member, classmethod)
+    )
+    missing = set(names) - set(PAYLOAD_ARGS)
+    if missing:
+        raise SystemExit("No benchmark arguments for Payload.{0}".format(missing))
+
+    results = {}
+    for name in names:
+        method = getattr(Payload, name)
+        args, kwargs = PAYLOAD_ARGS[name], {}
+        if isinstance(args, dict):
+            args, kwargs = (), args
+        seconds = min(
+            timeit.repeat(
+                lambda: method(*args, **kwargs).encode(), number=number, repeat=3
+            )
+        )
+        results[name] = {"build_us": seconds / number * 1e6}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds the fake server waits before each reply",
+    )
+    parser.add_argument("--quick", action="store_true", help="fewer rounds")
+    args = parser.parse_args()
+
+    scale = 10 if args.quick else 1
+    results = {
+        "pypresence": pypresence.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "server_latency_s": args.latency,
+    }
+    with FakeDiscordServer(latency=args.latency) as server, server.installed():
+        results["handshake"] = bench_handshake(200 // scale)
+        results["update"] = bench_update(5000 // scale)
+        results["throughput"] = bench_throughput(5000 // scale)
+    results["events"] = bench_events(50_000 // scale)
+    results["payloads"] = bench_payloads(20_000 // scale)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
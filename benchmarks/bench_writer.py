@@ -0,0 +1,63 @@
+"""Compare the old concatenating frame writer with the scatter/gather path.
+
+Run with ``python benchmarks/bench_writer.py`` from a checkout installed with
+``pip install -e .``. Frames are written to one end of a local socket pair
+while a background thread drains the other end.
+"""
+
+import json
+import socket
+import struct
+import threading
+import timeit
+
+from pypresence.baseclient import _SocketWriter
+
+
+def _drain(sock):
+    buf = bytearray(1 << 20)
+    while sock.recv_into(buf):
+        pass
+
+
+def old_write(sock, op, payload_string):
+    data = struct.pack("<II", op, len(payload_string)) + payload_string.encode(
+        "utf-8"
+    )
+    total_sent = 0
+    while total_sent < len(data):
+        sent = sock.send(data[total_sent:])
+        if sent == 0:
+            raise BrokenPipeError()
+        total_sent += sent
+
+
+def new_write(writer, op, payload_string):
+    body = payload_string.encode("utf-8")
+    writer.writev(struct.pack("<II", op, len(body)), body)
+
+
+def main(number: int = 5000):
+    left, right = socket.socketpair()
+    drainer = threading.Thread(target=_drain, args=(right,), daemon=True)
+    drainer.start()
+    writer = _SocketWriter(left)
+
+    for size in (1024, 64 * 1024):
+        # JSON encoding is identical on both paths, so keep it out of the loop
+        payload = json.dumps({"cmd": "SET_ACTIVITY", "args": {"state": "x" * size}})
+        old = timeit.timeit(lambda: old_write(left, 1, payload), number=number)
+        new = timeit.timeit(lambda: new_write(writer, 1, payload), number=number)
+        print(
+            "{0:>6} B payload: old {1:8.2f} us/frame, new {2:8.2f} us/frame".format(
+                size, old / number * 1e6, new / number * 1e6
+            )
+        )
+
+    left.close()
+    drainer.join()
+    right.close()
+
+
+if __name__ == "__main__":
+    main()
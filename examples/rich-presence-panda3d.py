@@ -0,0 +1,22 @@
+from direct.showbase.ShowBase import ShowBase
+
+from pypresence import Presence
+
+client_id = "64567352374564"  # Put your Client ID here, this is a fake ID
+
+base = ShowBase()
+
+# In non-blocking mode update() returns straight away instead of waiting
+# for Discord to answer, so it never holds up a frame.
+RPC = Presence(client_id, nonblocking=True)
+RPC.connect()  # The handshake itself still waits for Discord
+RPC.update(details="In the main menu", state="Idle")
+
+
+def discord_task(task):
+    RPC.poll(budget_ms=1)  # Read any replies/events that are ready, never block
+    return task.cont
+
+
+base.taskMgr.add(discord_task, "discord-rpc")
+base.run()
@@ -4,14 +4,71 @@ Python RPC Client for Discord
 By: qwertyquerty and LewdNeko
 """
 
-from .baseclient import BaseClient
-from .client import AioClient, Client
+import importlib
+from typing import TYPE_CHECKING
+
+from . import exceptions as _exceptions
 from .exceptions import *
-from .presence import AioPresence, Presence
-from .types import ActivityType, StatusDisplayType
+
+if TYPE_CHECKING:
+    from .activity import Activity
+    from .aio import AioClient, AioPresence
+    from .baseclient import BaseClient
+    from .client import Client
+    from .presence import Presence
+    from .scheduler import UpdateScheduler
+    from .stats import StatsRegistry, StatsTracer
+    from .supervisor import ReconnectStats, ReconnectSupervisor
+    from .tracing import FrameTrace, Tracer
+    from .types import ActivityType, StatusDisplayType
 
 __title__ = "pypresence"
 __author__ = "qwertyquerty"
 __copyright__ = "Copyright 2018 - Current qwertyquerty"
 __license__ = "MIT"
 __version__ = "4.7.0-alpha.2"
+
+# Public name -> submodule it lives in. Loaded on first access so that
+# ``import pypresence`` doesn't pay for asyncio, ctypes and friends up front.
+_LAZY = {
+    "Activity": ".activity",
+    "BaseClient": ".baseclient",
+    "Client": ".client",
+    "Presence": ".presence",
+    "AioClient": ".aio",
+    "AioPresence": ".aio",
+    "UpdateScheduler": ".scheduler",
+    "StatsRegistry": ".stats",
+    "StatsTracer": ".stats",
+    "ReconnectStats": ".supervisor",
+    "ReconnectSupervisor": ".supervisor",
+    "FrameTrace": ".tracing",
+    "Tracer": ".tracing",
+    "ActivityType": ".types",
+    "StatusDisplayType": ".types",
+}
+
+
+__all__ = [
+    *_LAZY,
+    *(
+        name
+        for name, value in vars(_exceptions).items()
+        if isinstance(value, type) and issubclass(value, Exception)
+    ),
+]
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,209 @@
+"""An activity as an immutable value.
+
+Build an :class:`Activity` once and pass it to ``update`` (or
+``set_activity``) instead of the keyword arguments; derive the next one
+with the ``with_*`` methods::
+
+    lobby = Activity(name="My Game", large_image="logo", state="In the lobby")
+    RPC.update(activity=lobby)
+    RPC.update(activity=lobby.with_state("In a match").with_timestamps(start))
+
+An activity is turned into JSON once, the first time it is sent or
+compared, and every later send reuses those bytes. Equal activities have
+equal hashes, so checking whether anything changed doesn't walk the dicts.
+"""
+from __future__ import annotations
+
+import json
+import os
+
+from .payloads import Payload, PreparedPayload
+from .types import ActivityType, StatusDisplayType
+
+_FIELDS = (
+    "activity_type",
+    "status_display_type",
+    "state",
+    "state_url",
+    "details",
+    "details_url",
+    "name",
+    "start",
+    "end",
+    "large_image",
+    "large_text",
+    "large_url",
+    "small_image",
+    "small_text",
+    "small_url",
+    "party_id",
+    "party_size",
+    "join",
+    "spectate",
+    "match",
+    "buttons",
+    "instance",
+)
+
+_HEAD = b'{"cmd": "SET_ACTIVITY", "args": {"pid": '
+
+
+class Activity:
+    """What SET_ACTIVITY shows, with the same fields as ``Presence.update``.
+
+    Activities can't be changed once made: ``with_*`` and :meth:`replace`
+    return a new one. ``party_size`` and ``buttons`` are copied, so changing
+    the lists passed in doesn't change the activity.
+    """
+
+    __slots__ = _FIELDS + ("_dict", "_body", "_tail", "_hash")
+
+    def __init__(
+        self,
+        activity_type: ActivityType | int | None = None,
+        status_display_type: StatusDisplayType | int | None = None,
+        state: str | None = None,
+        state_url: str | None = None,
+        details: str | None = None,
+        details_url: str | None = None,
+        name: str | None = None,
+        start: int | float | None = None,
+        end: int | float | None = None,
+        large_image: str | None = None,
+        large_text: str | None = None,
+        large_url: str | None = None,
+        small_image: str | None = None,
+        small_text: str | None = None,
+        small_url: str | None = None,
+        party_id: str | None = None,
+        party_size: list | None = None,
+        join: str | None = None,
+        spectate: str | None = None,
+        match: str | None = None,
+        buttons: list | None = None,
+        instance: bool = True,
+    ):
+        if party_size is not None:
+            party_size = tuple(party_size)
+        if buttons is not None:
+            buttons = tuple(dict(button) for button in buttons)
+        values = locals()
+        for field in _FIELDS:
+            object.__setattr__(self, field, values[field])
+        for cache in ("_dict", "_body", "_tail", "_hash"):
+            object.__setattr__(self, cache, None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Activity is immutable; use replace() or with_*()")
+
+    def __delattr__(self, name):
+        raise AttributeError("Activity is immutable; use replace() or with_*()")
+
+    def replace(self, **changes) -> Activity:
+        """A copy of this activity with the given fields changed"""
+        unknown = set(changes) - set(_FIELDS)
+        if unknown:
+            raise TypeError(
+                "Activity has no field {0}".format(", ".join(sorted(unknown)))
+            )
+        fields = {field: getattr(self, field) for field in _FIELDS}
+        fields.update(changes)
+        return Activity(**fields)
+
+    def with_type(
+        self,
+        activity_type: ActivityType | int | None,
+        status_display_type: StatusDisplayType | int | None = None,
+    ) -> Activity:
+        return self.replace(
+            activity_type=activity_type, status_display_type=status_display_type
+        )
+
+    def with_state(self, state: str | None, url: str | None = None) -> Activity:
+        return self.replace(state=state, state_url=url)
+
+    def with_details(self, details: str | None, url: str | None = None) -> Activity:
+        return self.replace(details=details, details_url=url)
+
+    def with_name(self, name: str | None) -> Activity:
+        return self.replace(name=name)
+
+    def with_timestamps(
+        self, start: int | float | None = None, end: int | float | None = None
+    ) -> Activity:
+        return self.replace(start=start, end=end)
+
+    def with_large_image(
+        self, image: str | None, text: str | None = None, url: str | None = None
+    ) -> Activity:
+        return self.replace(large_image=image, large_text=text, large_url=url)
+
+    def with_small_image(
+        self, image: str | None, text: str | None = None, url: str | None = None
+    ) -> Activity:
+        return self.replace(small_image=image, small_text=text, small_url=url)
+
+    def with_party(self, party_id: str | None, size: list | None = None) -> Activity:
+        return self.replace(party_id=party_id, party_size=size)
+
+    def with_secrets(
+        self,
+        join: str | None = None,
+        spectate: str | None = None,
+        match: str | None = None,
+    ) -> Activity:
+        return self.replace(join=join, spectate=spectate, match=match)
+
+    def with_buttons(self, buttons: list | None) -> Activity:
+        return self.replace(buttons=buttons)
+
+    def to_dict(self) -> dict:
+        """The ``activity`` object sent to Discord; don't modify it"""
+        if self._dict is None:
+            fields = {field: getattr(self, field) for field in _FIELDS}
+            if fields["party_size"] is not None:
+                fields["party_size"] = list(fields["party_size"])
+            if fields["buttons"] is not None:
+                fields["buttons"] = list(fields["buttons"])
+            # Same validation and pruning as the keyword arguments get
+            data = Payload.set_activity(**fields).data["args"]["activity"]
+            object.__setattr__(self, "_dict", data)
+        return self._dict
+
+    def encode(self) -> bytes:
+        """The ``activity`` object as JSON, serialized only once"""
+        if self._body is None:
+            body = json.dumps(self.to_dict()).encode("utf-8")
+            object.__setattr__(self, "_body", body)
+        return self._body
+
+    def payload(self, pid: int = os.getpid()) -> PreparedPayload:
+        """A SET_ACTIVITY command for this activity, reusing its JSON"""
+        if self._tail is None:
+            tail = b', "activity": ' + self.encode() + b'}, "nonce": "'
+            object.__setattr__(self, "_tail", tail)
+        nonce = Payload.nonces.next()
+        encoded = b"".join(
+            (_HEAD, str(int(pid)).encode(), self._tail, nonce.encode(), b'"}')
+        )
+        return PreparedPayload(encoded, nonce)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Activity):
+            return NotImplemented
+        return self.encode() == other.encode()
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self.encode()))
+        return self._hash
+
+    def __repr__(self):
+        fields = (
+            "{0}={1!r}".format(field, getattr(self, field))
+            for field in _FIELDS
+            if getattr(self, field) is not None
+        )
+        return "Activity({0})".format(", ".join(fields))
@@ -0,0 +1,519 @@
+"""asyncio transport, and the :class:`AioPresence` and :class:`AioClient` on it.
+
+Frames are read by an :class:`asyncio.Protocol`, so any number of commands
+can be in flight at once: each one waits on a future keyed by its nonce,
+and the protocol resolves the future when the matching reply arrives.
+Everything else Discord sends is handed to :meth:`AioBaseClient._dispatch_event`.
+
+Nothing else in the package imports this module, so asyncio is only loaded
+once an async class is used.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import os
+import sys
+import time
+from typing import Callable, List
+
+from .activity import Activity
+from .baseclient import BaseClient, PendingRequest, _payload_dict
+from .exceptions import (
+    ArgumentError,
+    ConnectionTimeout,
+    DiscordError,
+    DiscordNotFound,
+    EventNotFound,
+    InvalidArgument,
+    InvalidID,
+    InvalidPipe,
+    PipeClosed,
+    PyPresenceException,
+    ResponseTimeout,
+)
+from .framing import FrameDecoder
+from .payloads import Payload
+from .tracing import FrameTrace, trace_frames
+from .types import ActivityType, StatusDisplayType
+from .utils import get_ipc_socket, invalidate_ipc_path_cache
+
+
+class _FrameProtocol(asyncio.Protocol):
+    """Hands every frame read from the pipe to the client"""
+
+    def __init__(self, client: AioBaseClient):
+        self.client = client
+        self.transport = None
+        self._decoder = FrameDecoder(client.codec)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        self._decoder.feed(data)
+        frames = self._decoder
+        if self.client.tracer is not None:
+            frames = trace_frames(frames, self.client.tracer)
+        for op, payload in frames:
+            self.client._frame_received(payload)
+
+    def connection_lost(self, exc):
+        self.client._connection_lost(exc)
+
+
+class AioBaseClient(BaseClient):
+    """BaseClient whose commands are coroutines running on an asyncio loop"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs, isasync=True)
+        self._transport = None
+        self._protocol = None
+        # nonce -> future for commands awaiting a reply
+        self._futures = {}
+        self._ready = None
+        self._next_frame = None
+        # Running event handler tasks; the loop only keeps weak references
+        self._tasks = set()
+
+    async def handshake(self):
+        loop = asyncio.get_running_loop()
+        self.update_event_loop(loop)
+        transport, protocol = await self._open_transport(loop)
+        self._transport = transport
+        self._protocol = protocol
+        # send_data only needs an object with `write`, which transports have
+        self.sock_writer = transport
+        self._ready = loop.create_future()
+
+        self.send_data(0, {"v": 1, "client_id": self.client_id})
+        try:
+            data = await asyncio.wait_for(self._ready, self.response_timeout)
+        except asyncio.TimeoutError:
+            raise ResponseTimeout
+        self._check_ready(data)
+
+    async def _open_transport(self, loop):
+        ipc_path, sock = get_ipc_socket(self.pipe, parallel=self.parallel_discovery)
+        if not ipc_path:
+            raise DiscordNotFound
+
+        def factory():
+            return _FrameProtocol(self)
+
+        if sys.platform == "win32":
+            connect = loop.create_pipe_connection(factory, ipc_path)
+        elif sock is not None:
+            connect = loop.create_unix_connection(factory, sock=sock)
+        else:
+            connect = loop.create_unix_connection(factory, ipc_path)
+        try:
+            return await asyncio.wait_for(connect, self.connection_timeout)
+        except (FileNotFoundError, ConnectionRefusedError):
+            invalidate_ipc_path_cache(self.pipe)
+            raise InvalidPipe
+        except asyncio.TimeoutError:
+            raise ConnectionTimeout
+
+    @staticmethod
+    def _check_ready(data: dict):
+        # The first frame is READY, or an error refusing the handshake
+        if "code" in data:
+            if data["message"] == "Invalid Client ID":
+                raise InvalidID
+            raise DiscordError(data["code"], data["message"])
+
+    async def _request(
+        self, payload: dict | Payload, op: int = 1, timeout: float | None = None
+    ):
+        """Send a command and wait for the reply with the same nonce.
+
+        Waits ``timeout`` seconds, or ``response_timeout`` if not given.
+        """
+        if isinstance(payload, Payload):
+            nonce = payload.nonce
+        else:
+            nonce = payload.get("nonce")
+        if nonce in self._futures:
+            raise PyPresenceException(
+                "A request with nonce {0} is already in flight".format(nonce)
+            )
+        if self._transport is None or self._transport.is_closing():
+            raise PipeClosed
+        future = self._futures[nonce] = self.loop.create_future()
+        request = None
+        if self.tracer is not None:
+            request = PendingRequest(self, nonce)
+            request.cmd = _payload_dict(payload).get("cmd")
+            request.sent_at = time.monotonic()
+        try:
+            self.send_data(op, payload)
+            if timeout is None:
+                timeout = self.response_timeout
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            error = ResponseTimeout()
+            if request is not None:
+                now = time.monotonic()
+                self.tracer.on_error(
+                    FrameTrace(
+                        cmd=request.cmd,
+                        nonce=nonce,
+                        time=now,
+                        latency=now - request.sent_at,
+                        error=error,
+                    )
+                )
+            raise error
+        finally:
+            self._futures.pop(nonce, None)
+        if request is not None:
+            self._trace_reply(request, response)
+        return self._check_response(response)
+
+    async def read_output(self, timeout: float | None = None):
+        """Wait for the next frame that isn't a reply to a pending command"""
+        if self._next_frame is None or self._next_frame.done():
+            self._next_frame = self.loop.create_future()
+        if timeout is None:
+            return self._check_response(await self._next_frame)
+        try:
+            # Other readers may be waiting on the same frame; don't cancel it
+            payload = await asyncio.wait_for(asyncio.shield(self._next_frame), timeout)
+        except asyncio.TimeoutError:
+            raise ResponseTimeout
+        return self._check_response(payload)
+
+    def _frame_received(self, payload: dict):
+        if self._ready is not None and not self._ready.done():
+            # The first frame is the reply to the handshake
+            self._ready.set_result(payload)
+            return
+        future = self._futures.get(payload.get("nonce"))
+        if future is not None and not future.done():
+            future.set_result(payload)
+        elif self._next_frame is not None and not self._next_frame.done():
+            self._next_frame.set_result(payload)
+        else:
+            self._dispatch_event(payload)
+
+    def _connection_lost(self, exc):
+        self._transport = None
+        waiters = list(self._futures.values())
+        waiters += [self._ready, self._next_frame]
+        for future in waiters:
+            if future is not None and not future.done():
+                future.set_exception(PipeClosed())
+
+    def _report_error(self, error: Exception):
+        # Errors found while reading have no caller to be raised to
+        handler = getattr(self, "handler", None)
+        if handler is None:
+            self.loop.call_exception_handler(
+                {"message": str(error), "exception": error}
+            )
+            return
+        result = handler(error, None)
+        if inspect.isawaitable(result):
+            self._spawn(result)
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def close(self):
+        if self._transport is not None and not self._transport.is_closing():
+            self.send_data(2, {"v": 1, "client_id": self.client_id})
+            self._transport.close()
+        self._transport = None
+
+
+class AioPresence(AioBaseClient):
+
+    async def update(
+        self,
+        pid: int = os.getpid(),
+        activity_type: ActivityType | None = None,
+        status_display_type: StatusDisplayType | None = None,
+        state: str | None = None,
+        state_url: str | None = None,
+        details: str | None = None,
+        details_url: str | None = None,
+        name: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        large_image: str | None = None,
+        large_text: str | None = None,
+        large_url: str | None = None,
+        small_image: str | None = None,
+        small_text: str | None = None,
+        small_url: str | None = None,
+        party_id: str | None = None,
+        party_size: list | None = None,
+        join: str | None = None,
+        spectate: str | None = None,
+        match: str | None = None,
+        buttons: list | None = None,
+        instance: bool = True,
+        timeout: float | None = None,
+        activity: Activity | None = None,
+    ):
+        if activity is not None:
+            return await self._request(activity.payload(pid), timeout=timeout)
+        payload = Payload.set_activity(
+            pid=pid,
+            activity_type=activity_type,
+            status_display_type=status_display_type,
+            state=state,
+            state_url=state_url,
+            details=details,
+            details_url=details_url,
+            name=name,
+            start=start,
+            end=end,
+            large_image=large_image,
+            large_text=large_text,
+            large_url=large_url,
+            small_image=small_image,
+            small_text=small_text,
+            small_url=small_url,
+            party_id=party_id,
+            party_size=party_size,
+            join=join,
+            spectate=spectate,
+            match=match,
+            buttons=buttons,
+            instance=instance,
+            activity=True,
+        )
+        return await self._request(payload, timeout=timeout)
+
+    async def clear(self, pid: int = os.getpid(), timeout: float | None = None):
+        payload = Payload.set_activity(pid, activity=None)
+        return await self._request(payload, timeout=timeout)
+
+    async def connect(self):
+        await self.handshake()
+
+
+class AioClient(AioBaseClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._closed = False
+        self._events = {}
+
+    async def register_event(
+        self, event: str, func: Callable, args=None, timeout: float | None = None
+    ):
+        if args is None:
+            args = {}
+        if not inspect.iscoroutinefunction(func):
+            raise InvalidArgument(
+                "Coroutine", "Subroutine", "Event function must be a coroutine"
+            )
+        elif len(inspect.signature(func).parameters) != 1:
+            raise ArgumentError
+        await self.subscribe(event, args, timeout)
+        self._events[event.lower()] = func
+
+    async def unregister_event(
+        self, event: str, args=None, timeout: float | None = None
+    ):
+        if args is None:
+            args = {}
+        event = event.lower()
+        if event not in self._events:
+            raise EventNotFound(event)
+        await self.unsubscribe(event, args, timeout)
+        del self._events[event]
+
+    def _dispatch_event(self, payload: dict):
+        if payload.get("evt") is not None:
+            evt = payload["evt"].lower()
+            if evt in self._events:
+                self._spawn(self._events[evt](payload["data"]))
+            elif evt == "error":
+                self._report_error(
+                    DiscordError(payload["data"]["code"], payload["data"]["message"])
+                )
+
+    async def authorize(
+        self, client_id: str, scopes: List[str], timeout: float | None = None
+    ):
+        payload = Payload.authorize(client_id, scopes)
+        return await self._request(payload, timeout=timeout)
+
+    async def authenticate(self, token: str, timeout: float | None = None):
+        payload = Payload.authenticate(token)
+        return await self._request(payload, timeout=timeout)
+
+    async def get_guilds(self, timeout: float | None = None):
+        payload = Payload.get_guilds()
+        return await self._request(payload, timeout=timeout)
+
+    async def get_guild(self, guild_id: str, timeout: float | None = None):
+        payload = Payload.get_guild(guild_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def get_channel(self, channel_id: str, timeout: float | None = None):
+        payload = Payload.get_channel(channel_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def get_channels(self, guild_id: str, timeout: float | None = None):
+        payload = Payload.get_channels(guild_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def set_user_voice_settings(
+        self,
+        user_id: str,
+        pan_left: float | None = None,
+        pan_right: float | None = None,
+        volume: int | None = None,
+        mute: bool | None = None,
+        timeout: float | None = None,
+    ):
+        payload = Payload.set_user_voice_settings(
+            user_id, pan_left, pan_right, volume, mute
+        )
+        return await self._request(payload, timeout=timeout)
+
+    async def select_voice_channel(self, channel_id: str, timeout: float | None = None):
+        payload = Payload.select_voice_channel(channel_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def get_selected_voice_channel(self, timeout: float | None = None):
+        payload = Payload.get_selected_voice_channel()
+        return await self._request(payload, timeout=timeout)
+
+    async def select_text_channel(self, channel_id: str, timeout: float | None = None):
+        payload = Payload.select_text_channel(channel_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def set_activity(
+        self,
+        pid: int = os.getpid(),
+        activity_type: ActivityType | None = None,
+        status_display_type: StatusDisplayType | None = None,
+        state: str | None = None,
+        details: str | None = None,
+        name: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        large_image: str | None = None,
+        large_text: str | None = None,
+        small_image: str | None = None,
+        small_text: str | None = None,
+        party_id: str | None = None,
+        party_size: list | None = None,
+        join: str | None = None,
+        spectate: str | None = None,
+        match: str | None = None,
+        buttons: list | None = None,
+        instance: bool = True,
+        timeout: float | None = None,
+        activity: Activity | None = None,
+    ):
+        if activity is not None:
+            return await self._request(activity.payload(pid), timeout=timeout)
+        payload = Payload.set_activity(
+            pid=pid,
+            activity_type=activity_type.value if activity_type else None,
+            status_display_type=(
+                status_display_type.value if status_display_type else None
+            ),
+            state=state,
+            details=details,
+            name=name,
+            start=start,
+            end=end,
+            large_image=large_image,
+            large_text=large_text,
+            small_image=small_image,
+            small_text=small_text,
+            party_id=party_id,
+            party_size=party_size,
+            join=join,
+            spectate=spectate,
+            match=match,
+            buttons=buttons,
+            instance=instance,
+            activity=True,
+        )
+        return await self._request(payload, timeout=timeout)
+
+    async def clear_activity(
+        self, pid: int = os.getpid(), timeout: float | None = None
+    ):
+        payload = Payload.set_activity(pid, activity=None)
+        return await self._request(payload, timeout=timeout)
+
+    async def subscribe(self, event: str, args=None, timeout: float | None = None):
+        if args is None:
+            args = {}
+        payload = Payload.subscribe(event, args)
+        return await self._request(payload, timeout=timeout)
+
+    async def unsubscribe(self, event: str, args=None, timeout: float | None = None):
+        if args is None:
+            args = {}
+        payload = Payload.unsubscribe(event, args)
+        return await self._request(payload, timeout=timeout)
+
+    async def get_voice_settings(self, timeout: float | None = None):
+        payload = Payload.get_voice_settings()
+        return await self._request(payload, timeout=timeout)
+
+    async def set_voice_settings(
+        self,
+        _input: dict | None = None,
+        output: dict | None = None,
+        mode: dict | None = None,
+        automatic_gain_control: bool | None = None,
+        echo_cancellation: bool | None = None,
+        noise_suppression: bool | None = None,
+        qos: bool | None = None,
+        silence_warning: bool | None = None,
+        deaf: bool | None = None,
+        mute: bool | None = None,
+        timeout: float | None = None,
+    ):
+        payload = Payload.set_voice_settings(
+            _input,
+            output,
+            mode,
+            automatic_gain_control,
+            echo_cancellation,
+            noise_suppression,
+            qos,
+            silence_warning,
+            deaf,
+            mute,
+        )
+        return await self._request(payload, timeout=timeout)
+
+    async def capture_shortcut(self, action: str, timeout: float | None = None):
+        payload = Payload.capture_shortcut(action)
+        return await self._request(payload, timeout=timeout)
+
+    async def send_activity_join_invite(
+        self, user_id: str, timeout: float | None = None
+    ):
+        payload = Payload.send_activity_join_invite(user_id)
+        return await self._request(payload, timeout=timeout)
+
+    async def close_activity_request(self, user_id: str, timeout: float | None = None):
+        payload = Payload.close_activity_request(user_id)
+        return await self._request(payload, timeout=timeout)
+
+    def close(self):
+        super().close()
+        self._closed = True
+
+    async def start(self):
+        await self.handshake()
+
+    async def read(self, timeout: float | None = None):
+        return await self.read_output(timeout)
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
-import inspect
-import inspect
-import json
+import heapq
+import itertools
+import selectors
 import struct
 import sys
-import threading
-import ctypes
+import time
 
 # TODO: Get rid of this import * lol
 from .exceptions import (
@@ -21,8 +20,13 @@ from .exceptions import (
     ResponseTimeout,
     ServerError,
 )
+from .codec import get_codec
 from .payloads import Payload
-from .utils import get_event_loop, get_ipc_path
+from .tracing import FrameTrace
+from .utils import get_event_loop, get_ipc_socket, invalidate_ipc_path_cache
+
+# Timed-out nonces remembered per client to drop their late replies
+_MAX_EXPIRED = 1024
 
 
 class BaseClient:
@@ -32,8 +36,13 @@ class BaseClient:
         handler = kwargs.get("handler", None)
         self.pipe = kwargs.get("pipe", None)
         self.isasync = kwargs.get("isasync", False)
+        self.nonblocking = kwargs.get("nonblocking", False)
+        self.parallel_discovery = kwargs.get("parallel_discovery", False)
+        self.codec = get_codec(kwargs.get("codec", "json"))
         self.connection_timeout = kwargs.get("connection_timeout", 30)
         self.response_timeout = kwargs.get("response_timeout", 10)
+        # Optional pypresence.tracing.Tracer told about every frame
+        self.tracer = kwargs.get("tracer", None)
 
         client_id = str(client_id)
 
@@ -46,9 +55,26 @@ class BaseClient:
         self.sock_reader = None
         self.sock_writer = None
 
+        # Requests sent with `send_request` that are still waiting for a
+        # reply, keyed by nonce.
+        self._pending = {}
+        self._selector = None
+        # Min-heap of (deadline, seq, request) for requests with a timeout,
+        # so the next one to expire is always at the top. Entries for
+        # requests that were answered in time are dropped lazily.
+        self._deadlines = []
+        self._deadline_seq = itertools.count()
+        # Nonces of requests that timed out, so their late replies aren't
+        # mistaken for events. A dict for its insertion order: past
+        # _MAX_EXPIRED the oldest are forgotten, as their replies may
+        # never come.
+        self._expired = {}
+
         self.client_id = client_id
 
         if handler is not None:
+            import inspect
+
             if not inspect.isfunction(handler):
                 raise PyPresenceException("Error handler must be a function.")
             args = inspect.getfullargspec(handler).args
@@ -107,30 +133,390 @@ class BaseClient:
                 "Async handler provided but no event loop is available.",
             )
 
-    def read_output(self):
+    def read_output(self, nonce: str | None = None, timeout: float | None = None):
+        """Read a reply from the pipe.
+
+        Without a nonce this returns the next frame, whatever it is, waiting
+        at most ``timeout`` seconds if given. With a nonce, frames are read
+        until the reply to that request arrives; anything else read in the
+        meantime is handed to the request waiting on it or to the event
+        dispatcher. Raises :class:`ResponseTimeout` if the request's deadline
+        passes first.
+        """
+        if nonce is None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            payload = self._read_payload(deadline)
+            if payload is None:
+                raise ResponseTimeout
+            return self._check_response(payload)
+
+        request = self._pending.get(nonce)
+        if request is None:
+            request = self._pending[nonce] = PendingRequest(self, nonce)
+            self._arm(request, timeout)
+        while not request.done():
+            # Wake up for whichever deadline comes first, even if it's
+            # another request's, so everything overdue expires on time
+            deadline = self._deadlines[0][0] if self._deadlines else None
+            payload = self._read_payload(deadline)
+            if payload is not None:
+                self._route(payload)
+            self._expire_requests()
+        return request.result()
+
+    def _read_payload(self, deadline: float | None = None) -> dict | None:
+        # Returns None if ``deadline`` (a time.monotonic() value) passes
+        # before a whole frame is in. Only our own socket reader can wait
+        # with a deadline; other readers block until the frame arrives.
+        reader = self.sock_reader
         try:
-            preamble = self.sock_reader.read(8)
-            status_code, length = struct.unpack("<II", preamble[:8])
-            data = self.sock_reader.read(length)
-        except (BrokenPipeError, struct.error):
-            raise PipeClosed
-        payload = json.loads(data.decode("utf-8"))
+            if deadline is None or not isinstance(reader, _SocketReader):
+                preamble = reader.read(8)
+                op, length = struct.unpack("<II", preamble[:8])
+                data = reader.read(length)
+            else:
+                frame = reader.read_frame()
+                while frame is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._readable(remaining):
+                        return None
+                    reader.fill()
+                    frame = reader.read_frame()
+                op, data = frame
+        except (BrokenPipeError, ConnectionResetError, struct.error):
+            raise self._pipe_closed()
+        if self.tracer is not None:
+            return self._decode_traced(op, data)
+        return self.codec.loads(data)
+
+    def _decode_traced(self, op: int, data) -> dict:
+        start = time.monotonic()
+        payload = self.codec.loads(data)
+        end = time.monotonic()
+        self.tracer.on_frame(
+            FrameTrace(
+                op,
+                payload.get("cmd"),
+                payload.get("evt"),
+                payload.get("nonce"),
+                8 + len(data),
+                end,
+                decode_time=end - start,
+            )
+        )
+        return payload
+
+    def _trace_reply(self, request: PendingRequest, payload: dict):
+        # on_response for every reply, and on_error as well for ERROR ones
+        now = time.monotonic()
+        trace = FrameTrace(
+            cmd=payload.get("cmd") or request.cmd,
+            evt=payload.get("evt"),
+            nonce=request.nonce,
+            time=now,
+            latency=None if request.sent_at is None else now - request.sent_at,
+        )
+        self.tracer.on_response(trace)
+        if payload.get("evt") == "ERROR":
+            trace.error = ServerError(payload["data"]["message"])
+            self.tracer.on_error(trace)
+
+    def _pipe_closed(self) -> PipeClosed:
+        error = PipeClosed()
+        if self.tracer is not None:
+            self.tracer.on_error(FrameTrace(time=time.monotonic(), error=error))
+        return error
+
+    def _readable(self, timeout: float) -> bool:
+        if self._selector is None:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self.sock_reader, selectors.EVENT_READ)
+        return bool(self._selector.select(timeout))
+
+    def _arm(self, request: PendingRequest, timeout: float | None):
+        # Give a request its deadline: ``timeout`` seconds from now, or
+        # ``response_timeout`` if not given; None for either means no limit
+        if timeout is None:
+            timeout = self.response_timeout
+        if timeout is None or request.nonce is None:
+            return
+        request.deadline = time.monotonic() + timeout
+        heap = self._deadlines
+        if len(heap) > 2 * len(self._pending) + 64:
+            # Mostly answered requests; rebuild rather than let it grow
+            heap[:] = [entry for entry in heap if not entry[2].done()]
+            heapq.heapify(heap)
+        heapq.heappush(heap, (request.deadline, next(self._deadline_seq), request))
+
+    def _expire_requests(self):
+        """Time out every pending request whose deadline has passed"""
+        heap = self._deadlines
+        now = time.monotonic()
+        while heap and heap[0][0] <= now:
+            request = heapq.heappop(heap)[2]
+            if request.done():
+                continue
+            request._expired = True
+            if self._pending.get(request.nonce) is request:
+                del self._pending[request.nonce]
+                self._remember_expired(request.nonce)
+            if self.tracer is not None:
+                self.tracer.on_error(
+                    FrameTrace(
+                        cmd=request.cmd,
+                        nonce=request.nonce,
+                        time=now,
+                        latency=(
+                            None if request.sent_at is None else now - request.sent_at
+                        ),
+                        error=ResponseTimeout(),
+                    )
+                )
+
+    def _remember_expired(self, nonce: str):
+        expired = self._expired
+        expired[nonce] = None
+        if len(expired) > _MAX_EXPIRED:
+            del expired[next(iter(expired))]
+
+    def next_deadline(self) -> float | None:
+        """Seconds until the next pending request times out, or None"""
+        heap = self._deadlines
+        while heap and heap[0][2].done():
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return max(0.0, heap[0][0] - time.monotonic())
+
+    @staticmethod
+    def _check_response(payload: dict) -> dict:
         if payload["evt"] == "ERROR":
             raise ServerError(payload["data"]["message"])
         return payload
 
+    def _route(self, payload: dict):
+        nonce = payload.get("nonce")
+        request = self._pending.pop(nonce, None)
+        if request is not None:
+            request._response = payload
+            if self.tracer is not None:
+                self._trace_reply(request, payload)
+        elif nonce in self._expired:
+            # The caller already got ResponseTimeout
+            del self._expired[nonce]
+        else:
+            self._dispatch_event(payload)
+
+    def _dispatch_event(self, payload: dict):
+        # Frames that don't answer a pending request end up here. Clients
+        # that handle events override this.
+        pass
+
+    def poll(self, max_frames: int | None = None, budget_ms: float | None = None):
+        """Process whatever frames are ready on the pipe without blocking.
+
+        Replies complete their pending requests and events are dispatched;
+        requests whose deadline has passed are timed out.
+        Returns as soon as the socket has nothing more to read, ``max_frames``
+        frames have been handled or ``budget_ms`` milliseconds have passed,
+        so it can be called once per frame, e.g. from a Panda3D task::
+
+            def discord_task(task):
+                RPC.poll(budget_ms=1)
+                return task.cont
+
+            taskMgr.add(discord_task, "discord-rpc")
+
+        Returns the number of frames handled.
+        """
+        deadline = None
+        if budget_ms is not None:
+            deadline = time.monotonic() + budget_ms / 1000
+        handled = 0
+        while max_frames is None or handled < max_frames:
+            frame = self.sock_reader.read_frame()
+            if frame is None:
+                if not self._readable(0):
+                    break
+                try:
+                    self.sock_reader.fill()
+                except (BrokenPipeError, ConnectionResetError):
+                    raise self._pipe_closed()
+                continue
+            op, data = frame
+            if self.tracer is not None:
+                self._route(self._decode_traced(op, data))
+            else:
+                self._route(self.codec.loads(data))
+            handled += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        self._expire_requests()
+        return handled
+
+    def _command(
+        self, payload: dict | Payload, op: int = 1, timeout: float | None = None
+    ):
+        # Waits for the reply, unless the client is non-blocking, in which
+        # case the reply is picked up later by `poll`.
+        request = self.send_request(op, payload, timeout)
+        if self.nonblocking:
+            return request
+        return request.result()
+
+    def send_request(
+        self, op: int, payload: dict | Payload, timeout: float | None = None
+    ) -> PendingRequest:
+        """Send a command without waiting for its reply.
+
+        Returns a :class:`PendingRequest` whose ``result()`` gives the reply.
+        Several requests can be in flight at once; replies are matched to
+        them by the payload's nonce. Unless the reply arrives within
+        ``timeout`` seconds (``response_timeout`` by default), ``result()``
+        raises :class:`ResponseTimeout`.
+        """
+        nonce = payload.nonce if isinstance(payload, Payload) else payload.get("nonce")
+        request = self._register(nonce)
+        if self.tracer is not None:
+            request.cmd = _payload_dict(payload).get("cmd")
+            request.sent_at = time.monotonic()
+        try:
+            self.send_data(op, payload)
+        except BaseException:
+            self._pending.pop(nonce, None)
+            raise
+        self._arm(request, timeout)
+        return request
+
+    def send_batch(
+        self, payloads, op: int = 1, timeout: float | None = None
+    ) -> list[PendingRequest]:
+        """Send several commands in a single write without waiting for replies.
+
+        Returns a :class:`PendingRequest` per payload, in the same order.
+        """
+        requests = []
+        encode_times = None if self.tracer is None else []
+        try:
+            frames = self._frame_batch(payloads, op, requests, encode_times)
+            start = time.monotonic()
+            self._write_batch(frames)
+        except BaseException:
+            for request in requests:
+                self._pending.pop(request.nonce, None)
+            raise
+        if encode_times is not None:
+            self._trace_batch(op, requests, frames, encode_times, start)
+        for request in requests:
+            self._arm(request, timeout)
+        return requests
+
+    def _frame_batch(self, payloads, op: int, requests: list, encode_times):
+        # Encodes and frames every payload, adding a request for each to
+        # ``requests`` and, when tracing, its encode time to ``encode_times``
+        frames = []
+        for payload in payloads:
+            start = None if encode_times is None else time.monotonic()
+            nonce, body = self._encode(payload)
+            request = self._register(nonce)
+            requests.append(request)
+            frames.append(struct.pack("<II", op, len(body)))
+            frames.append(body)
+            if start is not None:
+                encode_times.append(time.monotonic() - start)
+                request.cmd = _payload_dict(payload).get("cmd")
+        return frames
+
+    def _write_batch(self, frames: list):
+        assert (
+            self.sock_writer is not None
+        ), "You must connect your client before sending events!"
+        try:
+            self.sock_writer.write(b"".join(frames))
+        except (BrokenPipeError, ConnectionResetError):
+            raise self._pipe_closed()
+
+    def _trace_batch(
+        self, op: int, requests: list, frames: list, encode_times: list, start: float
+    ):
+        # The whole batch went out in one write, so every frame shares its time
+        end = time.monotonic()
+        for request, body, encode_time in zip(requests, frames[1::2], encode_times):
+            request.sent_at = start
+            self.tracer.on_send(
+                FrameTrace(
+                    op,
+                    request.cmd,
+                    nonce=request.nonce,
+                    size=8 + len(body),
+                    time=end,
+                    encode_time=encode_time,
+                    write_time=end - start,
+                )
+            )
+
+    def _encode(self, payload: dict | Payload) -> tuple:
+        if isinstance(payload, Payload):
+            return payload.nonce, payload.encode(self.codec)
+        return payload.get("nonce"), self.codec.dumps(payload)
+
+    def _register(self, nonce: str | None) -> PendingRequest:
+        # A request waiting for the reply with this nonce
+        request = PendingRequest(self, nonce)
+        if nonce is not None:
+            if nonce in self._pending:
+                raise PyPresenceException(
+                    "A request with nonce {0} is already in flight".format(nonce)
+                )
+            self._pending[nonce] = request
+        return request
+
     def send_data(self, op: int, payload: dict | Payload):
+        if self.tracer is not None:
+            return self._send_traced(op, payload)
+        if isinstance(payload, Payload):
+            body = payload.encode(self.codec)
+        else:
+            body = self.codec.dumps(payload)
+        self._write_frame(op, body)
+
+    def _send_traced(self, op: int, payload: dict | Payload):
+        start = time.monotonic()
         if isinstance(payload, Payload):
-            payload = payload.data
-        payload_string = json.dumps(payload)
+            body = payload.encode(self.codec)
+        else:
+            body = self.codec.dumps(payload)
+        encoded = time.monotonic()
+        self._write_frame(op, body)
+        end = time.monotonic()
+        data = _payload_dict(payload)
+        self.tracer.on_send(
+            FrameTrace(
+                op,
+                data.get("cmd"),
+                data.get("evt"),
+                data.get("nonce"),
+                8 + len(body),
+                end,
+                encode_time=encoded - start,
+                write_time=end - encoded,
+            )
+        )
 
+    def _write_frame(self, op: int, body: bytes):
         assert (
             self.sock_writer is not None
         ), "You must connect your client before sending events!"
 
-        self.sock_writer.write(
-            struct.pack("<II", op, len(payload_string)) + payload_string.encode("utf-8")
-        )
+        header = struct.pack("<II", op, len(body))
+        try:
+            if isinstance(self.sock_writer, _SocketWriter):
+                self.sock_writer.writev(header, body)
+            else:
+                # Custom writers only have to implement ``write``
+                self.sock_writer.write(header + body)
+        except (BrokenPipeError, ConnectionResetError):
+            raise self._pipe_closed()
 
     def create_reader_writer(self, ipc_path):
         try:
@@ -140,18 +526,27 @@ class BaseClient:
 
                 client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
                 client.settimeout(self.connection_timeout)
-                client.connect(ipc_path)
+                try:
+                    client.connect(ipc_path)
+                except OSError:
+                    client.close()
+                    raise
                 # Wrap socket with simple reader/writer objects
                 self.sock_reader = _SocketReader(client)
                 self.sock_writer = _SocketWriter(client)
             elif sys.platform == "win32":
                 self.sock_reader, self.sock_writer = self._create_named_pipe(ipc_path)
-        except FileNotFoundError:
+        except (FileNotFoundError, ConnectionRefusedError):
+            # Don't hand out the same dead path on the next attempt
+            invalidate_ipc_path_cache(self.pipe)
             raise InvalidPipe
         except socket.timeout:
             raise ConnectionTimeout
         
     def _create_named_pipe(self, ipc_path):
+        import ctypes
+        import threading
+
         pipe_name = r'\\.\pipe\{}'.format(ipc_path)
         try:
             # Create the named pipe
@@ -177,21 +572,38 @@ class BaseClient:
             raise InvalidPipe from e
 
     def _wait_for_client(self, handle):
+        import ctypes
+
         ctypes.windll.kernel32.ConnectNamedPipe(handle, None)
         
     def handshake(self):
-        ipc_path = get_ipc_path(self.pipe)
+        ipc_path, sock = get_ipc_socket(
+            self.pipe, parallel=self.parallel_discovery
+        )
         if not ipc_path:
             raise DiscordNotFound
 
-        self.create_reader_writer(ipc_path)
+        if sock is not None:
+            # Reuse the connection discovery made instead of connecting again
+            sock.settimeout(self.connection_timeout)
+            self.sock_reader = _SocketReader(sock)
+            self.sock_writer = _SocketWriter(sock)
+        else:
+            self.create_reader_writer(ipc_path)
+        # Anything tied to a previous connection is stale now
+        self._pending.clear()
+        self._deadlines.clear()
+        self._expired.clear()
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
 
         self.send_data(0, {"v": 1, "client_id": self.client_id})
         preamble = self.sock_reader.read(8)
         if len(preamble) < 8:
             raise InvalidPipe
         code, length = struct.unpack("<ii", preamble)
-        data = json.loads(self.sock_reader.read(length))
+        data = self.codec.loads(self.sock_reader.read(length))
         if "code" in data:
             if data["message"] == "Invalid Client ID":
                 raise InvalidID
@@ -201,18 +613,138 @@ class BaseClient:
             self.sock_reader.feed_data = self.on_event
 
 
+class PendingRequest:
+    """Handle for a command sent with :meth:`BaseClient.send_request`."""
+
+    __slots__ = (
+        "client",
+        "nonce",
+        "deadline",
+        "cmd",
+        "sent_at",
+        "_response",
+        "_expired",
+    )
+
+    def __init__(self, client: BaseClient, nonce: str | None):
+        self.client = client
+        self.nonce = nonce
+        # time.monotonic() by which the reply must arrive, if limited
+        self.deadline = None
+        # Only filled in when the client has a tracer
+        self.cmd = None
+        self.sent_at = None
+        self._response = None
+        self._expired = False
+
+    def done(self) -> bool:
+        """Whether the reply has been read off the pipe or timed out"""
+        return self._response is not None or self._expired
+
+    def failed(self) -> bool:
+        """Whether the request timed out or was answered with an error"""
+        if self._expired:
+            return True
+        return self._response is not None and self._response["evt"] == "ERROR"
+
+    def result(self):
+        """Return the reply, reading from the pipe until it arrives.
+
+        Raises :class:`ResponseTimeout` if the deadline passed first.
+        """
+        if self._expired:
+            raise ResponseTimeout
+        if self._response is None:
+            return self.client.read_output(self.nonce)
+        return self.client._check_response(self._response)
+
+
+def _payload_dict(payload: dict | Payload) -> dict:
+    return payload.data if isinstance(payload, Payload) else payload
+
+
 class _SocketReader:
-    def __init__(self, sock):
-        self._sock = sock
+    """Buffered reader over a connected socket.
+
+    Incoming bytes are received straight into a reusable ``bytearray`` with
+    ``recv_into``, pulling as much as the kernel has ready in one call, so a
+    preamble and its body usually arrive in a single syscall. :meth:`read`
+    hands out ``memoryview`` slices of that buffer instead of copies; a view
+    is only valid until the next call to :meth:`read`.
+    """
 
-    def read(self, n: int) -> bytes:
-        data = b""
-        while len(data) < n:
-            chunk = self._sock.recv(n - len(data))
-            if not chunk:
+    def __init__(self, sock, bufsize: int = 64 * 1024):
+        self._sock = sock
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def _reserve(self, n: int):
+        # Make room for ``n`` more bytes after the unread data, sliding it
+        # back to the front of the buffer or growing the buffer if needed.
+        if self._end + n <= len(self._buf):
+            return
+        pending = self._end - self._start
+        if pending + n <= len(self._buf):
+            self._view[:pending] = self._view[self._start : self._end]
+        else:
+            size = len(self._buf)
+            while size < pending + n:
+                size *= 2
+            buf = bytearray(size)
+            buf[:pending] = self._view[self._start : self._end]
+            self._buf = buf
+            self._view = memoryview(buf)
+        self._start = 0
+        self._end = pending
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def fill(self) -> int:
+        """Receive once into the buffer, returning the number of bytes read.
+
+        Blocks if nothing is ready, so callers that must not block should
+        check the socket is readable first.
+        """
+        pending = self._end - self._start
+        needed = 8
+        if pending >= 8:
+            needed += struct.unpack_from("<II", self._buf, self._start)[1]
+        self._reserve(max(needed - pending, 4096))
+        received = self._sock.recv_into(self._view[self._end :])
+        if not received:
+            raise BrokenPipeError()
+        self._end += received
+        return received
+
+    def read_frame(self) -> tuple[int, memoryview] | None:
+        """Return ``(op, body)`` for the next fully buffered frame, if any"""
+        pending = self._end - self._start
+        if pending < 8:
+            return None
+        op, length = struct.unpack_from("<II", self._buf, self._start)
+        if pending < 8 + length:
+            return None
+        start = self._start + 8
+        self._start = start + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return op, self._view[start : start + length]
+
+    def read(self, n: int) -> memoryview:
+        while self._end - self._start < n:
+            self._reserve(n - (self._end - self._start))
+            received = self._sock.recv_into(self._view[self._end :])
+            if not received:
                 raise BrokenPipeError()
-            data += chunk
-        return data
+            self._end += received
+        start = self._start
+        self._start += n
+        if self._start == self._end:
+            self._start = self._end = 0
+        return self._view[start : start + n]
 
 
 class _SocketWriter:
@@ -220,12 +752,40 @@ class _SocketWriter:
         self._sock = sock
 
     def write(self, data: bytes):
-        total_sent = 0
-        while total_sent < len(data):
-            sent = self._sock.send(data[total_sent:])
+        view = memoryview(data)
+        while view:
+            sent = self._sock.send(view)
+            if sent == 0:
+                raise BrokenPipeError()
+            view = view[sent:]
+
+    def writev(self, *buffers: bytes):
+        """Write several buffers as one, using scatter/gather I/O if possible.
+
+        With ``sendmsg`` the frame header and body go out in one syscall
+        without being joined first; partial sends resume from memoryview
+        offsets rather than re-slicing the remaining bytes.
+        """
+        sendmsg = getattr(self._sock, "sendmsg", None)
+        if sendmsg is None:
+            self.write(b"".join(buffers))
+            return
+        views = None
+        while True:
+            sent = sendmsg(buffers if views is None else views)
             if sent == 0:
                 raise BrokenPipeError()
-            total_sent += sent
+            if views is None:
+                # Common case: everything went out in the first call
+                if sent == sum(map(len, buffers)):
+                    return
+                views = [memoryview(buf) for buf in buffers if len(buf)]
+            while views and sent >= len(views[0]):
+                sent -= len(views.pop(0))
+            if not views:
+                return
+            if sent:
+                views[0] = views[0][sent:]
 
     def close(self):
         try:
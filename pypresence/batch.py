@@ -0,0 +1,82 @@
+"""Pipelining many commands over one write.
+
+Fetching a guild's channels one ``get_channel`` at a time costs a full
+round-trip per channel. A batch writes every command at once and then
+reads the replies as they stream back.
+"""
+from __future__ import annotations
+
+import json
+
+from .exceptions import ResponseTimeout, ServerError
+from .payloads import Payload, PreparedPayload
+
+
+class Batch:
+    """Commands collected by :meth:`Client.batch` and sent when it exits.
+
+    Use it as a context manager and :meth:`add` payloads inside it::
+
+        with client.batch() as batch:
+            for channel_id in channel_ids:
+                batch.add(Payload.get_channel(channel_id))
+        channels = batch.results
+
+    On exit all the commands go out in a single socket write and the replies
+    are collected by nonce. ``results`` holds them in the order the payloads
+    were added; a command Discord answered with an error gets its
+    :class:`ServerError` in its place instead, so one bad ID doesn't throw
+    away every other reply. Likewise a reply that doesn't arrive within
+    ``timeout`` gets a :class:`ResponseTimeout`.
+    """
+
+    def __init__(self, client, op: int = 1, timeout: float | None = None):
+        self.client = client
+        self.op = op
+        self.timeout = timeout
+        self.results = None
+        self._payloads = []
+        self._nonces = set()
+
+    def add(self, payload: dict | Payload):
+        """Queue a command; nothing is sent until the batch exits"""
+        nonce = payload.nonce if isinstance(payload, Payload) else payload.get("nonce")
+        if nonce in self._nonces:
+            # Hand-built payloads may reuse a nonce
+            nonce = "{0}.{1}".format(nonce, len(self._payloads))
+            if isinstance(payload, PreparedPayload):
+                # Its bytes were encoded with the old nonce; encode new ones
+                data = dict(payload.data, nonce=nonce)
+                payload = PreparedPayload(json.dumps(data).encode("utf-8"), nonce)
+            elif isinstance(payload, Payload):
+                payload.data["nonce"] = nonce
+            else:
+                payload["nonce"] = nonce
+        self._nonces.add(nonce)
+        self._payloads.append(payload)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return False
+        self.results = self.send()
+        return False
+
+    def send(self) -> list:
+        """Send the queued commands now and return their replies"""
+        payloads, self._payloads = self._payloads, []
+        self._nonces = set()
+        if not payloads:
+            return []
+        results = []
+        for request in self.client.send_batch(payloads, self.op, self.timeout):
+            try:
+                results.append(request.result())
+            except (ServerError, ResponseTimeout) as e:
+                results.append(e)
+        return results
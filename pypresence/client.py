@@ -1,21 +1,20 @@
 from __future__ import annotations
 
-import asyncio
-import inspect
-import json
 import os
-import struct
 from typing import Callable, List
 
+from .activity import Activity
 from .baseclient import BaseClient
+from .batch import Batch
+from .dispatcher import EventDispatcher
 from .exceptions import (
     ArgumentError,
     DiscordError,
     EventNotFound,
-    InvalidArgument,
-    PyPresenceException,
 )
+from .framing import FrameDecoder
 from .payloads import Payload
+from .tracing import trace_frames
 from .types import ActivityType, StatusDisplayType
 
 
@@ -24,92 +23,101 @@ class Client(BaseClient):
         super().__init__(*args, **kwargs)
         self._closed = False
         self._events = {}
+        # Subscription args per event, so they can be replayed on reconnect
+        self._event_args = {}
+        self._decoder = None
+        # Handlers run inline on the reading thread unless an executor is given
+        self._dispatcher = None
+        executor = kwargs.get("event_executor", None)
+        if executor is not None:
+            self._dispatcher = EventDispatcher(
+                executor,
+                kwargs.get("event_queue_size", 100),
+                kwargs.get("event_queue_policy", "drop"),
+            )
+
+    def register_event(
+        self, event: str, func: Callable, args=None, timeout: float | None = None
+    ):
+        # inspect is slow to import and only needed here
+        import inspect
 
-    def register_event(self, event: str, func: Callable, args=None):
         if args is None:
             args = {}
         if inspect.iscoroutinefunction(func):
             raise NotImplementedError
         elif len(inspect.signature(func).parameters) != 1:
             raise ArgumentError
-        self.subscribe(event, args)
+        self.subscribe(event, args, timeout)
         self._events[event.lower()] = func
+        self._event_args[event.lower()] = args
 
-    def unregister_event(self, event: str, args=None):
+    def unregister_event(self, event: str, args=None, timeout: float | None = None):
         if args is None:
             args = {}
         event = event.lower()
         if event not in self._events:
             raise EventNotFound(event)
-        self.unsubscribe(event, args)
+        self.unsubscribe(event, args, timeout)
         del self._events[event]
+        self._event_args.pop(event, None)
 
-    # noinspection PyProtectedMember
     def on_event(self, data):
-        if self.sock_reader._eof:
-            raise PyPresenceException("feed_data after feed_eof")
-        if not data:
-            return
-        self.sock_reader._buffer.extend(data)
-        self.sock_reader._wakeup_waiter()
-        if (
-            self.sock_reader._transport is not None
-            and not self.sock_reader._paused
-            and len(self.sock_reader._buffer) > 2 * self.sock_reader._limit
-        ):
-            try:
-                self.sock_reader._transport.pause_reading()
-            except NotImplementedError:
-                self.sock_reader._transport = None
-            else:
-                self.sock_reader._paused = True
-
-        end = 0
-        while end < len(data):
-            # While chunks are available in data
-            start = end + 8
-            status_code, length = struct.unpack("<II", data[end:start])
-            end = length + start
-            payload = json.loads(data[start:end].decode("utf-8"))
-
-            if payload["evt"] is not None:
-                evt = payload["evt"].lower()
-                if evt in self._events:
+        """Handle a chunk of bytes read from the pipe.
+
+        Chunks don't have to line up with frames; a partial frame is kept
+        until the rest of it arrives.
+        """
+        if self._decoder is None:
+            self._decoder = FrameDecoder(self.codec)
+        self._decoder.feed(data)
+        frames = self._decoder
+        if self.tracer is not None:
+            frames = trace_frames(frames, self.tracer)
+        for op, payload in frames:
+            self._route(payload)
+
+    @property
+    def event_stats(self) -> dict:
+        """:class:`EventStats` per event type, when using an event executor"""
+        return {} if self._dispatcher is None else self._dispatcher.stats
+
+    def _dispatch_event(self, payload: dict):
+        if payload.get("evt") is not None:
+            evt = payload["evt"].lower()
+            if evt in self._events:
+                if self._dispatcher is None:
                     self._events[evt](payload["data"])
-                elif evt == "error":
-                    raise DiscordError(
-                        payload["data"]["code"], payload["data"]["message"]
-                    )
+                else:
+                    self._dispatcher.dispatch(evt, self._events[evt], payload["data"])
+            elif evt == "error":
+                raise DiscordError(payload["data"]["code"], payload["data"]["message"])
 
-    def authorize(self, client_id: str, scopes: List[str]):
+    def authorize(
+        self, client_id: str, scopes: List[str], timeout: float | None = None
+    ):
         payload = Payload.authorize(client_id, scopes)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def authenticate(self, token: str):
+    def authenticate(self, token: str, timeout: float | None = None):
         payload = Payload.authenticate(token)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_guilds(self):
+    def get_guilds(self, timeout: float | None = None):
         payload = Payload.get_guilds()
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_guild(self, guild_id: str):
+    def get_guild(self, guild_id: str, timeout: float | None = None):
         payload = Payload.get_guild(guild_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_channel(self, channel_id: str):
+    def get_channel(self, channel_id: str, timeout: float | None = None):
         payload = Payload.get_channel(channel_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_channels(self, guild_id: str):
+    def get_channels(self, guild_id: str, timeout: float | None = None):
         payload = Payload.get_channels(guild_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
     def set_user_voice_settings(
         self,
@@ -118,27 +126,24 @@ class Client(BaseClient):
         pan_right: float | None = None,
         volume: int | None = None,
         mute: bool | None = None,
+        timeout: float | None = None,
     ):
         payload = Payload.set_user_voice_settings(
             user_id, pan_left, pan_right, volume, mute
         )
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def select_voice_channel(self, channel_id: str):
+    def select_voice_channel(self, channel_id: str, timeout: float | None = None):
         payload = Payload.select_voice_channel(channel_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_selected_voice_channel(self):
+    def get_selected_voice_channel(self, timeout: float | None = None):
         payload = Payload.get_selected_voice_channel()
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def select_text_channel(self, channel_id: str):
+    def select_text_channel(self, channel_id: str, timeout: float | None = None):
         payload = Payload.select_text_channel(channel_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
     def set_activity(
         self,
@@ -166,8 +171,12 @@ class Client(BaseClient):
         buttons: list | None = None,
         instance: bool = True,
         payload_override: dict | None = None,
+        timeout: float | None = None,
+        activity: Activity | None = None,
     ):
-        if payload_override is None:
+        if activity is not None:
+            payload = activity.payload(pid)
+        elif payload_override is None:
             payload = Payload.set_activity(
                 pid=pid,
                 activity_type=activity_type.value if activity_type else None,
@@ -197,33 +206,27 @@ class Client(BaseClient):
             )
         else:
             payload = payload_override
+        return self._command(payload, timeout=timeout)
 
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
-
-    def clear_activity(self, pid: int = os.getpid()):
+    def clear_activity(self, pid: int = os.getpid(), timeout: float | None = None):
         payload = Payload.set_activity(pid, activity=None)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def subscribe(self, event: str, args=None):
+    def subscribe(self, event: str, args=None, timeout: float | None = None):
         if args is None:
             args = {}
         payload = Payload.subscribe(event, args)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def unsubscribe(self, event: str, args=None):
+    def unsubscribe(self, event: str, args=None, timeout: float | None = None):
         if args is None:
             args = {}
         payload = Payload.unsubscribe(event, args)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def get_voice_settings(self):
+    def get_voice_settings(self, timeout: float | None = None):
         payload = Payload.get_voice_settings()
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
     def set_voice_settings(
         self,
@@ -237,6 +240,7 @@ class Client(BaseClient):
         silence_warning: bool | None = None,
         deaf: bool | None = None,
         mute: bool | None = None,
+        timeout: float | None = None,
     ):
         payload = Payload.set_voice_settings(
             _input,
@@ -250,276 +254,45 @@ class Client(BaseClient):
             deaf,
             mute,
         )
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def capture_shortcut(self, action: str):
+    def capture_shortcut(self, action: str, timeout: float | None = None):
         payload = Payload.capture_shortcut(action)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def send_activity_join_invite(self, user_id: str):
+    def send_activity_join_invite(self, user_id: str, timeout: float | None = None):
         payload = Payload.send_activity_join_invite(user_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
 
-    def close_activity_request(self, user_id: str):
+    def close_activity_request(self, user_id: str, timeout: float | None = None):
         payload = Payload.close_activity_request(user_id)
-        self.send_data(1, payload)
-        return self.loop.run_until_complete(self.read_output())
+        return self._command(payload, timeout=timeout)
+
+    def batch(self, timeout: float | None = None) -> Batch:
+        """Collect commands to send in one write; see :class:`Batch`"""
+        return Batch(self, timeout=timeout)
 
     def close(self):
         self.send_data(2, {"v": 1, "client_id": self.client_id})
         self.sock_writer.close()
         self._closed = True
-        self.loop.close()
+        if self.loop is not None:
+            self.loop.close()
 
     def start(self):
-        self.loop.run_until_complete(self.handshake())
-
-    def read(self):
-        return self.loop.run_until_complete(self.read_output())
-
-
-class AioClient(BaseClient):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs, isasync=True)
-        self._closed = False
-        self._events = {}
-
-    async def register_event(self, event: str, func: Callable, args=None):
-        if args is None:
-            args = {}
-        if not inspect.iscoroutinefunction(func):
-            raise InvalidArgument(
-                "Coroutine", "Subroutine", "Event function must be a coroutine"
-            )
-        elif len(inspect.signature(func).parameters) != 1:
-            raise ArgumentError
-        await self.subscribe(event, args)
-        self._events[event.lower()] = func
-
-    async def unregister_event(self, event: str, args=None):
-        if args is None:
-            args = {}
-        event = event.lower()
-        if event not in self._events:
-            raise EventNotFound(event)
-        await self.unsubscribe(event, args)
-        del self._events[event]
-
-    # noinspection PyProtectedMember
-    def on_event(self, data):
-        if self.sock_reader._eof:
-            raise PyPresenceException("feed_data after feed_eof")
-        if not data:
-            return
-        self.sock_reader._buffer.extend(data)
-        self.sock_reader._wakeup_waiter()
-        if (
-            self.sock_reader._transport is not None
-            and not self.sock_reader._paused
-            and len(self.sock_reader._buffer) > 2 * self.sock_reader._limit
-        ):
-            try:
-                self.sock_reader._transport.pause_reading()
-            except NotImplementedError:
-                self.sock_reader._transport = None
-            else:
-                self.sock_reader._paused = True
-
-        payload = json.loads(data[8:].decode("utf-8"))
-
-        if payload["evt"] is not None:
-            evt = payload["evt"].lower()
-            if evt in self._events:
-                asyncio.create_task(self._events[evt](payload["data"]))
-            elif evt == "error":
-                raise DiscordError(payload["data"]["code"], payload["data"]["message"])
-
-    async def authorize(self, client_id: str, scopes: List[str]):
-        payload = Payload.authorize(client_id, scopes)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def authenticate(self, token: str):
-        payload = Payload.authenticate(token)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_guilds(self):
-        payload = Payload.get_guilds()
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_guild(self, guild_id: str):
-        payload = Payload.get_guild(guild_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_channel(self, channel_id: str):
-        payload = Payload.get_channel(channel_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_channels(self, guild_id: str):
-        payload = Payload.get_channels(guild_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def set_user_voice_settings(
-        self,
-        user_id: str,
-        pan_left: float | None = None,
-        pan_right: float | None = None,
-        volume: int | None = None,
-        mute: bool | None = None,
-    ):
-        payload = Payload.set_user_voice_settings(
-            user_id, pan_left, pan_right, volume, mute
-        )
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def select_voice_channel(self, channel_id: str):
-        payload = Payload.select_voice_channel(channel_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_selected_voice_channel(self):
-        payload = Payload.get_selected_voice_channel()
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def select_text_channel(self, channel_id: str):
-        payload = Payload.select_text_channel(channel_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def set_activity(
-        self,
-        pid: int = os.getpid(),
-        activity_type: ActivityType | None = None,
-        status_display_type: StatusDisplayType | None = None,
-        state: str | None = None,
-        details: str | None = None,
-        name: str | None = None,
-        start: int | None = None,
-        end: int | None = None,
-        large_image: str | None = None,
-        large_text: str | None = None,
-        small_image: str | None = None,
-        small_text: str | None = None,
-        party_id: str | None = None,
-        party_size: list | None = None,
-        join: str | None = None,
-        spectate: str | None = None,
-        match: str | None = None,
-        buttons: list | None = None,
-        instance: bool = True,
-    ):
-        payload = Payload.set_activity(
-            pid=pid,
-            activity_type=activity_type.value if activity_type else None,
-            status_display_type=(
-                status_display_type.value if status_display_type else None
-            ),
-            state=state,
-            details=details,
-            name=name,
-            start=start,
-            end=end,
-            large_image=large_image,
-            large_text=large_text,
-            small_image=small_image,
-            small_text=small_text,
-            party_id=party_id,
-            party_size=party_size,
-            join=join,
-            spectate=spectate,
-            match=match,
-            buttons=buttons,
-            instance=instance,
-            activity=True,
-        )
-        self.send_data(1, payload)
-        return await self.read_output()
+        # Bytes left over from a previous connection mean nothing now
+        self._decoder = None
+        self.handshake()
 
-    async def clear_activity(self, pid: int = os.getpid()):
-        payload = Payload.set_activity(pid, activity=None)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def subscribe(self, event: str, args=None):
-        if args is None:
-            args = {}
-        payload = Payload.subscribe(event, args)
-        self.send_data(1, payload)
-        return await self.read_output()
+    def read(self, timeout: float | None = None):
+        return self.read_output(timeout=timeout)
 
-    async def unsubscribe(self, event: str, args=None):
-        if args is None:
-            args = {}
-        payload = Payload.unsubscribe(event, args)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def get_voice_settings(self):
-        payload = Payload.get_voice_settings()
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def set_voice_settings(
-        self,
-        _input: dict | None = None,
-        output: dict | None = None,
-        mode: dict | None = None,
-        automatic_gain_control: bool | None = None,
-        echo_cancellation: bool | None = None,
-        noise_suppression: bool | None = None,
-        qos: bool | None = None,
-        silence_warning: bool | None = None,
-        deaf: bool | None = None,
-        mute: bool | None = None,
-    ):
-        payload = Payload.set_voice_settings(
-            _input,
-            output,
-            mode,
-            automatic_gain_control,
-            echo_cancellation,
-            noise_suppression,
-            qos,
-            silence_warning,
-            deaf,
-            mute,
-        )
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def capture_shortcut(self, action: str):
-        payload = Payload.capture_shortcut(action)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def send_activity_join_invite(self, user_id: str):
-        payload = Payload.send_activity_join_invite(user_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def close_activity_request(self, user_id: str):
-        payload = Payload.close_activity_request(user_id)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    def close(self):
-        self.send_data(2, {"v": 1, "client_id": self.client_id})
-        self.sock_writer.close()
-        self._closed = True
-        self.loop.close()
 
-    async def start(self):
-        await self.handshake()
+def __getattr__(name: str):
+    # AioClient lives in .aio with the asyncio transport, so that importing
+    # this module doesn't import asyncio
+    if name == "AioClient":
+        from .aio import AioClient
 
-    async def read(self):
-        return await self.read_output()
+        return AioClient
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,77 @@
+"""JSON codecs used to encode and decode RPC frames.
+
+The standard library is always available; orjson and ujson are used when
+installed and asked for, since event-heavy sessions spend most of their CPU
+time in JSON.
+"""
+from __future__ import annotations
+
+import json
+
+from .exceptions import InvalidArgument
+
+
+class JSONCodec:
+    """Standard library codec"""
+
+    name = "json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def loads(self, data):
+        # json.loads doesn't take memoryviews, str() decodes any buffer
+        return json.loads(str(data, "utf-8"))
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class UjsonCodec:
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+
+        self._ujson = ujson
+
+    def dumps(self, obj) -> bytes:
+        return self._ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return self._ujson.loads(str(data, "utf-8"))
+
+
+_CODECS = {"json": JSONCodec, "orjson": OrjsonCodec, "ujson": UjsonCodec}
+
+
+def get_codec(codec="json"):
+    """Return a codec by name, or pass through an object with dumps/loads.
+
+    ``"auto"`` picks the fastest installed library: orjson, then ujson,
+    then the standard library. Asking for orjson or ujson by name when it
+    isn't installed raises ImportError.
+    """
+    if codec == "auto":
+        for name in ("orjson", "ujson"):
+            try:
+                return _CODECS[name]()
+            except ImportError:
+                pass
+        return JSONCodec()
+    if isinstance(codec, str):
+        if codec not in _CODECS:
+            raise InvalidArgument(
+                "one of {0}".format(", ".join(["auto", *_CODECS])), codec
+            )
+        return _CODECS[codec]()
+    if not all(callable(getattr(codec, name, None)) for name in ("dumps", "loads")):
+        raise InvalidArgument("codec with dumps and loads", type(codec).__name__)
+    return codec
@@ -0,0 +1,128 @@
+"""Running event handlers off the thread that reads the pipe.
+
+A slow handler run inline holds up every frame behind it, including the
+replies other commands are waiting for. :class:`EventDispatcher` hands
+handlers to a :mod:`concurrent.futures` executor instead.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+from .exceptions import InvalidArgument
+
+DROP = "drop"
+BLOCK = "block"
+
+
+class EventStats:
+    """Counters for one event type.
+
+    ``depth`` is the number of events waiting to be handled right now and
+    ``max_depth`` the most there have been. Latencies are in seconds and
+    measure the handler call alone.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.max_depth = 0
+        self.handled = 0
+        self.dropped = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.handled if self.handled else 0.0
+
+    def __repr__(self):
+        return (
+            "<EventStats depth={0} handled={1} dropped={2} errors={3} "
+            "mean_latency={4:.6f}>".format(
+                self.depth, self.handled, self.dropped, self.errors, self.mean_latency
+            )
+        )
+
+
+class EventDispatcher:
+    """Runs event handlers on an executor, in order within each event type.
+
+    Events of the same type are handled one at a time in the order they
+    arrived; different types run in parallel, up to the executor's worker
+    count. At most ``max_queue`` events of one type may wait. When a type's
+    queue is full, ``policy="drop"`` discards the new event and
+    ``policy="block"`` makes :meth:`dispatch` wait for room, which stops
+    the pipe from being read until handlers catch up. Don't use ``"block"``
+    if events are dispatched from one of the executor's own threads.
+
+    Exceptions raised by handlers are counted in ``errors`` and the latest
+    one is kept in ``last_error``.
+    """
+
+    def __init__(self, executor, max_queue: int = 100, policy: str = DROP):
+        if policy not in (DROP, BLOCK):
+            raise InvalidArgument("'drop' or 'block'", policy)
+        self.executor = executor
+        self.max_queue = max_queue
+        self.policy = policy
+        self.stats = {}
+        self.last_error = None
+        self._queues = {}
+        self._running = set()
+        self._cond = threading.Condition()
+
+    def dispatch(self, event: str, handler, data) -> bool:
+        """Queue ``handler(data)``; returns False if the event was dropped"""
+        with self._cond:
+            stats = self.stats.get(event)
+            if stats is None:
+                stats = self.stats[event] = EventStats()
+                self._queues[event] = deque()
+            queue = self._queues[event]
+            if len(queue) >= self.max_queue:
+                if self.policy == DROP:
+                    stats.dropped += 1
+                    return False
+                while len(queue) >= self.max_queue:
+                    self._cond.wait()
+            queue.append((handler, data))
+            stats.depth = len(queue)
+            stats.max_depth = max(stats.max_depth, stats.depth)
+            if event in self._running:
+                return True
+            self._running.add(event)
+        self.executor.submit(self._drain, event)
+        return True
+
+    def _drain(self, event: str):
+        queue = self._queues[event]
+        stats = self.stats[event]
+        while True:
+            with self._cond:
+                if not queue:
+                    self._running.discard(event)
+                    self._cond.notify_all()
+                    return
+                handler, data = queue.popleft()
+                stats.depth = len(queue)
+                self._cond.notify_all()
+            started = time.perf_counter()
+            try:
+                handler(data)
+            except Exception as e:
+                stats.errors += 1
+                self.last_error = e
+            latency = time.perf_counter() - started
+            stats.handled += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every queued event has been handled.
+
+        Returns False if ``timeout`` seconds passed first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._running, timeout)
@@ -76,3 +76,8 @@ class ResponseTimeout(PyPresenceException):
 class ConnectionTimeout(PyPresenceException):
     def __init__(self):
         super().__init__("Unable to create a connection to the pipe in time")
+
+
+class QueueFull(PyPresenceException):
+    def __init__(self):
+        super().__init__("Too many requests are waiting to be sent")
@@ -0,0 +1,311 @@
+"""In-process stand-in for Discord's IPC server.
+
+Lets tests and benchmarks drive :class:`Presence` and :class:`Client`
+through a real UNIX socket, with the same framing and discovery as against
+Discord, on a machine where Discord isn't running. UNIX only.
+"""
+from __future__ import annotations
+
+import json
+import os
+import queue
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+from .framing import FrameDecoder
+from .utils import invalidate_ipc_path_cache
+
+READY = {
+    "v": 1,
+    "config": {
+        "cdn_host": "cdn.discordapp.com",
+        "api_endpoint": "//discord.com/api",
+        "environment": "production",
+    },
+    "user": {"id": "1", "username": "fake", "discriminator": "0"},
+}
+
+
+class FakeDiscordServer:
+    """A fake Discord client listening on ``<runtime_dir>/discord-ipc-<pipe>``.
+
+    Use it as a context manager, and inside :meth:`installed` so that
+    :func:`~pypresence.utils.get_ipc_path` finds it::
+
+        with FakeDiscordServer() as server, server.installed():
+            RPC = Presence(client_id)
+            RPC.connect()
+            RPC.update(state="Testing")
+            assert server.activity["state"] == "Testing"
+
+    Every command gets a reply ``latency`` seconds after it arrives; commands
+    sent back to back are answered back to back. SET_ACTIVITY
+    replies echo the activity, SUBSCRIBE/UNSUBSCRIBE echo the event, and
+    other commands reply with whatever ``handlers[cmd](args)`` returns, or
+    an empty dict. Everything received is kept in ``commands``.
+
+    ``activity_rate`` emulates Discord's limit on activity updates, e.g.
+    ``(5, 20.0)`` for 5 per 20 seconds. Like Discord, updates over the
+    limit are acknowledged but not applied, and are counted in
+    ``dropped_activities``.
+    """
+
+    def __init__(
+        self,
+        pipe: int = 0,
+        runtime_dir: str | None = None,
+        latency: float = 0.0,
+        activity_rate: tuple[int, float] | None = None,
+        handlers: dict | None = None,
+    ):
+        self.pipe = pipe
+        self.latency = latency
+        self.activity_rate = activity_rate
+        self.handlers = dict(handlers or {})
+        self.commands = []
+        self.activity = None
+        self.dropped_activities = 0
+        self.invalid_client_ids = set()
+        self._own_dir = runtime_dir is None
+        self.runtime_dir = runtime_dir or tempfile.mkdtemp(prefix="pypresence-")
+        self.path = os.path.join(self.runtime_dir, "discord-ipc-{0}".format(pipe))
+        self._errors = {}
+        self._updates = deque()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._listener = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Start listening"""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen()
+        self._listener = listener
+        self._thread = threading.Thread(
+            target=self._accept, name="pypresence-fake-discord", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Disconnect every client and stop listening"""
+        if self._listener is not None:
+            # shutdown() wakes the thread blocked in accept()
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._listener.close()
+            self._listener = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.disconnect_all()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        if self._own_dir:
+            shutil.rmtree(self.runtime_dir, ignore_errors=True)
+
+    def installed(self):
+        """Context manager pointing IPC discovery at this server"""
+        return _Installed(self.runtime_dir)
+
+    @property
+    def connections(self) -> int:
+        """Number of clients currently connected"""
+        with self._lock:
+            return len(self._connections)
+
+    def script_error(
+        self, cmd: str, code: int = 4000, message: str = "Error", count: int = 1
+    ):
+        """Answer the next ``count`` ``cmd`` commands with an ERROR reply"""
+        with self._lock:
+            self._errors.setdefault(cmd.upper(), deque()).extend(
+                [(code, message)] * count
+            )
+
+    def send_event(self, evt: str, data=None, force: bool = False) -> int:
+        """Send an event to clients subscribed to it (all of them if ``force``).
+
+        Returns the number of clients it was sent to.
+        """
+        payload = {"cmd": "DISPATCH", "evt": evt.upper(), "data": data or {}}
+        with self._lock:
+            targets = [
+                conn
+                for conn in self._connections
+                if force or evt.upper() in conn.subscriptions
+            ]
+        for conn in targets:
+            conn.send(1, payload)
+        return len(targets)
+
+    def disconnect_all(self):
+        """Drop every connection, as Discord does when it quits"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except (OSError, AttributeError):
+                return
+            conn = _Connection(self, sock)
+            with self._lock:
+                self._connections.append(conn)
+            threading.Thread(target=conn.serve, daemon=True).start()
+
+    def _forget(self, conn):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def _reply(self, conn, payload: dict) -> dict:
+        cmd = payload.get("cmd")
+        args = payload.get("args") or {}
+        reply = {"cmd": cmd, "evt": None, "nonce": payload.get("nonce")}
+        with self._lock:
+            self.commands.append(payload)
+            errors = self._errors.get(cmd)
+            error = errors.popleft() if errors else None
+        if error is not None:
+            reply["evt"] = "ERROR"
+            reply["data"] = {"code": error[0], "message": error[1]}
+        elif cmd == "SET_ACTIVITY":
+            if self._allow_activity():
+                self.activity = args.get("activity")
+            else:
+                self.dropped_activities += 1
+            reply["data"] = args.get("activity")
+        elif cmd in ("SUBSCRIBE", "UNSUBSCRIBE"):
+            evt = payload.get("evt")
+            if cmd == "SUBSCRIBE":
+                conn.subscriptions.add(evt)
+            else:
+                conn.subscriptions.discard(evt)
+            reply["evt"] = evt
+            reply["data"] = {"evt": evt}
+        else:
+            handler = self.handlers.get(cmd)
+            reply["data"] = handler(args) if handler is not None else {}
+        return reply
+
+    def _allow_activity(self) -> bool:
+        if self.activity_rate is None:
+            return True
+        rate, per = self.activity_rate
+        now = time.monotonic()
+        with self._lock:
+            while self._updates and now - self._updates[0] >= per:
+                self._updates.popleft()
+            if len(self._updates) >= rate:
+                return False
+            self._updates.append(now)
+            return True
+
+
+class _Connection:
+    # Replies go through an outbox drained by a writer thread, so like
+    # Discord the server keeps reading while a client is slow to read
+    def __init__(self, server: FakeDiscordServer, sock):
+        self.server = server
+        self.sock = sock
+        self.subscriptions = set()
+        self._outbox = queue.Queue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def send(self, op: int, payload: dict, delay: float = 0.0):
+        body = json.dumps(payload).encode("utf-8")
+        frame = struct.pack("<II", op, len(body)) + body
+        self._outbox.put((time.monotonic() + delay, frame))
+
+    def _write(self):
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            due, frame = item
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.sock.sendall(frame)
+            except OSError:
+                return
+
+    def close(self, flush: bool = False):
+        self._outbox.put(None)
+        if flush:
+            self._writer.join(5)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def serve(self):
+        decoder = FrameDecoder()
+        try:
+            while True:
+                chunk = self.sock.recv(65536)
+                if not chunk:
+                    return
+                decoder.feed(chunk)
+                for op, payload in decoder:
+                    if not self._handle(op, payload):
+                        return
+        except OSError:
+            pass
+        finally:
+            self.server._forget(self)
+            self.close(flush=True)
+
+    def _handle(self, op: int, payload: dict) -> bool:
+        server = self.server
+        if op == 0:
+            if str(payload.get("client_id")) in server.invalid_client_ids:
+                self.send(2, {"code": 4000, "message": "Invalid Client ID"})
+                return False
+            self.send(1, {"cmd": "DISPATCH", "evt": "READY", "data": READY})
+        elif op == 1:
+            self.send(1, server._reply(self, payload), server.latency)
+        elif op == 2:
+            return False
+        elif op == 3:
+            self.send(4, payload)
+        return True
+
+
+class _Installed:
+    def __init__(self, runtime_dir: str):
+        self.runtime_dir = runtime_dir
+        self._saved = None
+
+    def __enter__(self):
+        self._saved = os.environ.get("XDG_RUNTIME_DIR")
+        os.environ["XDG_RUNTIME_DIR"] = self.runtime_dir
+        invalidate_ipc_path_cache()
+
+    def __exit__(self, *exc):
+        if self._saved is None:
+            os.environ.pop("XDG_RUNTIME_DIR", None)
+        else:
+            os.environ["XDG_RUNTIME_DIR"] = self._saved
+        invalidate_ipc_path_cache()
@@ -0,0 +1,74 @@
+"""Incremental decoding of the IPC frame stream.
+
+Every message on the pipe is an 8 byte header (``<II``: opcode, body
+length) followed by a JSON body. Reads don't respect those boundaries, so
+a chunk can hold half a header, several frames, or the end of one frame
+and the start of the next.
+"""
+from __future__ import annotations
+
+import struct
+
+from .codec import JSONCodec
+
+_HEADER = struct.Struct("<II")
+
+
+class FrameDecoder:
+    """Turns arbitrary byte chunks into ``(op, payload)`` frames.
+
+    Chunks are appended to one growable buffer and frames are decoded in
+    place from a read offset, so nothing is sliced or copied per frame.
+    Consumed bytes are dropped from the front of the buffer on the next
+    :meth:`feed`. Iterate over the decoder to get every complete frame
+    buffered so far; an incomplete frame stays buffered until the rest of
+    it is fed.
+    """
+
+    def __init__(self, codec=None):
+        self.codec = codec or JSONCodec()
+        self._buf = bytearray()
+        self._pos = 0
+
+    def __len__(self) -> int:
+        """Number of buffered bytes not yet returned as a frame"""
+        return len(self._buf) - self._pos
+
+    def feed(self, data: bytes):
+        """Add a chunk of the stream"""
+        if self._pos:
+            del self._buf[: self._pos]
+            self._pos = 0
+        self._buf += data
+
+    def next_frame(self) -> tuple[int, dict] | None:
+        """Return the next complete frame, or None if there isn't one"""
+        buf = self._buf
+        start = self._pos
+        if len(buf) - start < 8:
+            return None
+        op, length = _HEADER.unpack_from(buf, start)
+        end = start + 8 + length
+        if len(buf) < end:
+            return None
+        # Consumed before decoding, so a body that doesn't parse is skipped
+        # instead of raising again on every later call
+        self._pos = end
+        with memoryview(buf) as view:
+            # The slice is a separate export; a traceback kept by the caller
+            # would otherwise pin it and stop feed() resizing the buffer
+            body = view[start + 8 : end]
+            try:
+                payload = self.codec.loads(body)
+            finally:
+                body.release()
+        return op, payload
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple[int, dict]:
+        frame = self.next_frame()
+        if frame is None:
+            raise StopIteration
+        return frame
@@ -0,0 +1,160 @@
+"""Background I/O thread for clients created with ``threaded=True``.
+
+The thread owns the socket once connected: it sends queued requests, reads
+replies and events, and resolves a :class:`concurrent.futures.Future` for
+every request, so callers never wait on the pipe.
+"""
+from __future__ import annotations
+
+import selectors
+import socket
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from .exceptions import PipeClosed, QueueFull
+
+
+class IOThread:
+    """Sends requests submitted from any thread and resolves their futures.
+
+    Submission appends to a ``deque``, which is atomic, so callers never
+    take a lock; a byte written to a socket pair wakes the thread from the
+    ``select`` it sleeps in while waiting for replies. ``maxsize`` bounds
+    how many requests may wait to be sent. With several threads submitting
+    at once it may be exceeded by a few, as there is no lock to make the
+    length check and append one step.
+    """
+
+    def __init__(self, client, maxsize: int = 64):
+        self.client = client
+        self.maxsize = maxsize
+        self.error = None
+        self._queue = deque()
+        # nonce -> (PendingRequest, Future) for requests awaiting a reply
+        self._requests = {}
+        self._waker = None
+        self._wakeup = None
+        self._thread = None
+        self._running = False
+
+    def submit(self, op: int, payload, timeout: float | None = None) -> Future:
+        """Queue a request and return a future for its reply.
+
+        The future fails with :class:`ResponseTimeout` if the reply doesn't
+        arrive within ``timeout`` seconds of being sent (the client's
+        ``response_timeout`` by default).
+        """
+        if self.error is not None:
+            raise self.error
+        if len(self._queue) >= self.maxsize:
+            raise QueueFull
+        future = Future()
+        self._queue.append((op, payload, timeout, future))
+        self._wake()
+        return future
+
+    def _wake(self):
+        waker = self._waker
+        if waker is None:
+            # Not started yet; the queue is sent once it is
+            return
+        try:
+            waker.send(b"\0")
+        except OSError:
+            # Either a wakeup is already pending or the thread is gone
+            pass
+
+    def start(self):
+        """Start the thread; the client must already be connected"""
+        if self._thread is not None:
+            return
+        self.error = None
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._waker.setblocking(False)
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="pypresence-io", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Send whatever is queued, then stop the thread.
+
+        Futures still waiting for a reply fail with PipeClosed.
+        """
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake()
+        self._thread.join()
+        self._thread = None
+        self._fail(PipeClosed())
+        self._wakeup.close()
+        self._waker.close()
+        self._wakeup = self._waker = None
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.client.sock_reader, selectors.EVENT_READ)
+        selector.register(self._wakeup, selectors.EVENT_READ)
+        try:
+            while True:
+                self._send_queued()
+                if not self._running:
+                    return
+                # Wake up in time to expire the next overdue request
+                for key, _ in selector.select(self.client.next_deadline()):
+                    if key.fileobj is self._wakeup:
+                        try:
+                            while self._wakeup.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                self.client.poll()
+                self._resolve()
+        except Exception as e:
+            self.error = e
+            self._fail(e)
+        finally:
+            selector.close()
+
+    def _send_queued(self):
+        while self._queue:
+            op, payload, timeout, future = self._queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                request = self.client.send_request(op, payload, timeout)
+            except PipeClosed as e:
+                future.set_exception(e)
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            if request.nonce is None:
+                # Nothing to match a reply with
+                future.set_result(None)
+            else:
+                self._requests[request.nonce] = (request, future)
+
+    def _resolve(self):
+        done = [
+            nonce for nonce, (request, _) in self._requests.items() if request.done()
+        ]
+        for nonce in done:
+            request, future = self._requests.pop(nonce)
+            try:
+                future.set_result(request.result())
+            except Exception as e:
+                future.set_exception(e)
+
+    def _fail(self, error: Exception):
+        for request, future in self._requests.values():
+            future.set_exception(error)
+        self._requests.clear()
+        while self._queue:
+            future = self._queue.popleft()[-1]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
@@ -1,14 +1,41 @@
 from __future__ import annotations
 
+import itertools
 import json
 import os
 import time
 
 from .types import ActivityType, StatusDisplayType
-from .utils import remove_none
+from .utils import pruned, remove_none
+
+
+# Numbers each generator so that two made in the same microsecond differ
+_generators = itertools.count()
+
+
+class NonceGenerator:
+    """Nonces unique to this process: a fixed prefix and a counter.
+
+    The prefix is made of the pid, the ``clock()`` reading at creation and
+    the number of generators made before this one, so two processes, or two
+    generators in one process, never hand out the same nonce. ``next()``
+    returns the next one and is safe to call from any thread. Pass
+    ``prefix`` (or a fake ``clock``) for nonces that are the same every run.
+    """
+
+    def __init__(self, prefix: str | None = None, clock=time.time):
+        if prefix is None:
+            prefix = "{0:x}.{1:x}.{2:x}.".format(
+                os.getpid(), int(clock() * 1e6), next(_generators)
+            )
+        self.prefix = prefix
+        # All in C: no frame per call and no lock needed around the counter
+        self.next = map(prefix.__add__, map(str, itertools.count(1))).__next__
 
 
 class Payload:
+    # Shared by every payload built by the classmethods below
+    nonces = NonceGenerator()
 
     def __init__(self, data, clear_none=True):
         if clear_none:
@@ -18,6 +45,16 @@ class Payload:
     def __str__(self):
         return json.dumps(self.data, indent=2)
 
+    @property
+    def nonce(self) -> str | None:
+        return self.data.get("nonce")
+
+    def encode(self, codec=None) -> bytes:
+        """Serialize the payload to the bytes sent over the pipe"""
+        if codec is not None:
+            return codec.dumps(self.data)
+        return json.dumps(self.data).encode("utf-8")
+
     @staticmethod
     def time():
         return time.time()
@@ -64,115 +101,105 @@ class Payload:
         if isinstance(status_display_type, int):
             status_display_type = StatusDisplayType(status_display_type)
 
+        # Build the dicts already pruned instead of running remove_none over
+        # them afterwards. `_rn=False` keeps the None values.
+        build = pruned if _rn or activity is None else dict
+
         if activity is None:
             act_details = None
-            clear = True
         else:
-            act_details = {
-                "type": (
+            act_details = build(
+                type=(
                     activity_type.value
                     if isinstance(activity_type, ActivityType)
                     else ActivityType.PLAYING.value
                 ),
-                "status_display_type": (
+                status_display_type=(
                     status_display_type.value
                     if isinstance(status_display_type, StatusDisplayType)
                     else StatusDisplayType.NAME.value
                 ),
-                "state": state,
-                "state_url": state_url,
-                "details": details,
-                "details_url": details_url,
-                "name": name,
-                "timestamps": {"start": start, "end": end},
-                "assets": {
-                    "large_image": large_image,
-                    "large_text": large_text,
-                    "large_url": large_url,
-                    "small_image": small_image,
-                    "small_text": small_text,
-                    "small_url": small_url,
-                },
-                "party": {"id": party_id, "size": party_size},
-                "secrets": {"join": join, "spectate": spectate, "match": match},
-                "buttons": buttons,
-                "instance": instance,
-            }
-            clear = False
+                state=state,
+                state_url=state_url,
+                details=details,
+                details_url=details_url,
+                name=name,
+                timestamps=build(start=start, end=end),
+                assets=build(
+                    large_image=large_image,
+                    large_text=large_text,
+                    large_url=large_url,
+                    small_image=small_image,
+                    small_text=small_text,
+                    small_url=small_url,
+                ),
+                party=build(id=party_id, size=party_size),
+                secrets=build(join=join, spectate=spectate, match=match),
+                buttons=buttons,
+                instance=instance,
+            )
 
         payload = {
             "cmd": "SET_ACTIVITY",
-            "args": {"pid": pid, "activity": act_details},
-            "nonce": "{:.20f}".format(cls.time()),
+            "args": build(pid=pid, activity=act_details),
+            "nonce": cls.nonces.next(),
         }
-        if _rn:
-            clear = _rn
-        return cls(payload, clear)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def authorize(cls, client_id: str, scopes: list[str]):
-        payload = {
-            "cmd": "AUTHORIZE",
-            "args": {"client_id": str(client_id), "scopes": scopes},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
-        return cls(payload)
+        payload = pruned(
+            cmd="AUTHORIZE",
+            args=pruned(client_id=str(client_id), scopes=scopes),
+            nonce=cls.nonces.next(),
+        )
+        return cls(payload, clear_none=False)
 
     @classmethod
     def authenticate(cls, token: str):
-        payload = {
-            "cmd": "AUTHENTICATE",
-            "args": {"access_token": token},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="AUTHENTICATE",
+            args=pruned(access_token=token),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def get_guilds(cls):
-        payload = {
-            "cmd": "GET_GUILDS",
-            "args": {},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(cmd="GET_GUILDS", args={}, nonce=cls.nonces.next())
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def get_guild(cls, guild_id: str):
-        payload = {
-            "cmd": "GET_GUILD",
-            "args": {
-                "guild_id": str(guild_id),
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="GET_GUILD",
+            args=pruned(guild_id=str(guild_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def get_channels(cls, guild_id: str):
-        payload = {
-            "cmd": "GET_CHANNELS",
-            "args": {
-                "guild_id": str(guild_id),
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="GET_CHANNELS",
+            args=pruned(guild_id=str(guild_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def get_channel(cls, channel_id: str):
-        payload = {
-            "cmd": "GET_CHANNEL",
-            "args": {
-                "channel_id": str(channel_id),
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="GET_CHANNEL",
+            args=pruned(channel_id=str(channel_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def set_user_voice_settings(
@@ -183,52 +210,46 @@ class Payload:
         volume: int | None = None,
         mute: bool | None = None,
     ):
-        payload = {
-            "cmd": "SET_USER_VOICE_SETTINGS",
-            "args": {
-                "user_id": str(user_id),
-                "pan": {"left": pan_left, "right": pan_right},
-                "volume": volume,
-                "mute": mute,
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
-
-        return cls(payload, True)
+        payload = pruned(
+            cmd="SET_USER_VOICE_SETTINGS",
+            args=pruned(
+                user_id=str(user_id),
+                pan=pruned(left=pan_left, right=pan_right),
+                volume=volume,
+                mute=mute,
+            ),
+            nonce=cls.nonces.next(),
+        )
+
+        return cls(payload, clear_none=False)
 
     @classmethod
     def select_voice_channel(cls, channel_id: str):
-        payload = {
-            "cmd": "SELECT_VOICE_CHANNEL",
-            "args": {
-                "channel_id": str(channel_id),
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="SELECT_VOICE_CHANNEL",
+            args=pruned(channel_id=str(channel_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def get_selected_voice_channel(cls):
-        payload = {
-            "cmd": "GET_SELECTED_VOICE_CHANNEL",
-            "args": {},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="GET_SELECTED_VOICE_CHANNEL", args={}, nonce=cls.nonces.next()
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def select_text_channel(cls, channel_id: str):
-        payload = {
-            "cmd": "SELECT_TEXT_CHANNEL",
-            "args": {
-                "channel_id": str(channel_id),
-            },
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="SELECT_TEXT_CHANNEL",
+            args=pruned(channel_id=str(channel_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def subscribe(cls, event: str, args=None):
@@ -238,7 +259,7 @@ class Payload:
             "cmd": "SUBSCRIBE",
             "args": args,
             "evt": event.upper(),
-            "nonce": "{:.20f}".format(cls.time()),
+            "nonce": cls.nonces.next(),
         }
 
         return cls(payload)
@@ -251,20 +272,16 @@ class Payload:
             "cmd": "UNSUBSCRIBE",
             "args": args,
             "evt": event.upper(),
-            "nonce": "{:.20f}".format(cls.time()),
+            "nonce": cls.nonces.next(),
         }
 
         return cls(payload)
 
     @classmethod
     def get_voice_settings(cls):
-        payload = {
-            "cmd": "GET_VOICE_SETTINGS",
-            "args": {},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(cmd="GET_VOICE_SETTINGS", args={}, nonce=cls.nonces.next())
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def set_voice_settings(
@@ -294,37 +311,151 @@ class Payload:
                 "deaf": deaf,
                 "mute": mute,
             },
-            "nonce": "{:.20f}".format(cls.time()),
+            "nonce": cls.nonces.next(),
         }
 
         return cls(payload, True)
 
     @classmethod
     def capture_shortcut(cls, action: str):
-        payload = {
-            "cmd": "CAPTURE_SHORTCUT",
-            "args": {"action": action.upper()},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="CAPTURE_SHORTCUT",
+            args=pruned(action=action.upper()),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def send_activity_join_invite(cls, user_id: str):
-        payload = {
-            "cmd": "SEND_ACTIVITY_JOIN_INVITE",
-            "args": {"user_id": str(user_id)},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="SEND_ACTIVITY_JOIN_INVITE",
+            args=pruned(user_id=str(user_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
 
     @classmethod
     def close_activity_request(cls, user_id: str):
-        payload = {
-            "cmd": "CLOSE_ACTIVITY_REQUEST",
-            "args": {"user_id": str(user_id)},
-            "nonce": "{:.20f}".format(cls.time()),
-        }
+        payload = pruned(
+            cmd="CLOSE_ACTIVITY_REQUEST",
+            args=pruned(user_id=str(user_id)),
+            nonce=cls.nonces.next(),
+        )
 
-        return cls(payload)
+        return cls(payload, clear_none=False)
+
+
+class PreparedPayload(Payload):
+    """A payload that was serialized when it was built.
+
+    ``data`` is only decoded from the JSON if something asks for it.
+    """
+
+    def __init__(self, encoded: bytes, nonce: str):
+        self._encoded = encoded
+        self._nonce = nonce
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self._encoded)
+        return self._data
+
+    @property
+    def nonce(self) -> str:
+        return self._nonce
+
+    def encode(self, codec=None) -> bytes:
+        return self._encoded
+
+
+class ActivityTemplate:
+    """SET_ACTIVITY payload with the static fields serialized up front.
+
+    Everything that rarely changes (images, buttons, name, type, ...) is
+    validated and turned into JSON once. :meth:`render` then only has to
+    serialize the fields that change between updates - ``state``,
+    ``details``, ``start`` and ``end`` - and splice them in::
+
+        template = ActivityTemplate(name="My Game", large_image="logo")
+        RPC.send_request(1, template.render(state="In a match", start=start))
+    """
+
+    def __init__(
+        self,
+        pid: int = os.getpid(),
+        activity_type: ActivityType | int | None = None,
+        status_display_type: StatusDisplayType | int | None = None,
+        state_url: str | None = None,
+        details_url: str | None = None,
+        name: str | None = None,
+        large_image: str | None = None,
+        large_text: str | None = None,
+        large_url: str | None = None,
+        small_image: str | None = None,
+        small_text: str | None = None,
+        small_url: str | None = None,
+        party_id: str | None = None,
+        party_size: list | None = None,
+        join: str | None = None,
+        spectate: str | None = None,
+        match: str | None = None,
+        buttons: list | None = None,
+        instance: bool = True,
+    ):
+        static = Payload.set_activity(
+            pid=pid,
+            activity_type=activity_type,
+            status_display_type=status_display_type,
+            state_url=state_url,
+            details_url=details_url,
+            name=name,
+            large_image=large_image,
+            large_text=large_text,
+            large_url=large_url,
+            small_image=small_image,
+            small_text=small_text,
+            small_url=small_url,
+            party_id=party_id,
+            party_size=party_size,
+            join=join,
+            spectate=spectate,
+            match=match,
+            buttons=buttons,
+            instance=instance,
+        ).data["args"]
+        # The activity always has at least type, status_display_type and
+        # instance, so its body is never empty.
+        self._head = '{"cmd": "SET_ACTIVITY", "args": {"pid": %s, "activity": {' % (
+            json.dumps(static["pid"])
+        )
+        self._tail = json.dumps(static["activity"])[1:] + '}, "nonce": '
+
+    def render(
+        self,
+        state: str | None = None,
+        details: str | None = None,
+        start: int | float | None = None,
+        end: int | float | None = None,
+    ) -> PreparedPayload:
+        parts = [self._head]
+        if state is not None:
+            parts += ('"state": ', json.dumps(state), ", ")
+        if details is not None:
+            parts += ('"details": ', json.dumps(details), ", ")
+        if start is not None or end is not None:
+            timestamps = []
+            # Same conversion as Payload.set_activity
+            if start is not None:
+                start = int(start) if start else start
+                timestamps.append('"start": ' + json.dumps(start))
+            if end is not None:
+                end = int(end) if end else end
+                timestamps.append('"end": ' + json.dumps(end))
+            parts += ('"timestamps": {', ", ".join(timestamps), "}, ")
+        nonce = Payload.nonces.next()
+        parts += (self._tail, '"', nonce, '"}')
+        return PreparedPayload("".join(parts).encode("utf-8"), nonce)
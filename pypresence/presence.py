@@ -3,16 +3,58 @@ from __future__ import annotations
 import os
 import sys
 
-from .baseclient import BaseClient
+from .activity import Activity
+from .baseclient import BaseClient, PendingRequest
 from .payloads import Payload
 from .types import ActivityType, StatusDisplayType
-from .utils import get_event_loop
+from .utils import copy_json, get_event_loop
 
 
 class Presence(BaseClient):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # When an update would send exactly the activity Discord already
+        # has, skip the round-trip and return the previous reply instead.
+        self.skip_duplicates = kwargs.get("skip_duplicates", True)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._last_args = None
+        self._last_activity = None
+        self._last_response = None
+        # With threaded=True an I/O thread owns the socket and every command
+        # returns a concurrent.futures.Future instead of the reply
+        self.threaded = kwargs.get("threaded", False)
+        self.response_callback = kwargs.get("response_callback", None)
+        self.event_callback = kwargs.get("event_callback", None)
+        self._io = None
+        if self.threaded:
+            from .iothread import IOThread
+
+            self._io = IOThread(self, kwargs.get("queue_size", 64))
+
+    def _command(self, payload, op: int = 1, timeout: float | None = None):
+        if self._io is None:
+            return super()._command(payload, op, timeout)
+        future = self._io.submit(op, payload, timeout)
+        if self.response_callback is not None:
+            future.add_done_callback(self.response_callback)
+        return future
+
+    def _last_failed(self) -> bool:
+        # A non-blocking or threaded update is remembered before its reply
+        # arrives; if that reply turns out to be an error, the same update
+        # must be sent again rather than skipped
+        response = self._last_response
+        if isinstance(response, PendingRequest):
+            return response.failed()
+        if self._io is not None and response is not None and response.done():
+            return response.cancelled() or response.exception() is not None
+        return False
+
+    def _dispatch_event(self, payload: dict):
+        if self.event_callback is not None:
+            self.event_callback(payload)
 
     def update(
         self,
@@ -40,7 +82,26 @@ class Presence(BaseClient):
         buttons: list | None = None,
         instance: bool = True,
         payload_override: dict | None = None,
+        timeout: float | None = None,
+        activity: Activity | None = None,
     ):
+        if activity is not None:
+            # Compared by hash and cached bytes rather than dict by dict
+            key = (pid, activity)
+            if (
+                self.skip_duplicates
+                and key == self._last_activity
+                and not self._last_failed()
+            ):
+                self.cache_hits += 1
+                return self._last_response
+            self.cache_misses += 1
+            response = self._command(activity.payload(pid), timeout=timeout)
+            self._last_args = {"pid": pid, "activity": activity.to_dict()}
+            self._last_activity = key
+            self._last_response = response
+            return response
+
         if payload_override is None:
             payload = Payload.set_activity(
                 pid=pid,
@@ -72,20 +133,46 @@ class Presence(BaseClient):
             )
         else:
             payload = payload_override
-        self.send_data(1, payload)
-        return self.read_output()
 
-    def clear(self, pid: int = os.getpid()):
+        data = payload.data if isinstance(payload, Payload) else payload
+        args = data.get("args")
+        if (
+            self.skip_duplicates
+            and args is not None
+            and args == self._last_args
+            and not self._last_failed()
+        ):
+            self.cache_hits += 1
+            return self._last_response
+        self.cache_misses += 1
+        response = self._command(payload, timeout=timeout)
+        # A copy, so that lists the caller changes later don't change it
+        self._last_args = copy_json(args)
+        self._last_activity = None
+        self._last_response = response
+        return response
+
+    def clear(self, pid: int = os.getpid(), timeout: float | None = None):
         payload = Payload.set_activity(pid, activity=None)
-        self.send_data(1, payload)
-        return self.read_output()
+        self._last_args = self._last_activity = self._last_response = None
+        return self._command(payload, timeout=timeout)
 
     def connect(self):
         # Establish connection synchronously
         self.update_event_loop(get_event_loop())
-        return self.handshake()
+        # A new connection starts out with no activity set
+        self._last_args = self._last_activity = self._last_response = None
+        if self._io is not None:
+            self._io.stop()
+        response = self.handshake()
+        if self._io is not None:
+            self._io.start()
+        return response
 
     def close(self):
+        if self._io is not None:
+            # Let the I/O thread send what's queued before hanging up
+            self._io.stop()
         self.send_data(2, {"v": 1, "client_id": self.client_id})
         # Close underlying writer/socket if possible
         if getattr(self.sock_writer, "close", None):
@@ -100,77 +187,11 @@ class Presence(BaseClient):
                 pass
 
 
-class AioPresence(BaseClient):
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs, isasync=True)
-
-    async def update(
-        self,
-        pid: int = os.getpid(),
-        activity_type: ActivityType | None = None,
-        status_display_type: StatusDisplayType | None = None,
-        state: str | None = None,
-        state_url: str | None = None,
-        details: str | None = None,
-        details_url: str | None = None,
-        name: str | None = None,
-        start: int | None = None,
-        end: int | None = None,
-        large_image: str | None = None,
-        large_text: str | None = None,
-        large_url: str | None = None,
-        small_image: str | None = None,
-        small_text: str | None = None,
-        small_url: str | None = None,
-        party_id: str | None = None,
-        party_size: list | None = None,
-        join: str | None = None,
-        spectate: str | None = None,
-        match: str | None = None,
-        buttons: list | None = None,
-        instance: bool = True,
-    ):
-        payload = Payload.set_activity(
-            pid=pid,
-            activity_type=activity_type,
-            status_display_type=status_display_type,
-            state=state,
-            state_url=state_url,
-            details=details,
-            details_url=details_url,
-            name=name,
-            start=start,
-            end=end,
-            large_image=large_image,
-            large_text=large_text,
-            large_url=large_url,
-            small_image=small_image,
-            small_text=small_text,
-            small_url=small_url,
-            party_id=party_id,
-            party_size=party_size,
-            join=join,
-            spectate=spectate,
-            match=match,
-            buttons=buttons,
-            instance=instance,
-            activity=True,
-        )
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def clear(self, pid: int = os.getpid()):
-        payload = Payload.set_activity(pid, activity=None)
-        self.send_data(1, payload)
-        return await self.read_output()
-
-    async def connect(self):
-        self.update_event_loop(get_event_loop())
-        await self.handshake()
+def __getattr__(name: str):
+    # AioPresence lives in .aio with the asyncio transport, so that importing
+    # this module doesn't import asyncio
+    if name == "AioPresence":
+        from .aio import AioPresence
 
-    def close(self):
-        self.send_data(2, {"v": 1, "client_id": self.client_id})
-        self.loop.close()
-        if sys.platform == "win32":
-            self.sock_writer._call_connection_lost(None)
+        return AioPresence
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -0,0 +1,136 @@
+"""Rate-limited, coalescing presence updates.
+
+Discord only applies about five SET_ACTIVITY commands every twenty seconds
+and silently drops the rest, so sending every update is wasted IPC.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+_CLEAR = object()
+
+
+class UpdateScheduler:
+    """Coalesces :meth:`Presence.update` calls to fit Discord's rate limit.
+
+    Updates can be submitted at any rate; only the most recent one is kept
+    and it is sent when the token bucket allows. Flushing is done either by
+    calling :meth:`tick` (e.g. from a Panda3D task) or by a background thread
+    started with :meth:`start`.
+
+    ``sent`` counts updates handed to the presence and ``merged`` counts the
+    ones that were replaced by a newer update before they could be sent.
+    """
+
+    def __init__(self, presence, rate: int = 5, per: float = 20.0, clock=None):
+        self.presence = presence
+        self.rate = rate
+        self.per = per
+        self.sent = 0
+        self.merged = 0
+        self.last_error = None
+        self._clock = clock or time.monotonic
+        self._tokens = float(rate)
+        self._refilled = self._clock()
+        self._slot = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def pending(self) -> bool:
+        """Whether an update is waiting to be sent"""
+        return self._slot is not None
+
+    def update(self, **kwargs):
+        """Queue an update, replacing any update that hasn't been sent yet"""
+        self._submit(kwargs)
+
+    def clear(self, pid: int = os.getpid()):
+        """Queue clearing the presence, replacing any pending update"""
+        self._submit((_CLEAR, pid))
+
+    def _submit(self, item):
+        with self._cond:
+            if self._slot is not None:
+                self.merged += 1
+            self._slot = item
+            self._cond.notify()
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._tokens = min(self.rate, self._tokens + elapsed * self.rate / self.per)
+
+    def _next_send_in(self) -> float | None:
+        # Seconds until the pending update may be sent, None if nothing is
+        # pending. Call with the condition held.
+        if self._slot is None:
+            return None
+        self._refill(self._clock())
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) * self.per / self.rate
+
+    def tick(self) -> bool:
+        """Send the pending update if the rate limit allows it.
+
+        Returns True if an update was sent.
+        """
+        with self._cond:
+            if self._next_send_in() != 0.0:
+                return False
+            item, self._slot = self._slot, None
+            self._tokens -= 1
+            self.sent += 1
+        if isinstance(item, tuple) and item[0] is _CLEAR:
+            self.presence.clear(item[1])
+        else:
+            self.presence.update(**item)
+        return True
+
+    def start(self):
+        """Flush updates from a background thread"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="pypresence-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, flush: bool = False):
+        """Stop the background thread, optionally sending the pending update.
+
+        The pending update is sent regardless of the rate limit when
+        ``flush`` is True.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush and self._slot is not None:
+            with self._cond:
+                self._tokens = max(self._tokens, 1.0)
+            self.tick()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    delay = self._next_send_in()
+                    if delay == 0.0:
+                        break
+                    self._cond.wait(delay)
+                if not self._running:
+                    return
+            try:
+                self.tick()
+            except Exception as e:
+                # Nobody is waiting on a background send; keep the error for
+                # the application to inspect and carry on.
+                self.last_error = e
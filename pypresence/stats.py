@@ -0,0 +1,249 @@
+"""Counters and latency histograms for a client, exported as OpenMetrics.
+
+:class:`StatsTracer` is a :class:`~pypresence.tracing.Tracer` that records
+what it sees in a :class:`StatsRegistry`::
+
+    stats = StatsTracer()
+    RPC = Presence(client_id, tracer=stats)
+    ...
+    print(stats.registry.to_openmetrics())
+
+Several clients may share one registry. Nothing is recorded unless the
+tracer is passed to a client.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+
+from .tracing import FrameTrace, Tracer
+
+# Seconds; covers a local pipe round-trip up to a stalled Discord
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Counter:
+    """A count per combination of label values that only goes up"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, labels: tuple = ()):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def get(self, labels: tuple = ()) -> float:
+        return self.values.get(labels, 0)
+
+    def _samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield "_total", labels, (), value
+
+
+class Histogram:
+    """Observations counted into buckets per combination of label values"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (the last one +Inf), sum]
+        self.values = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        entry = self.values.get(labels)
+        if entry is None:
+            counts = [0] * (len(self.buckets) + 1)
+            entry = self.values.setdefault(labels, [counts, 0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def count(self, labels: tuple = ()) -> int:
+        entry = self.values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, labels: tuple = ()) -> float:
+        entry = self.values.get(labels)
+        return entry[1] if entry else 0.0
+
+    def _samples(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", labels, (("le", _number(bound)),), cumulative
+            yield "_count", labels, (), cumulative
+            yield "_sum", labels, (), total
+
+
+class StatsRegistry:
+    """A set of named metrics that can be exported together.
+
+    Updating a metric takes no lock; under threads a scrape may be a frame
+    behind, which is fine for monitoring.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        """Return the counter called ``name``, creating it if needed"""
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram called ``name``, creating it if needed"""
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def _register(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(
+                    "{0} is already registered as a {1}".format(name, metric.kind)
+                )
+            return metric
+
+    def __getitem__(self, name: str):
+        return self._metrics[name]
+
+    def __iter__(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return iter(metrics)
+
+    def to_openmetrics(self) -> str:
+        """Every metric in the OpenMetrics text format, ending in ``# EOF``"""
+        lines = []
+        for metric in self:
+            lines.append("# TYPE {0} {1}".format(metric.name, metric.kind))
+            lines.append("# HELP {0} {1}".format(metric.name, _escape(metric.help)))
+            for suffix, values, extra, value in list(metric._samples()):
+                labels = tuple(zip(metric.labelnames, values)) + extra
+                lines.append(
+                    "{0}{1}{2} {3}".format(
+                        metric.name, suffix, _labels(labels), _number(value)
+                    )
+                )
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class StatsTracer(Tracer):
+    """Tracer that keeps counters and latency histograms in a registry"""
+
+    def __init__(
+        self, registry: StatsRegistry | None = None, prefix: str = "pypresence"
+    ):
+        self.registry = registry = registry or StatsRegistry()
+        metric = (prefix + "_{0}").format
+        self.frames_sent = registry.counter(
+            metric("frames_sent"), "Frames written to the pipe.", ("op",)
+        )
+        self.bytes_sent = registry.counter(
+            metric("sent_bytes"), "Bytes written to the pipe."
+        )
+        self.frames_received = registry.counter(
+            metric("frames_received"), "Frames read from the pipe.", ("op",)
+        )
+        self.bytes_received = registry.counter(
+            metric("received_bytes"), "Bytes read from the pipe."
+        )
+        self.errors = registry.counter(
+            metric("errors"),
+            "Error replies, timeouts and closed pipes.",
+            ("cmd", "error"),
+        )
+        self.response_latency = registry.histogram(
+            metric("response_latency_seconds"),
+            "Time from sending a command to reading its reply.",
+            ("cmd",),
+        )
+        self.encode_time = registry.histogram(
+            metric("encode_seconds"), "Time spent serializing payloads."
+        )
+        self.write_time = registry.histogram(
+            metric("write_seconds"), "Time spent writing frames to the pipe."
+        )
+        self.decode_time = registry.histogram(
+            metric("decode_seconds"), "Time spent parsing frames."
+        )
+
+    def on_send(self, trace: FrameTrace):
+        self.frames_sent.inc(1, (str(trace.op),))
+        self.bytes_sent.inc(trace.size)
+        if trace.encode_time is not None:
+            self.encode_time.observe(trace.encode_time)
+        if trace.write_time is not None:
+            self.write_time.observe(trace.write_time)
+
+    def on_frame(self, trace: FrameTrace):
+        self.frames_received.inc(1, (str(trace.op),))
+        if trace.size is not None:
+            self.bytes_received.inc(trace.size)
+        if trace.decode_time is not None:
+            self.decode_time.observe(trace.decode_time)
+
+    def on_response(self, trace: FrameTrace):
+        if trace.latency is not None:
+            self.response_latency.observe(trace.latency, (trace.cmd or "",))
+
+    def on_error(self, trace: FrameTrace):
+        self.errors.inc(1, (trace.cmd or "", type(trace.error).__name__))
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        '{0}="{1}"'.format(name, _escape(str(value))) for name, value in labels
+    ) + "}"
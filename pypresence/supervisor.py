@@ -0,0 +1,288 @@
+"""Automatic reconnection when Discord goes away.
+
+When Discord restarts or is closed the pipe breaks and every call raises
+:class:`~pypresence.exceptions.PipeClosed`. The supervisor catches that,
+reconnects on a backoff without blocking the game loop, and restores the
+activity and event subscriptions the client had.
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+
+from .exceptions import (
+    ConnectionTimeout,
+    DiscordNotFound,
+    InvalidPipe,
+    PipeClosed,
+    ResponseTimeout,
+)
+from .payloads import Payload
+
+# Failures that mean "Discord isn't there (yet)", as opposed to a problem
+# that retrying won't fix, like an invalid client ID
+_RETRYABLE = (
+    ConnectionTimeout,
+    DiscordNotFound,
+    InvalidPipe,
+    PipeClosed,
+    ResponseTimeout,
+    OSError,
+)
+
+
+class ReconnectStats:
+    """Counters kept by :class:`ReconnectSupervisor`.
+
+    ``downtime`` and ``last_downtime`` are in seconds and only count time
+    between losing a working connection and getting it back.
+    """
+
+    def __init__(self):
+        self.disconnects = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.downtime = 0.0
+        self.last_downtime = 0.0
+
+    def __repr__(self):
+        return (
+            "<ReconnectStats disconnects={0} reconnects={1} failed_attempts={2} "
+            "downtime={3:.3f}>".format(
+                self.disconnects, self.reconnects, self.failed_attempts, self.downtime
+            )
+        )
+
+
+class ReconnectSupervisor:
+    """Keeps a :class:`Presence` or :class:`Client` connected.
+
+    Calls made through the supervisor (:meth:`update`, :meth:`clear` and
+    :meth:`call`) are skipped while Discord is unreachable instead of
+    raising. Reconnecting is attempted from :meth:`tick`, which returns
+    straight away unless an attempt is due, or from a background thread
+    started with :meth:`start`. Attempts are spaced by an exponential backoff
+    from ``min_delay`` to ``max_delay`` seconds, each delay randomised
+    between half and all of its value so many clients don't retry in step.
+
+    Once connected again, the last activity is sent again and every event
+    registered with :meth:`Client.register_event` is subscribed to again.
+    An update made while disconnected replaces the activity to restore.
+    """
+
+    def __init__(
+        self,
+        client,
+        min_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock=None,
+        rng=None,
+        handshake_timeout: float = 5.0,
+    ):
+        self.client = client
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.handshake_timeout = handshake_timeout
+        self.stats = ReconnectStats()
+        self.last_error = None
+        self._clock = clock or time.monotonic
+        self._rng = rng or random.Random()
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._connected = client.sock_writer is not None
+        self._was_connected = self._connected
+        self._down_since = None if self._connected else self._clock()
+        self._next_attempt = self._clock()
+        self._failures = 0
+        self._replay = None
+        self._reconnecting = False
+        self._thread = None
+        self._running = False
+
+    @property
+    def connected(self) -> bool:
+        """Whether the client currently has a working connection"""
+        return self._connected
+
+    def call(self, func, *args, **kwargs):
+        """Call a client method, returning None if Discord is unreachable"""
+        with self._lock:
+            if not self._connected:
+                return None
+            try:
+                return func(*args, **kwargs)
+            except PipeClosed:
+                self.disconnected()
+                return None
+
+    def update(self, **kwargs):
+        """:meth:`Presence.update` that survives Discord restarting"""
+        with self._lock:
+            if self._connected:
+                response = self.call(self.client.update, **kwargs)
+                if self._connected:
+                    return response
+            self._replay = (self.client.update, kwargs)
+            return None
+
+    def clear(self, pid: int = os.getpid()):
+        """:meth:`Presence.clear` that survives Discord restarting"""
+        with self._lock:
+            if self._connected:
+                response = self.call(self.client.clear, pid)
+                if self._connected:
+                    return response
+            self._replay = (self.client.clear, {"pid": pid})
+            return None
+
+    def disconnected(self):
+        """Report that the pipe is closed and schedule a reconnect.
+
+        Called automatically when a supervised call raises PipeClosed; call
+        it yourself when you catch PipeClosed from an unsupervised call.
+        """
+        with self._lock:
+            if not self._connected:
+                return
+            self._connected = False
+            self.stats.disconnects += 1
+            now = self._clock()
+            self._down_since = now
+            self._failures = 0
+            self._next_attempt = now
+            last_args = getattr(self.client, "_last_args", None)
+            if self._replay is None and last_args is not None:
+                self._replay = (self._set_activity, {"args": last_args})
+            writer = self.client.sock_writer
+            if getattr(writer, "close", None):
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            self._wake.notify()
+
+    def _set_activity(self, args: dict):
+        payload = {
+            "cmd": "SET_ACTIVITY",
+            "args": args,
+            "nonce": Payload.nonces.next(),
+        }
+        return self.client.update(payload_override=payload)
+
+    def _backoff(self) -> float:
+        delay = min(self.max_delay, self.min_delay * 2 ** (self._failures - 1))
+        return delay / 2 + self._rng.random() * delay / 2
+
+    def tick(self) -> bool:
+        """Try to reconnect if disconnected and an attempt is due.
+
+        Returns True if the connection was restored by this call. The lock
+        isn't held while connecting, so supervised calls made meanwhile
+        return straight away instead of waiting on the handshake.
+        """
+        with self._lock:
+            if self._connected or self._reconnecting:
+                return False
+            if self._clock() < self._next_attempt:
+                return False
+            self._reconnecting = True
+        try:
+            self._reconnect()
+        except _RETRYABLE as e:
+            with self._lock:
+                self._reconnecting = False
+                self.last_error = e
+                self._failures += 1
+                self.stats.failed_attempts += 1
+                self._next_attempt = self._clock() + self._backoff()
+                return False
+        except BaseException:
+            with self._lock:
+                self._reconnecting = False
+            raise
+        return True
+
+    def _reconnect(self):
+        # Nothing else touches the client while it is disconnected, so only
+        # the replay and marking the connection usable need the lock
+        client = self.client
+        self._connect()
+        for event, args in getattr(client, "_event_args", {}).items():
+            client.subscribe(event, args)
+        with self._lock:
+            # Updates made while connecting were stored for replay; send
+            # them before anyone can see the connection as usable
+            while self._replay is not None:
+                func, kwargs = self._replay
+                self._replay = None
+                func(**kwargs)
+            now = self._clock()
+            if self._was_connected:
+                self.stats.reconnects += 1
+                self.stats.last_downtime = now - self._down_since
+                self.stats.downtime += self.stats.last_downtime
+            self._connected = self._was_connected = True
+            self._reconnecting = False
+            self._down_since = None
+            self._failures = 0
+            self.last_error = None
+
+    def _connect(self):
+        # A Discord that accepts the connection but doesn't answer shouldn't
+        # hold up the next attempt for the whole connection_timeout
+        client = self.client
+        timeout = getattr(client, "connection_timeout", None)
+        if timeout is not None and self.handshake_timeout is not None:
+            client.connection_timeout = min(timeout, self.handshake_timeout)
+        try:
+            if hasattr(client, "connect"):
+                client.connect()
+            else:
+                client.start()
+        finally:
+            if timeout is not None:
+                client.connection_timeout = timeout
+        sock = getattr(client.sock_reader, "_sock", None)
+        if sock is not None:
+            sock.settimeout(timeout)
+
+    def start(self):
+        """Reconnect from a background thread"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="pypresence-supervisor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        with self._wake:
+            self._running = False
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if not self._running:
+                    return
+                if self._connected:
+                    self._wake.wait()
+                    continue
+                delay = self._next_attempt - self._clock()
+                if delay > 0:
+                    self._wake.wait(delay)
+                    continue
+            try:
+                self.tick()
+            except Exception as e:
+                # Not something a retry fixes, e.g. an invalid client ID
+                with self._lock:
+                    self.last_error = e
+                    self._running = False
@@ -0,0 +1,124 @@
+"""Hooks for watching frames go over the pipe.
+
+Pass a :class:`Tracer` to a client to be told about every frame it sends
+and reads, every reply matched to its request and every failure::
+
+    class SlowReplies(Tracer):
+        def on_response(self, trace):
+            if trace.latency > 0.1:
+                print("{0} took {1:.3f}s".format(trace.cmd, trace.latency))
+
+    RPC = Presence(client_id, tracer=SlowReplies())
+
+Without a tracer the clients skip all of this, timings included. Hooks run
+on whichever thread is using the pipe and should return quickly.
+"""
+from __future__ import annotations
+
+import time
+
+
+class FrameTrace:
+    """What a hook gets told about one frame.
+
+    ``time`` is the ``time.monotonic()`` at which it happened. Durations are
+    in seconds; any that don't apply to the hook are None:
+
+    - ``encode_time``: serializing the payload (``on_send``)
+    - ``write_time``: writing it to the pipe (``on_send``); for a batch,
+      the single write the whole batch went out in
+    - ``decode_time``: parsing the frame's JSON (``on_frame``)
+    - ``latency``: from sending a request to its reply or timeout
+      (``on_response`` and ``on_error``)
+
+    ``size`` is the frame's size in bytes, header included, and ``error``
+    the exception passed to ``on_error``.
+    """
+
+    __slots__ = (
+        "op",
+        "cmd",
+        "evt",
+        "nonce",
+        "size",
+        "time",
+        "encode_time",
+        "write_time",
+        "decode_time",
+        "latency",
+        "error",
+    )
+
+    def __init__(
+        self,
+        op: int | None = None,
+        cmd: str | None = None,
+        evt: str | None = None,
+        nonce: str | None = None,
+        size: int | None = None,
+        time: float | None = None,
+        encode_time: float | None = None,
+        write_time: float | None = None,
+        decode_time: float | None = None,
+        latency: float | None = None,
+        error: Exception | None = None,
+    ):
+        self.op = op
+        self.cmd = cmd
+        self.evt = evt
+        self.nonce = nonce
+        self.size = size
+        self.time = time
+        self.encode_time = encode_time
+        self.write_time = write_time
+        self.decode_time = decode_time
+        self.latency = latency
+        self.error = error
+
+    def __repr__(self):
+        fields = (
+            "{0}={1!r}".format(name, getattr(self, name))
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return "<FrameTrace {0}>".format(" ".join(fields))
+
+
+class Tracer:
+    """Base class for tracers; every hook does nothing until overridden"""
+
+    def on_send(self, trace: FrameTrace):
+        """A frame was written to the pipe"""
+
+    def on_frame(self, trace: FrameTrace):
+        """A frame was read from the pipe, reply or event"""
+
+    def on_response(self, trace: FrameTrace):
+        """A reply was matched to the request that was waiting for it"""
+
+    def on_error(self, trace: FrameTrace):
+        """An error reply, a timeout or a closed pipe; see ``trace.error``"""
+
+
+def trace_frames(decoder, tracer: Tracer):
+    """Yield a FrameDecoder's frames, passing each one to ``on_frame``"""
+    while True:
+        pending = len(decoder)
+        start = time.monotonic()
+        frame = decoder.next_frame()
+        if frame is None:
+            return
+        end = time.monotonic()
+        op, payload = frame
+        tracer.on_frame(
+            FrameTrace(
+                op,
+                payload.get("cmd"),
+                payload.get("evt"),
+                payload.get("nonce"),
+                pending - len(decoder),
+                end,
+                decode_time=end - start,
+            )
+        )
+        yield frame
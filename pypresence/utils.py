@@ -3,47 +3,292 @@
 This project removes asyncio usage; helpers here avoid importing asyncio so
 the library can be driven by Panda3D tasks or other event systems.
 """
+import errno
 import os
+import selectors
 import socket
+import stat
 import sys
-import tempfile
+import time
+
+
+# Types remove_none can skip without an isinstance check
+_SCALARS = (str, int, float, bool)
 
 
 def remove_none(d: dict):
-    for item in d.copy():
-        if isinstance(d[item], dict):
-            if len(d[item]):
-                d[item] = remove_none(d[item])
-            if not len(d[item]):
-                del d[item]
-        elif d[item] is None:
-            del d[item]
+    """Strip None values, and dicts left empty by that, from ``d`` in place.
+
+    Dicts nested inside lists (like buttons) are cleaned too, but list items
+    themselves are never removed. Works without recursion or copying: None
+    values are dropped while walking the nested dicts breadth-first, then
+    the walk is replayed backwards to drop dicts that ended up empty.
+    """
+    # Flat dicts only need one pass over the keys
+    dead = []
+    for key, value in d.items():
+        if value is None:
+            dead.append(key)
+        elif type(value) not in _SCALARS and isinstance(value, (dict, list)):
+            return _remove_none_nested(d)
+    for key in dead:
+        del d[key]
     return d
 
 
+def _remove_none_nested(d: dict):
+    dicts = [d]
+    # (parent, key) for each entry in `dicts`, None if it can't be removed
+    links = [None]
+    for current in dicts:
+        _strip_none(current, dicts, links)
+    for i in range(len(dicts) - 1, 0, -1):
+        link = links[i]
+        if link is not None and not dicts[i]:
+            del link[0][link[1]]
+    return d
+
+
+def _strip_none(current: dict, dicts: list, links: list):
+    # Drops the None values of one dict and queues the dicts nested in it
+    dead = []
+    for key, value in current.items():
+        if value is None:
+            dead.append(key)
+        elif type(value) in _SCALARS:
+            continue
+        elif isinstance(value, dict):
+            dicts.append(value)
+            links.append((current, key))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    dicts.append(item)
+                    links.append(None)
+    for key in dead:
+        del current[key]
+
+
+def pruned(**fields) -> dict:
+    """Build a dict from the fields that are neither None nor empty dicts.
+
+    Lets payloads be built without None ever being stored, so they don't
+    need a :func:`remove_none` pass afterwards.
+    """
+    return {
+        key: value
+        for key, value in fields.items()
+        if value is not None and not (isinstance(value, dict) and not value)
+    }
+
+
+def copy_json(value):
+    """Copy the dicts and lists nested in ``value``, sharing everything else"""
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+    return value
+
+
 def test_ipc_path(path) -> bool:
     """Tests an IPC pipe to ensure that it actually works"""
-    if sys.platform == "win32":
-        with open(path):
+    try:
+        if sys.platform == "win32":
+            with open(path):
+                return True
+        else:
+            client = _connect_ipc(path)
+            if client is None:
+                return False
+            client.close()
             return True
+    except OSError:
+        return False
+
+
+def _connect_ipc(path):
+    # Connected socket to `path`, or None for a stale socket file left
+    # behind by a Discord that isn't running
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def _probe_ipc_paths(paths, timeout: float):
+    # Start a non-blocking connect to every path at once and collect the
+    # ones that accept within `timeout`. Returns [(path, connected socket)]
+    # in the order of `paths`; the caller owns the sockets.
+    connected = {}
+    busy = []
+    selector = selectors.DefaultSelector()
+    try:
+        for path in paths:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            err = sock.connect_ex(path)
+            if err == 0:
+                connected[path] = sock
+            elif err == errno.EINPROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, path)
+            else:
+                sock.close()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # Listener exists but its backlog is full
+                    busy.append(path)
+        deadline = time.monotonic() + timeout
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                sock = key.fileobj
+                selector.unregister(sock)
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    connected[key.data] = sock
+                else:
+                    sock.close()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+    ranked = [(path, connected[path]) for path in paths if path in connected]
+    return ranked + [(path, None) for path in busy]
+
+
+def probe_ipc_paths(pipe=None, timeout: float = 0.25) -> list:
+    """Return every working Discord IPC path, best candidate first.
+
+    All candidates (stable, PTB, Canary, Flatpak, Snap, pipes 0-9) are
+    probed concurrently with non-blocking connects, so a dead socket file
+    costs nothing and the whole probe takes at most ``timeout`` seconds.
+    """
+    paths = list(_ipc_candidates(pipe))
+    if sys.platform == "win32":
+        return [path for path in paths if test_ipc_path(path)]
+    ranked = _probe_ipc_paths(paths, timeout)
+    for path, sock in ranked:
+        if sock is not None:
+            sock.close()
+    return [path for path, sock in ranked]
+
+
+# Last working IPC path per requested pipe, with the identity of the socket
+# file it was found at: {pipe: (path, (st_dev, st_ino, st_mtime_ns))}
+_ipc_path_cache: dict = {}
+
+
+def _ipc_file_id(path):
+    if sys.platform == "win32":
+        # Named pipes have no meaningful inode/mtime
+        return None
+    st = os.stat(path)
+    if not stat.S_ISSOCK(st.st_mode):
+        raise FileNotFoundError(path)
+    return st.st_dev, st.st_ino, st.st_mtime_ns
+
+
+def _cached_ipc_path(pipe=None):
+    cached = _ipc_path_cache.get(pipe)
+    if cached is None:
+        return None
+    path, file_id = cached
+    try:
+        valid = (
+            os.path.exists(path)
+            if sys.platform == "win32"
+            else _ipc_file_id(path) == file_id
+        )
+    except OSError:
+        valid = False
+    if not valid:
+        # Discord restarted (new socket file) or went away
+        _ipc_path_cache.pop(pipe, None)
+        return None
+    return path
+
+
+def invalidate_ipc_path_cache(pipe=None):
+    """Forget the cached IPC path, or all of them if ``pipe`` is None"""
+    if pipe is None:
+        _ipc_path_cache.clear()
     else:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
-            client.connect(path)
-            return True
+        _ipc_path_cache.pop(pipe, None)
 
 
-# Returns on first IPC pipe matching Discord's
-def get_ipc_path(pipe=None):
+def warm_ipc_path_cache(pipe=None):
+    """Scan for Discord's IPC path now so the first connect doesn't have to"""
+    return get_ipc_path(pipe, use_cache=False)
+
+
+def get_ipc_path(pipe=None, use_cache=True, parallel=False, timeout=0.25):
+    """Return the path of a working Discord IPC pipe, or None.
+
+    The last path found is cached along with its socket file's inode and
+    mtime. While those still match, the cached path is returned without
+    scanning the candidate directories or test-connecting to the socket.
+
+    Candidates are tried one at a time unless ``parallel`` is True, in which
+    case they are all probed at once (see :func:`probe_ipc_paths`).
+    """
+    if use_cache:
+        path = _cached_ipc_path(pipe)
+        if path is not None:
+            return path
+    path = _scan_ipc_path(pipe, parallel, timeout)
+    _remember_ipc_path(pipe, path)
+    return path
+
+
+def get_ipc_socket(pipe=None, use_cache=True, parallel=False, timeout=0.25):
+    """Return ``(path, socket)`` for a working Discord IPC pipe.
+
+    Like :func:`get_ipc_path`, but the connection made to check the pipe is
+    handed back instead of being closed, so the caller doesn't have to
+    connect a second time. The socket is None when no pipe was found, and
+    always on Windows, where only the path is discovered.
+    """
+    if sys.platform == "win32":
+        return get_ipc_path(pipe, use_cache, parallel, timeout), None
+    if use_cache:
+        path = _cached_ipc_path(pipe)
+        if path is not None:
+            sock = _connect_ipc(path)
+            if sock is not None:
+                return path, sock
+            invalidate_ipc_path_cache(pipe)
+    path, sock = _scan_ipc_socket(pipe, parallel, timeout)
+    _remember_ipc_path(pipe, path)
+    return path, sock
+
+
+def _remember_ipc_path(pipe, path):
+    if path is not None:
+        try:
+            _ipc_path_cache[pipe] = (path, _ipc_file_id(path))
+        except OSError:
+            pass
+
+
+# Yields the paths that could be Discord's IPC pipe, most likely first
+def _ipc_candidates(pipe=None):
     ipc = "discord-ipc-"
     if pipe is not None:
         ipc = f"{ipc}{pipe}"
 
     if sys.platform in ("linux", "darwin"):
-        tempdir = os.environ.get("XDG_RUNTIME_DIR") or (
-            f"/run/user/{os.getuid()}"
-            if os.path.exists(f"/run/user/{os.getuid()}")
-            else tempfile.gettempdir()
-        )
+        tempdir = os.environ.get("XDG_RUNTIME_DIR")
+        if not tempdir:
+            tempdir = f"/run/user/{os.getuid()}"
+            if not os.path.exists(tempdir):
+                # Deferred: tempfile pulls in shutil and random
+                import tempfile
+
+                tempdir = tempfile.gettempdir()
         paths = [
             ".",
             "..",
@@ -60,13 +305,45 @@ def get_ipc_path(pipe=None):
     for path in paths:
         full_path = os.path.abspath(os.path.join(tempdir, path))
         if sys.platform == "win32" or os.path.isdir(full_path):
-            for entry in os.scandir(full_path):
-                if (
-                    entry.name.startswith(ipc)
-                    and os.path.exists(entry)
-                    and test_ipc_path(entry.path)
-                ):
-                    return entry.path
+            entries = sorted(os.scandir(full_path), key=lambda entry: entry.name)
+            for entry in entries:
+                if entry.name.startswith(ipc) and os.path.exists(entry):
+                    yield entry.path
+
+
+# Returns on first IPC pipe matching Discord's
+def _scan_ipc_path(pipe=None, parallel=False, timeout=0.25):
+    if sys.platform == "win32":
+        for path in _ipc_candidates(pipe):
+            if test_ipc_path(path):
+                return path
+        return None
+    path, sock = _scan_ipc_socket(pipe, parallel, timeout)
+    if sock is not None:
+        sock.close()
+    return path
+
+
+# Same as _scan_ipc_path, keeping the connection to the chosen pipe open.
+# UNIX sockets only.
+def _scan_ipc_socket(pipe=None, parallel=False, timeout=0.25):
+    if not parallel:
+        for path in _ipc_candidates(pipe):
+            sock = _connect_ipc(path)
+            if sock is not None:
+                return path, sock
+        return None, None
+    ranked = _probe_ipc_paths(list(_ipc_candidates(pipe)), timeout)
+    # A busy pipe (no socket) is only used when nothing else answered; the
+    # caller then connects to it by path
+    found = next((item for item in ranked if item[1] is not None), None)
+    for item in ranked:
+        if item[1] is not None and item is not found:
+            item[1].close()
+    if found is None:
+        return (ranked[0][0], None) if ranked else (None, None)
+    found[1].setblocking(True)
+    return found
 
 
 def get_event_loop(force_fresh: bool = False):
@@ -7,6 +7,22 @@ from unittest.mock import MagicMock, Mock
 import pytest
 
 
+class FakeClock:
+    """A clock that only moves when a test sets ``now``"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fake monotonic clock for time-driven code"""
+    return FakeClock()
+
+
 @pytest.fixture
 def mock_stream_reader():
     """Mock a simple stream reader with synchronous `read` method."""
@@ -71,6 +87,22 @@ def mock_discord_response():
     return _create_response
 
 
+@pytest.fixture
+def frame_reader():
+    """Factory fixture for mock readers that return payloads as frames"""
+
+    def _create_reader(*payloads):
+        chunks = []
+        for payload in payloads:
+            body = json.dumps(payload).encode("utf-8")
+            chunks += [struct.pack("<II", 1, len(body)), body]
+        reader = Mock()
+        reader.read = Mock(side_effect=chunks)
+        return reader
+
+    return _create_reader
+
+
 @pytest.fixture
 def client_id():
     """Test client ID"""
@@ -87,12 +119,13 @@ def mock_ipc_path(monkeypatch, tmp_path):
     else:
         ipc_path = str(tmp_path / "discord-ipc-0")
 
-    def mock_get_ipc_path(pipe=None):
-        return ipc_path
+    def mock_get_ipc_socket(pipe=None, **kwargs):
+        # No open socket, so handshake falls back to create_reader_writer
+        return ipc_path, None
 
     # Patch in baseclient module where it's actually used
     from pypresence import baseclient
 
-    monkeypatch.setattr(baseclient, "get_ipc_path", mock_get_ipc_path)
+    monkeypatch.setattr(baseclient, "get_ipc_socket", mock_get_ipc_socket)
 
     return ipc_path
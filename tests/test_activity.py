@@ -0,0 +1,182 @@
+"""Test the Activity value class and sending it through the clients"""
+
+import asyncio
+import json
+import sys
+
+import pytest
+
+from pypresence import Activity, AioClient, AioPresence, Client, Presence
+from pypresence.payloads import Payload
+from pypresence.types import ActivityType
+
+if sys.platform != "win32":
+    from pypresence.fakeserver import FakeDiscordServer
+
+
+def sample():
+    return Activity(
+        name="My Game",
+        state="In the lobby",
+        large_image="logo",
+        party_size=[1, 4],
+        buttons=[{"label": "Website", "url": "https://example.com"}],
+    )
+
+
+class TestActivity:
+    """Test Activity without any I/O"""
+
+    def test_matches_keyword_payload(self):
+        """Test that an activity encodes to what Payload.set_activity builds"""
+        activity = sample().with_type(ActivityType.WATCHING)
+        expected = Payload.set_activity(
+            pid=42,
+            activity_type=ActivityType.WATCHING,
+            name="My Game",
+            state="In the lobby",
+            large_image="logo",
+            party_size=[1, 4],
+            buttons=[{"label": "Website", "url": "https://example.com"}],
+        ).data
+
+        payload = activity.payload(42)
+        expected["nonce"] = payload.nonce
+        assert json.loads(payload.encode()) == expected
+        assert activity.to_dict() == expected["args"]["activity"]
+
+    def test_payloads_reuse_the_encoded_activity(self):
+        """Test that repeated sends share the cached JSON but not the nonce"""
+        activity = sample()
+        first, second = activity.payload(1), activity.payload(1)
+
+        assert activity.encode() is activity.encode()
+        assert first.nonce != second.nonce
+        assert activity.encode() in first.encode()
+
+    def test_immutable(self):
+        """Test that fields can't be set or deleted"""
+        activity = sample()
+
+        with pytest.raises(AttributeError):
+            activity.state = "Changed"
+        with pytest.raises(AttributeError):
+            del activity.state
+        with pytest.raises(AttributeError):
+            activity.extra = 1
+
+    def test_copies_mutable_arguments(self):
+        """Test that changing the lists passed in doesn't change the activity"""
+        size = [1, 4]
+        buttons = [{"label": "Website", "url": "https://example.com"}]
+        activity = Activity(party_size=size, buttons=buttons)
+        size[0] = 3
+        buttons[0]["label"] = "Changed"
+
+        assert activity.to_dict()["party"]["size"] == [1, 4]
+        assert activity.to_dict()["buttons"][0]["label"] == "Website"
+
+    def test_with_methods_derive_new_activities(self):
+        """Test that with_* leaves the original alone"""
+        lobby = sample()
+        match = lobby.with_state("In a match").with_timestamps(start=1700000000)
+
+        assert lobby.state == "In the lobby"
+        assert lobby.start is None
+        assert match.state == "In a match"
+        assert match.start == 1700000000
+        assert match.name == lobby.name
+
+    def test_replace_rejects_unknown_fields(self):
+        """Test that replace() names the fields that don't exist"""
+        with pytest.raises(TypeError, match="nope"):
+            sample().replace(nope=1)
+
+    def test_equal_activities_hash_equal(self):
+        """Test value equality and hashing"""
+        first, second = sample(), sample()
+
+        assert first == second
+        assert hash(first) == hash(second)
+        assert len({first, second}) == 1
+        assert first != first.with_state("Elsewhere")
+        assert first != "not an activity"
+
+    def test_repr_shows_set_fields(self):
+        """Test that repr leaves out unset fields"""
+        text = repr(Activity(state="Testing"))
+
+        assert "state='Testing'" in text
+        assert "details" not in text
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="The fake server only speaks UNIX sockets"
+)
+class TestSendingActivities:
+    """Test passing an Activity to the clients against the fake server"""
+
+    @pytest.fixture
+    def server(self):
+        with FakeDiscordServer() as server, server.installed():
+            yield server
+
+    def test_presence_update(self, server, client_id):
+        """Test that Presence.update sends it and skips unchanged repeats"""
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            activity = sample()
+            RPC.update(activity=activity)
+            RPC.update(activity=sample())
+            RPC.update(activity=activity.with_state("In a match"))
+        finally:
+            RPC.close()
+
+        assert len(server.commands) == 2
+        assert RPC.cache_hits == 1
+        assert server.activity["state"] == "In a match"
+        assert RPC._last_args["activity"] == server.activity
+
+    def test_presence_update_after_keywords(self, server, client_id):
+        """Test that an activity is sent after a keyword update"""
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            RPC.update(state="In the lobby")
+            RPC.update(activity=Activity(state="In the lobby"))
+        finally:
+            RPC.close()
+
+        assert len(server.commands) == 2
+
+    def test_client_set_activity(self, server, client_id):
+        """Test that Client.set_activity sends it"""
+        client = Client(client_id)
+        client.start()
+        try:
+            client.set_activity(activity=sample())
+        finally:
+            client.close()
+
+        assert server.activity["name"] == "My Game"
+
+    def test_aio_variants(self, server, client_id):
+        """Test that the async update and set_activity send it"""
+
+        async def main():
+            presence = AioPresence(client_id)
+            await presence.connect()
+            await presence.update(activity=sample())
+            presence.close()
+            client = AioClient(client_id)
+            await client.start()
+            await client.set_activity(activity=sample().with_state("Async"))
+            client.close()
+
+        asyncio.run(main())
+
+        assert [c["args"]["activity"]["state"] for c in server.commands] == [
+            "In the lobby",
+            "Async",
+        ]
@@ -0,0 +1,229 @@
+"""Test the asyncio transport against a UNIX socket server"""
+
+import asyncio
+import json
+import struct
+import sys
+
+import pytest
+
+from pypresence import AioClient, AioPresence
+from pypresence.exceptions import InvalidID, PipeClosed, ResponseTimeout
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+
+
+class FakeDiscord:
+    """Minimal IPC server: answers the handshake, then calls `on_command`"""
+
+    def __init__(self, path, on_command=None, ready=None):
+        self.path = str(path)
+        self.on_command = on_command or self.reply
+        self.ready = ready or {"cmd": "DISPATCH", "evt": "READY", "data": {"v": 1}}
+        self.writer = None
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_unix_server(self._handle, self.path)
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.writer is not None:
+            self.writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def send(self, payload, op=1):
+        body = json.dumps(payload).encode("utf-8")
+        self.writer.write(struct.pack("<II", op, len(body)) + body)
+
+    def reply(self, payload):
+        self.send(
+            {"cmd": payload["cmd"], "evt": None, "data": {}, "nonce": payload["nonce"]}
+        )
+
+    async def _handle(self, reader, writer):
+        self.writer = writer
+        try:
+            while True:
+                op, length = struct.unpack("<II", await reader.readexactly(8))
+                payload = json.loads(await reader.readexactly(length))
+                if op == 0:
+                    self.send(self.ready)
+                elif op == 1:
+                    result = self.on_command(payload)
+                    if asyncio.iscoroutine(result):
+                        await result
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+@pytest.fixture
+def ipc_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "discord-ipc-0")
+    from pypresence import aio
+
+    monkeypatch.setattr(aio, "get_ipc_socket", lambda pipe=None, **kw: (path, None))
+    return path
+
+
+class TestAioPresence:
+    """Test AioPresence over a real socket"""
+
+    def test_update(self, client_id, ipc_path):
+        """Test that update resolves with the reply to its nonce"""
+        sent = []
+
+        async def main():
+            def on_command(payload):
+                sent.append(payload)
+                discord.reply(payload)
+
+            async with FakeDiscord(ipc_path, on_command) as discord:
+                presence = AioPresence(client_id)
+                await presence.connect()
+                response = await presence.update(state="Testing")
+                presence.close()
+                return response
+
+        response = asyncio.run(main())
+
+        assert sent[0]["args"]["activity"]["state"] == "Testing"
+        assert response["nonce"] == sent[0]["nonce"]
+
+    def test_invalid_client_id(self, client_id, ipc_path):
+        """Test that a rejected handshake raises InvalidID"""
+
+        async def main():
+            ready = {"code": 4000, "message": "Invalid Client ID"}
+            async with FakeDiscord(ipc_path, ready=ready):
+                await AioPresence(client_id).connect()
+
+        with pytest.raises(InvalidID):
+            asyncio.run(main())
+
+    def test_response_timeout(self, client_id, ipc_path):
+        """Test that a command nobody answers raises ResponseTimeout"""
+
+        async def main():
+            async with FakeDiscord(ipc_path, on_command=lambda payload: None):
+                presence = AioPresence(client_id, response_timeout=0.05)
+                await presence.connect()
+                try:
+                    await presence.update(state="Testing")
+                finally:
+                    presence.close()
+
+        with pytest.raises(ResponseTimeout):
+            asyncio.run(main())
+
+    def test_per_call_timeout(self, client_id, ipc_path):
+        """Test that timeout= overrides response_timeout for one command"""
+
+        async def main():
+            async with FakeDiscord(ipc_path, on_command=lambda payload: None):
+                presence = AioPresence(client_id)
+                await presence.connect()
+                try:
+                    await presence.update(state="Testing", timeout=0.05)
+                finally:
+                    presence.close()
+
+        with pytest.raises(ResponseTimeout):
+            asyncio.run(main())
+
+    def test_pipe_closed_fails_pending(self, client_id, ipc_path):
+        """Test that losing the connection fails commands in flight"""
+
+        async def main():
+            async with FakeDiscord(ipc_path) as discord:
+                discord.on_command = lambda payload: discord.writer.close()
+                presence = AioPresence(client_id)
+                await presence.connect()
+                await presence.update(state="Testing")
+
+        with pytest.raises(PipeClosed):
+            asyncio.run(main())
+
+
+class TestAioClient:
+    """Test AioClient over a real socket"""
+
+    def test_concurrent_requests(self, client_id, ipc_path):
+        """Test that replies arriving out of order reach the right caller"""
+
+        async def main():
+            held = []
+
+            def on_command(payload):
+                held.append(payload)
+                if len(held) == 2:
+                    for payload in reversed(held):
+                        discord.send(
+                            {
+                                "cmd": payload["cmd"],
+                                "evt": None,
+                                "data": {"id": payload["args"]["guild_id"]},
+                                "nonce": payload["nonce"],
+                            }
+                        )
+
+            async with FakeDiscord(ipc_path, on_command) as discord:
+                client = AioClient(client_id)
+                await client.start()
+                first = asyncio.ensure_future(client.get_guild("1"))
+                await asyncio.sleep(0)
+                second = asyncio.ensure_future(client.get_guild("2"))
+                results = await asyncio.gather(first, second)
+                client.close()
+                return results
+
+        first, second = asyncio.run(main())
+
+        assert first["data"]["id"] == "1"
+        assert second["data"]["id"] == "2"
+
+    def test_events_dispatched_as_tasks(self, client_id, ipc_path):
+        """Test that registered coroutines are run for incoming events"""
+
+        async def main():
+            received = asyncio.Event()
+            events = []
+
+            async def on_join(data):
+                events.append(data)
+                received.set()
+
+            async with FakeDiscord(ipc_path) as discord:
+                client = AioClient(client_id)
+                await client.start()
+                await client.register_event("ACTIVITY_JOIN", on_join)
+                data = {"secret": "s"}
+                discord.send({"cmd": "DISPATCH", "evt": "ACTIVITY_JOIN", "data": data})
+                await asyncio.wait_for(received.wait(), 5)
+                client.close()
+            return events
+
+        assert asyncio.run(main()) == [{"secret": "s"}]
+
+    def test_error_event_goes_to_handler(self, client_id, ipc_path):
+        """Test that an ERROR event is passed to the error handler"""
+        errors = []
+
+        async def handler(exception, future):
+            errors.append(exception)
+
+        async def main():
+            async with FakeDiscord(ipc_path) as discord:
+                client = AioClient(client_id, handler=handler)
+                await client.start()
+                discord.send({"evt": "ERROR", "data": {"code": 4000, "message": "Bad"}})
+                for _ in range(100):
+                    if errors:
+                        break
+                    await asyncio.sleep(0.01)
+                client.close()
+
+        asyncio.run(main())
+
+        assert errors[0].code == 4000
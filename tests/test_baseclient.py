@@ -7,6 +7,7 @@ from unittest.mock import Mock, patch
 
 import pytest
 
+from pypresence import baseclient
 from pypresence.baseclient import BaseClient
 from pypresence.exceptions import (
     ConnectionTimeout,
@@ -129,6 +130,18 @@ class TestBaseClientSendData:
 
         assert client.sock_writer.write.called
 
+    def test_send_data_with_prepared_payload(self, client_id):
+        """Test that pre-serialized payloads are written as-is"""
+        from pypresence.payloads import PreparedPayload
+
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+
+        client.send_data(1, PreparedPayload(b'{"cmd": "TEST"}', "1"))
+
+        call_args = client.sock_writer.write.call_args[0][0]
+        assert call_args[8:] == b'{"cmd": "TEST"}'
+
     def test_send_data_without_connection_raises(self, client_id):
         """Test that send_data raises if not connected"""
         client = BaseClient(client_id)
@@ -296,6 +309,33 @@ class TestBaseClientHandshake:
         with pytest.raises(InvalidPipe):
             client.handshake()
 
+    @pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+    def test_handshake_reuses_discovery_socket(self, client_id, monkeypatch):
+        """Test that the socket opened by discovery is used for the handshake"""
+        import socket
+
+        from pypresence import baseclient
+
+        ours, discord = socket.socketpair()
+        response = json.dumps({"cmd": "DISPATCH", "data": {"v": 1}, "evt": "READY"})
+        discord.sendall(struct.pack("<II", 1, len(response)) + response.encode())
+        monkeypatch.setattr(
+            baseclient,
+            "get_ipc_socket",
+            lambda pipe=None, **kwargs: ("/tmp/discord-ipc-0", ours),
+        )
+        client = BaseClient(client_id)
+        client.create_reader_writer = Mock()
+
+        client.handshake()
+
+        client.create_reader_writer.assert_not_called()
+        op, length = struct.unpack("<II", discord.recv(8))
+        assert op == 0
+        assert json.loads(discord.recv(length)) == {"v": 1, "client_id": client_id}
+        client.sock_writer.close()
+        discord.close()
+
 
 class TestBaseClientCreateReaderWriter:
     """Test BaseClient.create_reader_writer() method"""
@@ -321,6 +361,18 @@ class TestBaseClientCreateReaderWriter:
         with pytest.raises(InvalidPipe):
             client.create_reader_writer("/nonexistent/path")
 
+    @pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+    def test_create_reader_writer_failure_invalidates_cache(self, client_id):
+        """Test that a dead path is dropped from the IPC path cache"""
+        from pypresence import utils
+
+        client = BaseClient(client_id, pipe=3)
+        utils._ipc_path_cache[3] = ("/nonexistent/path", (0, 0, 0))
+        with pytest.raises(InvalidPipe):
+            client.create_reader_writer("/nonexistent/path")
+
+        assert 3 not in utils._ipc_path_cache
+
     def test_create_reader_writer_timeout(self, client_id):
         """Test create_reader_writer with timeout"""
         client = BaseClient(client_id)
@@ -357,3 +409,424 @@ class TestBaseClientEventLoop:
         client.update_event_loop(new_loop)
 
         assert client.loop is new_loop
+
+
+class TestSocketReader:
+    """Test the buffered _SocketReader"""
+
+    @staticmethod
+    def _frame(payload):
+        body = json.dumps(payload).encode("utf-8")
+        return struct.pack("<II", 1, len(body)) + body
+
+    def test_read_whole_frame_with_one_recv(self):
+        """Test that preamble and body are pulled off the socket together"""
+        import socket
+
+        from pypresence.baseclient import _SocketReader
+
+        left, right = socket.socketpair()
+        with left, right:
+            right.sendall(self._frame({"evt": None, "data": {}}))
+            reader = _SocketReader(left)
+            calls = []
+            real_recv_into = left.recv_into
+
+            def counting_recv_into(buf, *args):
+                calls.append(len(buf))
+                return real_recv_into(buf, *args)
+
+            reader._sock = Mock(recv_into=counting_recv_into)
+
+            preamble = reader.read(8)
+            op, length = struct.unpack("<II", preamble)
+            data = reader.read(length)
+
+            assert op == 1
+            assert json.loads(str(data, "utf-8")) == {"evt": None, "data": {}}
+            assert len(calls) == 1
+
+    def test_read_frame_split_across_recvs(self):
+        """Test reading a frame that arrives in several pieces"""
+        import socket
+
+        from pypresence.baseclient import _SocketReader
+
+        frame = self._frame({"evt": "READY", "data": {"v": 1}})
+        left, right = socket.socketpair()
+        with left, right:
+            reader = _SocketReader(left, bufsize=16)
+            chunks = [frame[i : i + 5] for i in range(0, len(frame), 5)]
+            for chunk in chunks:
+                right.sendall(chunk)
+
+            op, length = struct.unpack("<II", reader.read(8))
+            assert bytes(reader.read(length)) == frame[8:]
+
+    def test_read_grows_buffer_for_large_frames(self):
+        """Test that frames larger than the buffer are still read whole"""
+        import socket
+        import threading
+
+        from pypresence.baseclient import _SocketReader
+
+        frame = self._frame({"evt": None, "data": {"blob": "x" * 200_000}})
+        left, right = socket.socketpair()
+        with left, right:
+            sender = threading.Thread(target=right.sendall, args=(frame * 2,))
+            sender.start()
+            reader = _SocketReader(left, bufsize=1024)
+            for _ in range(2):
+                op, length = struct.unpack("<II", reader.read(8))
+                assert bytes(reader.read(length)) == frame[8:]
+            sender.join()
+
+    def test_read_eof_raises_broken_pipe(self):
+        """Test that a closed peer raises BrokenPipeError"""
+        import socket
+
+        from pypresence.baseclient import _SocketReader
+
+        left, right = socket.socketpair()
+        with left:
+            right.sendall(b"\x01\x00")
+            right.close()
+            reader = _SocketReader(left)
+            with pytest.raises(BrokenPipeError):
+                reader.read(8)
+
+
+class TestSocketWriter:
+    """Test the scatter/gather _SocketWriter"""
+
+    def test_send_data_writes_header_and_body_separately(self, client_id):
+        """Test that send_data hands header and body to writev unjoined"""
+        from pypresence.baseclient import _SocketWriter
+
+        client = BaseClient(client_id)
+        client.sock_writer = _SocketWriter(Mock())
+        client.sock_writer.writev = Mock()
+
+        client.send_data(1, {"cmd": "TEST"})
+
+        header, body = client.sock_writer.writev.call_args[0]
+        assert struct.unpack("<II", header) == (1, len(body))
+        assert json.loads(body) == {"cmd": "TEST"}
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="sendmsg is POSIX-only")
+    def test_writev_round_trip(self):
+        """Test that a frame written with writev arrives intact"""
+        import socket
+
+        from pypresence.baseclient import _SocketWriter
+
+        left, right = socket.socketpair()
+        with left, right:
+            _SocketWriter(left).writev(b"head", b"", b"body")
+            assert right.recv(16) == b"headbody"
+
+    def test_writev_resumes_partial_sends(self):
+        """Test that partial sendmsg calls continue from the right offset"""
+        from pypresence.baseclient import _SocketWriter
+
+        received = bytearray()
+
+        def sendmsg(buffers):
+            # Accept at most three bytes per call
+            data = b"".join(bytes(buf) for buf in buffers)[:3]
+            received.extend(data)
+            return len(data)
+
+        _SocketWriter(Mock(sendmsg=sendmsg)).writev(b"12345678", b"abcdefg")
+
+        assert bytes(received) == b"12345678abcdefg"
+
+    def test_writev_falls_back_without_sendmsg(self):
+        """Test that sockets without sendmsg get a single joined write"""
+        from pypresence.baseclient import _SocketWriter
+
+        sock = Mock(spec=["send"])
+        sock.send.side_effect = lambda data: len(data)
+
+        _SocketWriter(sock).writev(b"head", b"body")
+
+        assert bytes(sock.send.call_args[0][0]) == b"headbody"
+
+    def test_write_zero_sent_raises_broken_pipe(self):
+        """Test that a send returning zero bytes raises BrokenPipeError"""
+        from pypresence.baseclient import _SocketWriter
+
+        sock = Mock(spec=["send"])
+        sock.send.return_value = 0
+
+        with pytest.raises(BrokenPipeError):
+            _SocketWriter(sock).write(b"data")
+
+
+class TestBaseClientMultiplexer:
+    """Test nonce-correlated requests"""
+
+    def test_send_request_returns_matching_reply(self, client_id, frame_reader):
+        """Test that a request's result is the reply carrying its nonce"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.sock_reader = frame_reader(
+            {"cmd": "GET_GUILD", "evt": None, "nonce": "1", "data": {"id": "g"}}
+        )
+
+        request = client.send_request(1, {"cmd": "GET_GUILD", "nonce": "1"})
+
+        assert not request.done()
+        assert request.result()["data"] == {"id": "g"}
+        assert request.done()
+        assert client._pending == {}
+
+    def test_out_of_order_replies(self, client_id, frame_reader):
+        """Test that pipelined requests each get their own reply"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.sock_reader = frame_reader(
+            {"cmd": "GET_CHANNEL", "evt": None, "nonce": "b", "data": {"id": 2}},
+            {"cmd": "GET_CHANNEL", "evt": None, "nonce": "a", "data": {"id": 1}},
+        )
+
+        first = client.send_request(1, {"cmd": "GET_CHANNEL", "nonce": "a"})
+        second = client.send_request(1, {"cmd": "GET_CHANNEL", "nonce": "b"})
+
+        assert first.result()["data"] == {"id": 1}
+        assert second.done()
+        assert second.result()["data"] == {"id": 2}
+
+    def test_interleaved_event_is_dispatched(self, client_id, frame_reader):
+        """Test that a DISPATCH frame is not mistaken for the reply"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.sock_reader = frame_reader(
+            {"cmd": "DISPATCH", "evt": "MESSAGE_CREATE", "nonce": None, "data": {}},
+            {"cmd": "SUBSCRIBE", "evt": "MESSAGE_CREATE", "nonce": "1", "data": {}},
+        )
+        client._dispatch_event = Mock()
+
+        reply = client.send_request(1, {"cmd": "SUBSCRIBE", "nonce": "1"}).result()
+
+        assert reply["cmd"] == "SUBSCRIBE"
+        client._dispatch_event.assert_called_once()
+        assert client._dispatch_event.call_args[0][0]["cmd"] == "DISPATCH"
+
+    def test_error_reply_raises_for_its_request(self, client_id, frame_reader):
+        """Test that an ERROR reply raises ServerError from result()"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.sock_reader = frame_reader(
+            {"evt": "ERROR", "nonce": "1", "data": {"message": "Bad channel"}}
+        )
+
+        request = client.send_request(1, {"cmd": "GET_CHANNEL", "nonce": "1"})
+
+        with pytest.raises(ServerError, match="Bad channel"):
+            request.result()
+
+    def test_duplicate_nonce_raises(self, client_id):
+        """Test that reusing an in-flight nonce is rejected"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.send_request(1, {"cmd": "TEST", "nonce": "1"})
+
+        with pytest.raises(PyPresenceException, match="already in flight"):
+            client.send_request(1, {"cmd": "TEST", "nonce": "1"})
+
+    def test_failed_send_forgets_request(self, client_id):
+        """Test that a request whose write fails is not left pending"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+        client.sock_writer.write.side_effect = BrokenPipeError()
+
+        with pytest.raises(PipeClosed):
+            client.send_request(1, {"cmd": "TEST", "nonce": "1"})
+        assert client._pending == {}
+
+
+class TestBaseClientPoll:
+    """Test the non-blocking poll() pump"""
+
+    @staticmethod
+    def _connect(client):
+        import socket
+
+        from pypresence.baseclient import _SocketReader, _SocketWriter
+
+        left, right = socket.socketpair()
+        client.sock_reader = _SocketReader(left)
+        client.sock_writer = _SocketWriter(left)
+        return left, right
+
+    @staticmethod
+    def _frame(payload):
+        body = json.dumps(payload).encode("utf-8")
+        return struct.pack("<II", 1, len(body)) + body
+
+    def test_poll_returns_immediately_when_nothing_ready(self, client_id):
+        """Test that poll does not block on an idle pipe"""
+        client = BaseClient(client_id, nonblocking=True)
+        left, right = self._connect(client)
+        with left, right:
+            request = client._command({"cmd": "TEST", "nonce": "1"})
+
+            assert client.poll() == 0
+            assert not request.done()
+
+    def test_poll_completes_pending_requests(self, client_id):
+        """Test that poll routes replies and events that are ready"""
+        client = BaseClient(client_id, nonblocking=True)
+        client._dispatch_event = Mock()
+        left, right = self._connect(client)
+        with left, right:
+            request = client._command({"cmd": "TEST", "nonce": "1"})
+            right.sendall(
+                self._frame({"cmd": "DISPATCH", "evt": "READY", "nonce": None})
+                + self._frame({"cmd": "TEST", "evt": None, "nonce": "1"})
+            )
+
+            assert client.poll() == 2
+            assert request.done()
+            assert request.result()["cmd"] == "TEST"
+            client._dispatch_event.assert_called_once()
+
+    def test_poll_leaves_partial_frames_buffered(self, client_id):
+        """Test that half a frame is kept until the rest arrives"""
+        client = BaseClient(client_id, nonblocking=True)
+        left, right = self._connect(client)
+        with left, right:
+            request = client._command({"cmd": "TEST", "nonce": "1"})
+            frame = self._frame({"cmd": "TEST", "evt": None, "nonce": "1"})
+            right.sendall(frame[:5])
+
+            assert client.poll() == 0
+            right.sendall(frame[5:])
+            assert client.poll() == 1
+            assert request.done()
+
+    def test_poll_respects_max_frames(self, client_id):
+        """Test that poll stops after max_frames frames"""
+        client = BaseClient(client_id, nonblocking=True)
+        client._dispatch_event = Mock()
+        left, right = self._connect(client)
+        with left, right:
+            event = self._frame({"cmd": "DISPATCH", "evt": "READY", "nonce": None})
+            right.sendall(event * 3)
+
+            assert client.poll(max_frames=2) == 2
+            assert client.poll() == 1
+
+    def test_poll_raises_pipe_closed(self, client_id):
+        """Test that a closed pipe surfaces as PipeClosed"""
+        client = BaseClient(client_id, nonblocking=True)
+        left, right = self._connect(client)
+        with left:
+            right.close()
+            with pytest.raises(PipeClosed):
+                client.poll()
+
+
+class TestBaseClientResponseTimeout:
+    """Test request deadlines"""
+
+    _connect = staticmethod(TestBaseClientPoll._connect)
+    _frame = staticmethod(TestBaseClientPoll._frame)
+
+    def test_unanswered_request_times_out(self, client_id):
+        """Test that result() gives up at the response_timeout deadline"""
+        client = BaseClient(client_id, response_timeout=0.05)
+        left, right = self._connect(client)
+        with left, right:
+            request = client.send_request(1, {"cmd": "TEST", "nonce": "1"})
+
+            with pytest.raises(ResponseTimeout):
+                request.result()
+            assert request.done()
+            assert client._pending == {}
+
+    def test_per_call_timeout_overrides_default(self, client_id):
+        """Test that timeout= applies even when response_timeout is off"""
+        client = BaseClient(client_id, response_timeout=None)
+        left, right = self._connect(client)
+        with left, right:
+            with pytest.raises(ResponseTimeout):
+                client._command({"cmd": "TEST", "nonce": "1"}, timeout=0.05)
+
+    def test_expiry_only_hits_overdue_requests(self, client_id):
+        """Test that one request timing out leaves the others waiting"""
+        client = BaseClient(client_id)
+        left, right = self._connect(client)
+        with left, right:
+            fast = client.send_request(1, {"cmd": "TEST", "nonce": "a"}, 0.02)
+            slow = client.send_request(1, {"cmd": "TEST", "nonce": "b"}, 5)
+
+            with pytest.raises(ResponseTimeout):
+                fast.result()
+            assert not slow.done()
+
+            right.sendall(self._frame({"cmd": "TEST", "evt": None, "nonce": "b"}))
+            assert slow.result()["nonce"] == "b"
+
+    def test_waiting_expires_other_requests(self, client_id):
+        """Test that a caller waiting on one reply times out the rest on time"""
+        client = BaseClient(client_id)
+        left, right = self._connect(client)
+        with left, right:
+            overdue = [
+                client.send_request(1, {"cmd": "TEST", "nonce": str(i)}, 0.01)
+                for i in range(50)
+            ]
+            waiting = client.send_request(1, {"cmd": "TEST", "nonce": "w"}, 0.2)
+
+            with pytest.raises(ResponseTimeout):
+                waiting.result()
+            assert all(request.done() for request in overdue)
+            assert client._pending == {}
+
+    def test_late_reply_is_dropped(self, client_id):
+        """Test that a reply arriving after the timeout isn't an event"""
+        client = BaseClient(client_id, nonblocking=True)
+        client._dispatch_event = Mock()
+        left, right = self._connect(client)
+        with left, right:
+            request = client._command({"cmd": "TEST", "nonce": "1"}, timeout=0)
+            client.poll()
+            assert request.done()
+
+            right.sendall(self._frame({"cmd": "TEST", "evt": None, "nonce": "1"}))
+            assert client.poll() == 1
+            client._dispatch_event.assert_not_called()
+            with pytest.raises(ResponseTimeout):
+                request.result()
+
+    def test_expired_nonces_are_bounded(self, client_id, monkeypatch):
+        """Test that replies that never come don't grow memory forever"""
+        monkeypatch.setattr(baseclient, "_MAX_EXPIRED", 8)
+        client = BaseClient(client_id, nonblocking=True)
+        left, right = self._connect(client)
+        with left, right:
+            for i in range(20):
+                client._command({"cmd": "TEST", "nonce": str(i)}, timeout=0)
+            client.poll()
+
+            assert list(client._expired) == [str(i) for i in range(12, 20)]
+
+    def test_next_deadline(self, client_id):
+        """Test the time left until the next request expires"""
+        client = BaseClient(client_id, response_timeout=None)
+        left, right = self._connect(client)
+        with left, right:
+            assert client.next_deadline() is None
+            client.send_request(1, {"cmd": "TEST", "nonce": "1"}, 30)
+            client.send_request(1, {"cmd": "TEST", "nonce": "2"}, 10)
+            assert 9 < client.next_deadline() <= 10
+
+    def test_read_output_timeout(self, client_id):
+        """Test that waiting for the next frame can time out"""
+        client = BaseClient(client_id)
+        left, right = self._connect(client)
+        with left, right:
+            with pytest.raises(ResponseTimeout):
+                client.read_output(timeout=0.02)
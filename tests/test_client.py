@@ -0,0 +1,195 @@
+"""Test Client class with mocked I/O"""
+
+import json
+import struct
+from unittest.mock import Mock
+
+import pytest
+
+from pypresence import Client
+from pypresence.exceptions import DiscordError, ServerError
+from pypresence.payloads import Payload, PreparedPayload
+
+
+def _sent_payloads(writer):
+    """Decode every frame written to a mock writer"""
+    payloads = []
+    for call in writer.write.call_args_list:
+        data = call[0][0]
+        op, length = struct.unpack("<II", data[:8])
+        payloads.append(json.loads(data[8 : 8 + length]))
+    return payloads
+
+
+class TestClientCommands:
+    """Test Client RPC commands"""
+
+    def test_command_waits_for_its_nonce(self, client_id, frame_reader):
+        """Test that a command skips events and returns its own reply"""
+        client = Client(client_id)
+        client.sock_writer = Mock()
+        handler = Mock()
+        client._events["message_create"] = handler
+
+        def write(data):
+            nonce = json.loads(data[8:])["nonce"]
+            client.sock_reader = frame_reader(
+                {"cmd": "DISPATCH", "evt": "MESSAGE_CREATE", "data": {"id": 1}},
+                {"cmd": "GET_GUILD", "evt": None, "nonce": nonce, "data": {}},
+            )
+
+        client.sock_writer.write.side_effect = write
+
+        reply = client.get_guild("1234")
+
+        assert reply["cmd"] == "GET_GUILD"
+        handler.assert_called_once_with({"id": 1})
+
+    def test_unhandled_error_event_raises(self, client_id):
+        """Test that an ERROR event with no waiter raises DiscordError"""
+        client = Client(client_id)
+
+        with pytest.raises(DiscordError):
+            client._dispatch_event(
+                {"evt": "ERROR", "data": {"code": 4000, "message": "Bad"}}
+            )
+
+    def test_pipelined_get_channel(self, client_id, monkeypatch, frame_reader):
+        """Test that several GET_CHANNEL requests can be in flight at once"""
+        import itertools
+
+        from pypresence.payloads import Payload
+
+        monkeypatch.setattr(Payload, "time", itertools.count().__next__)
+        client = Client(client_id)
+        client.sock_writer = Mock()
+
+        requests = [
+            client.send_request(1, Payload.get_channel(str(channel_id)))
+            for channel_id in range(3)
+        ]
+        sent = _sent_payloads(client.sock_writer)
+        client.sock_reader = frame_reader(
+            *(
+                {
+                    "cmd": "GET_CHANNEL",
+                    "evt": None,
+                    "nonce": payload["nonce"],
+                    "data": {"id": payload["args"]["channel_id"]},
+                }
+                for payload in reversed(sent)
+            )
+        )
+
+        assert [r.result()["data"]["id"] for r in requests] == ["0", "1", "2"]
+
+
+class TestClientBatch:
+    """Test pipelining commands with Client.batch()"""
+
+    @staticmethod
+    def _split_frames(data):
+        payloads = []
+        while data:
+            op, length = struct.unpack("<II", data[:8])
+            payloads.append(json.loads(data[8 : 8 + length]))
+            data = data[8 + length :]
+        return payloads
+
+    def test_batch_is_one_write(self, client_id, frame_reader):
+        """Test that every command in a batch goes out in a single write"""
+        client = Client(client_id)
+        client.sock_writer = Mock()
+        sent = []
+
+        def write(data):
+            sent.extend(self._split_frames(data))
+            # Discord answers in its own order; reply last-first
+            replies = [
+                {"cmd": p["cmd"], "evt": None, "nonce": p["nonce"], "data": p["args"]}
+                for p in reversed(sent)
+            ]
+            client.sock_reader = frame_reader(*replies)
+
+        client.sock_writer.write.side_effect = write
+
+        with client.batch() as batch:
+            for channel_id in range(5):
+                batch.add(Payload.get_channel(channel_id))
+
+        assert client.sock_writer.write.call_count == 1
+        assert [p["args"]["channel_id"] for p in sent] == ["0", "1", "2", "3", "4"]
+        replies = [result["data"]["channel_id"] for result in batch.results]
+        assert replies == ["0", "1", "2", "3", "4"]
+        assert client._pending == {}
+
+    def test_batch_keeps_errors_in_place(self, client_id, frame_reader):
+        """Test that one failing command doesn't lose the other replies"""
+        client = Client(client_id)
+        client.sock_writer = Mock()
+
+        def write(data):
+            first, second = self._split_frames(data)
+            error = {"evt": "ERROR", "data": {"message": "bad"}}
+            reply = {"cmd": "GET_GUILD", "evt": None, "data": {}}
+            client.sock_reader = frame_reader(
+                dict(error, nonce=first["nonce"]), dict(reply, nonce=second["nonce"])
+            )
+
+        client.sock_writer.write.side_effect = write
+
+        with client.batch() as batch:
+            batch.add(Payload.get_guild("1"))
+            batch.add(Payload.get_guild("2"))
+
+        assert isinstance(batch.results[0], ServerError)
+        assert batch.results[1]["cmd"] == "GET_GUILD"
+
+    def test_duplicate_nonces_are_made_unique(self, client_id):
+        """Test that payloads built in the same instant can share a batch"""
+        client = Client(client_id)
+        batch = client.batch()
+        batch.add({"cmd": "GET_GUILD", "nonce": "1"})
+        batch.add({"cmd": "GET_GUILD", "nonce": "1"})
+
+        nonces = [payload["nonce"] for payload in batch._payloads]
+        assert len(set(nonces)) == 2
+
+    def test_duplicate_prepared_payload_is_reencoded(self, client_id):
+        """Test that a renamed nonce is also the one on the wire"""
+        from pypresence.activity import Activity
+
+        client = Client(client_id)
+        first = Activity(state="A").payload(1)
+        duplicate = PreparedPayload(first.encode(), first.nonce)
+        batch = client.batch()
+        batch.add(first)
+        batch.add(duplicate)
+
+        second = batch._payloads[1]
+        assert second.nonce != first.nonce
+        assert json.loads(second.encode())["nonce"] == second.nonce
+
+    def test_failed_write_forgets_requests(self, client_id):
+        """Test that nothing is left pending when the write fails"""
+        from pypresence.exceptions import PipeClosed
+
+        client = Client(client_id)
+        client.sock_writer = Mock()
+        client.sock_writer.write.side_effect = BrokenPipeError()
+
+        with pytest.raises(PipeClosed):
+            with client.batch() as batch:
+                batch.add(Payload.get_guild("1"))
+        assert client._pending == {}
+
+    def test_empty_batch(self, client_id):
+        """Test that an empty batch sends nothing"""
+        client = Client(client_id)
+        client.sock_writer = Mock()
+
+        with client.batch() as batch:
+            pass
+
+        assert batch.results == []
+        assert not client.sock_writer.write.called
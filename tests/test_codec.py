@@ -0,0 +1,92 @@
+"""Test JSON codec selection"""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from pypresence.baseclient import BaseClient
+from pypresence.codec import JSONCodec, get_codec
+from pypresence.exceptions import InvalidArgument
+
+
+class TestGetCodec:
+    """Test get_codec()"""
+
+    def test_default_is_stdlib(self):
+        """Test that the standard library codec is the default"""
+        assert isinstance(get_codec(), JSONCodec)
+
+    def test_auto_falls_back_to_stdlib(self, monkeypatch):
+        """Test that auto uses the stdlib when no fast library is installed"""
+        import builtins
+
+        real_import = builtins.__import__
+
+        def fake_import(name, *args, **kwargs):
+            if name in ("orjson", "ujson"):
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        monkeypatch.setattr(builtins, "__import__", fake_import)
+
+        assert get_codec("auto").name == "json"
+
+    def test_auto_prefers_orjson(self):
+        """Test that auto picks orjson when it is installed"""
+        pytest.importorskip("orjson")
+
+        assert get_codec("auto").name == "orjson"
+
+    def test_unknown_name_raises(self):
+        """Test that an unknown codec name is rejected"""
+        with pytest.raises(InvalidArgument):
+            get_codec("yaml")
+
+    def test_custom_codec_object(self):
+        """Test that objects with dumps and loads are used as-is"""
+        codec = Mock()
+        assert get_codec(codec) is codec
+
+    def test_object_without_loads_raises(self):
+        """Test that objects missing loads are rejected"""
+        with pytest.raises(InvalidArgument):
+            get_codec(object())
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "ujson"])
+class TestCodecs:
+    """Test each codec round-trips frames"""
+
+    def test_dumps_returns_bytes(self, name):
+        """Test that dumps encodes straight to bytes"""
+        pytest.importorskip(name)
+        codec = get_codec(name)
+        body = codec.dumps({"cmd": "TEST", "args": {"state": "café"}})
+
+        assert isinstance(body, bytes)
+        assert json.loads(body) == {"cmd": "TEST", "args": {"state": "café"}}
+
+    def test_loads_accepts_memoryview(self, name):
+        """Test that loads takes the reader's memoryview slices"""
+        pytest.importorskip(name)
+        codec = get_codec(name)
+        data = memoryview(bytearray(b'xx{"evt": null}'))[2:]
+
+        assert codec.loads(data) == {"evt": None}
+
+
+class TestClientCodec:
+    """Test that clients use their codec"""
+
+    def test_send_data_uses_codec(self, client_id):
+        """Test that send_data encodes with the client's codec"""
+        codec = Mock()
+        codec.dumps.return_value = b"{}"
+        client = BaseClient(client_id, codec=codec)
+        client.sock_writer = Mock()
+
+        client.send_data(1, {"cmd": "TEST"})
+
+        codec.dumps.assert_called_once_with({"cmd": "TEST"})
+        assert client.sock_writer.write.call_args[0][0][8:] == b"{}"
@@ -0,0 +1,179 @@
+"""Test running event handlers on an executor"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pypresence.client import Client
+from pypresence.dispatcher import EventDispatcher
+from pypresence.exceptions import InvalidArgument
+
+
+class ManualExecutor:
+    """Executor that only runs submitted work when asked to"""
+
+    def __init__(self):
+        self.work = []
+
+    def submit(self, fn, *args):
+        self.work.append((fn, args))
+
+    def run(self):
+        while self.work:
+            fn, args = self.work.pop(0)
+            fn(*args)
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+class TestEventDispatcher:
+    """Test EventDispatcher ordering, queue limits and counters"""
+
+    def test_serial_within_event_type(self, pool):
+        """Test that one event type is handled in order, one at a time"""
+        seen = []
+        active = []
+
+        def handler(data):
+            active.append(data)
+            assert len(active) == 1
+            time.sleep(0.001)
+            seen.append(data)
+            active.pop()
+
+        dispatcher = EventDispatcher(pool)
+        for i in range(20):
+            dispatcher.dispatch("message_create", handler, i)
+
+        assert dispatcher.join(5)
+        assert seen == list(range(20))
+        assert dispatcher.stats["message_create"].handled == 20
+
+    def test_parallel_across_event_types(self, pool):
+        """Test that a slow type doesn't hold up another type"""
+        barrier = threading.Barrier(2, timeout=5)
+        dispatcher = EventDispatcher(pool)
+
+        dispatcher.dispatch("a", lambda data: barrier.wait(), None)
+        dispatcher.dispatch("b", lambda data: barrier.wait(), None)
+
+        assert dispatcher.join(5)
+        assert dispatcher.stats["a"].errors == 0
+        assert dispatcher.stats["b"].errors == 0
+
+    def test_drop_policy(self):
+        """Test that events past max_queue are dropped and counted"""
+        executor = ManualExecutor()
+        seen = []
+        dispatcher = EventDispatcher(executor, max_queue=2, policy="drop")
+
+        results = [dispatcher.dispatch("a", seen.append, i) for i in range(4)]
+
+        assert results == [True, True, False, False]
+        assert dispatcher.stats["a"].depth == 2
+        assert dispatcher.stats["a"].dropped == 2
+        executor.run()
+        assert seen == [0, 1]
+        assert dispatcher.stats["a"].depth == 0
+        assert dispatcher.stats["a"].max_depth == 2
+
+    def test_block_policy(self):
+        """Test that dispatching to a full queue waits for room"""
+        executor = ManualExecutor()
+        seen = []
+        dispatcher = EventDispatcher(executor, max_queue=1, policy="block")
+        dispatcher.dispatch("a", seen.append, 0)
+
+        blocked = threading.Thread(
+            target=dispatcher.dispatch, args=("a", seen.append, 1)
+        )
+        blocked.start()
+        blocked.join(0.05)
+        assert blocked.is_alive()
+
+        executor.run()
+        blocked.join(5)
+        assert not blocked.is_alive()
+        executor.run()
+        assert seen == [0, 1]
+
+    def test_one_drain_per_event_type(self):
+        """Test that queued events of a type share one executor job"""
+        executor = ManualExecutor()
+        dispatcher = EventDispatcher(executor)
+
+        for i in range(5):
+            dispatcher.dispatch("a", lambda data: None, i)
+        dispatcher.dispatch("b", lambda data: None, 0)
+
+        assert len(executor.work) == 2
+
+    def test_handler_errors_are_counted(self):
+        """Test that a failing handler doesn't stop the queue"""
+        executor = ManualExecutor()
+        seen = []
+
+        def handler(data):
+            if data == 0:
+                raise ValueError("bad")
+            seen.append(data)
+
+        dispatcher = EventDispatcher(executor)
+        dispatcher.dispatch("a", handler, 0)
+        dispatcher.dispatch("a", handler, 1)
+        executor.run()
+
+        assert seen == [1]
+        assert dispatcher.stats["a"].errors == 1
+        assert isinstance(dispatcher.last_error, ValueError)
+
+    def test_latency_counters(self):
+        """Test that handler run time is recorded"""
+        executor = ManualExecutor()
+        dispatcher = EventDispatcher(executor)
+        dispatcher.dispatch("a", lambda data: time.sleep(0.01), None)
+        executor.run()
+
+        stats = dispatcher.stats["a"]
+        assert stats.max_latency >= 0.01
+        assert stats.mean_latency == stats.total_latency
+
+    def test_invalid_policy(self):
+        """Test that an unknown policy is rejected"""
+        with pytest.raises(InvalidArgument):
+            EventDispatcher(ManualExecutor(), policy="spill")
+
+
+class TestClientEventExecutor:
+    """Test Client handing events to an executor"""
+
+    def test_events_run_on_executor(self, client_id):
+        """Test that handlers are queued instead of called inline"""
+        executor = ManualExecutor()
+        client = Client(client_id, event_executor=executor)
+        seen = []
+        client._events["activity_join"] = seen.append
+
+        client._dispatch_event({"evt": "ACTIVITY_JOIN", "data": {"secret": "s"}})
+        assert seen == []
+        assert client.event_stats["activity_join"].depth == 1
+
+        executor.run()
+        assert seen == [{"secret": "s"}]
+
+    def test_inline_without_executor(self, client_id):
+        """Test that handlers still run inline by default"""
+        client = Client(client_id)
+        seen = []
+        client._events["activity_join"] = seen.append
+
+        client._dispatch_event({"evt": "ACTIVITY_JOIN", "data": {}})
+
+        assert seen == [{}]
+        assert client.event_stats == {}
@@ -0,0 +1,240 @@
+"""Test Presence and Client against the in-process fake Discord server"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from pypresence import Client, Presence
+from pypresence.exceptions import DiscordError, PipeClosed, ResponseTimeout, ServerError
+from pypresence.payloads import Payload
+from pypresence.utils import get_ipc_path
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="The fake server only speaks UNIX sockets"
+)
+
+if sys.platform != "win32":
+    from pypresence.fakeserver import FakeDiscordServer
+
+
+@pytest.fixture
+def server():
+    with FakeDiscordServer() as server, server.installed():
+        yield server
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+class TestFakeDiscordServer:
+    """Test the fake server over a real socket"""
+
+    def test_discovered_by_get_ipc_path(self, server):
+        """Test that installed() points IPC discovery at the server"""
+        assert get_ipc_path(use_cache=False) == server.path
+
+    def test_presence_update(self, server, client_id):
+        """Test a full connect/update/clear round-trip"""
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            response = RPC.update(state="Testing", details="Fake server")
+            assert response["data"]["state"] == "Testing"
+            assert server.activity["state"] == "Testing"
+
+            RPC.clear()
+            assert server.activity is None
+        finally:
+            RPC.close()
+        assert [c["cmd"] for c in server.commands] == ["SET_ACTIVITY"] * 2
+
+    def test_latency(self, server, client_id):
+        """Test that replies are held back by the configured latency"""
+        server.latency = 0.02
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            start = time.perf_counter()
+            RPC.update(state="Slow")
+            assert time.perf_counter() - start >= 0.02
+        finally:
+            RPC.close()
+
+    def test_scripted_error(self, server, client_id):
+        """Test that scripted errors come back as ServerError"""
+        server.script_error("SET_ACTIVITY", code=4000, message="Bad activity")
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            with pytest.raises(ServerError, match="Bad activity"):
+                RPC.update(state="Rejected")
+            assert RPC.update(state="Accepted")["data"]["state"] == "Accepted"
+        finally:
+            RPC.close()
+
+    def test_invalid_client_id(self, server, client_id):
+        """Test that the handshake is refused for an unknown client ID"""
+        server.invalid_client_ids.add(client_id)
+        RPC = Presence(client_id)
+        try:
+            with pytest.raises(DiscordError):
+                RPC.connect()
+        finally:
+            RPC.sock_writer.close()
+
+    def test_activity_rate_limit(self, server, client_id):
+        """Test that updates past the rate limit are acknowledged but dropped"""
+        server.activity_rate = (2, 60.0)
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            for i in range(4):
+                RPC.update(state=str(i))
+        finally:
+            RPC.close()
+        assert server.activity["state"] == "1"
+        assert server.dropped_activities == 2
+
+    def test_event_injection(self, server, client_id):
+        """Test that injected events reach subscribed handlers"""
+        seen = []
+        client = Client(client_id)
+        client.start()
+        try:
+            client.register_event("ACTIVITY_JOIN", seen.append)
+            assert server.send_event("ACTIVITY_JOIN", {"secret": "s"}) == 1
+            assert server.send_event("ACTIVITY_SPECTATE", {"secret": "x"}) == 0
+            # The event is read along with the next reply
+            client.get_selected_voice_channel()
+            wait_for(lambda: seen)
+        finally:
+            client.close()
+        assert seen == [{"secret": "s"}]
+
+    def test_handlers(self, server, client_id):
+        """Test that custom handlers answer other commands"""
+        server.handlers["GET_CHANNEL"] = lambda args: {"id": args["channel_id"]}
+        client = Client(client_id)
+        client.start()
+        try:
+            with client.batch() as batch:
+                for i in range(10):
+                    batch.add(Payload.get_channel(str(i)))
+        finally:
+            client.close()
+        assert [r["data"]["id"] for r in batch.results] == [str(i) for i in range(10)]
+
+    def test_disconnect_all(self, server, client_id):
+        """Test dropping every connection"""
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            wait_for(lambda: server.connections == 1)
+            server.disconnect_all()
+            assert server.connections == 0
+            with pytest.raises(PipeClosed):
+                RPC.update(state="Gone")
+        finally:
+            # Nothing to say goodbye to, so just drop our end
+            RPC.sock_writer.close()
+
+    def test_threaded_presence(self, server, client_id):
+        """Test threaded Presence mode over a real socket"""
+        RPC = Presence(client_id, threaded=True)
+        RPC.connect()
+        try:
+            futures = [RPC.update(state=str(i)) for i in range(5)]
+            assert [f.result(5)["data"]["state"] for f in futures] == [
+                str(i) for i in range(5)
+            ]
+        finally:
+            RPC.close()
+        assert not any(t.name == "pypresence-io" for t in threading.enumerate())
+
+    def test_server_keeps_reading_while_replies_back_up(self, server, client_id):
+        """Test that pipelining more than the socket buffers hold doesn't stall"""
+        RPC = Presence(client_id, threaded=True, queue_size=2000)
+        RPC.connect()
+        try:
+            futures = [RPC.update(state="x" * 200) for _ in range(2000)]
+            assert all(f.result(10)["data"]["state"] for f in futures)
+        finally:
+            RPC.close()
+
+    def test_response_timeout(self, server, client_id):
+        """Test that slow replies time out for the caller that asked"""
+        server.latency = 0.2
+        client = Client(client_id)
+        client.start()
+        try:
+            with pytest.raises(ResponseTimeout):
+                client.get_guilds(timeout=0.02)
+            # The late reply is dropped rather than confusing the next call
+            assert client.get_guilds(timeout=5)["cmd"] == "GET_GUILDS"
+        finally:
+            client.close()
+
+    def test_threaded_response_timeout(self, server, client_id):
+        """Test that the I/O thread fails futures whose reply is overdue"""
+        server.latency = 0.2
+        RPC = Presence(client_id, threaded=True)
+        RPC.connect()
+        try:
+            future = RPC.update(state="Slow", timeout=0.02)
+            with pytest.raises(ResponseTimeout):
+                future.result(5)
+        finally:
+            RPC.close()
+
+
+class TestSkipDuplicates:
+    """Test that skipped duplicate updates match what Discord actually has"""
+
+    def test_nonblocking_retry_after_error(self, server, client_id):
+        """Test that an update answered with an error is sent again"""
+        server.script_error("SET_ACTIVITY", message="Bad activity")
+        RPC = Presence(client_id, nonblocking=True)
+        RPC.connect()
+        try:
+            with pytest.raises(ServerError):
+                RPC.update(state="Retry").result()
+            assert RPC.update(state="Retry").result()["data"]["state"] == "Retry"
+        finally:
+            RPC.close()
+        assert len(server.commands) == 2
+
+    def test_threaded_retry_after_timeout(self, server, client_id):
+        """Test that an update whose reply timed out is sent again"""
+        server.latency = 0.2
+        RPC = Presence(client_id, threaded=True)
+        RPC.connect()
+        try:
+            with pytest.raises(ResponseTimeout):
+                RPC.update(state="Retry", timeout=0.02).result(5)
+            server.latency = 0.0
+            assert RPC.update(state="Retry").result(5)["data"]["state"] == "Retry"
+        finally:
+            RPC.close()
+        assert len(server.commands) == 2
+
+    def test_lists_changed_in_place_are_sent(self, server, client_id):
+        """Test that mutating a list passed to update isn't mistaken for a repeat"""
+        size = [1, 4]
+        RPC = Presence(client_id)
+        RPC.connect()
+        try:
+            RPC.update(party_size=size)
+            size[0] = 2
+            RPC.update(party_size=size)
+            RPC.update(party_size=[2, 4])
+        finally:
+            RPC.close()
+        assert len(server.commands) == 2
+        assert server.activity["party"]["size"] == [2, 4]
+        assert RPC.cache_hits == 1
@@ -0,0 +1,158 @@
+"""Test the incremental frame decoder"""
+
+import json
+import random
+import struct
+from unittest.mock import Mock
+
+import pytest
+
+from pypresence.client import Client
+from pypresence.framing import FrameDecoder
+
+PAYLOADS = [
+    {"cmd": "DISPATCH", "evt": "READY", "data": {"v": 1}},
+    {},
+    {"evt": "ACTIVITY_JOIN", "data": {"secret": "é" * 40}},
+    {"cmd": "SET_ACTIVITY", "nonce": "1", "data": {"state": "x" * 300}},
+]
+
+
+def _frame(payload, op=1):
+    body = json.dumps(payload).encode("utf-8")
+    return struct.pack("<II", op, len(body)) + body
+
+
+STREAM = b"".join(_frame(payload, op) for op, payload in enumerate(PAYLOADS))
+EXPECTED = list(enumerate(PAYLOADS))
+
+
+def _decode(chunks):
+    decoder = FrameDecoder()
+    frames = []
+    for chunk in chunks:
+        decoder.feed(chunk)
+        frames.extend(decoder)
+    return frames, decoder
+
+
+class TestFrameDecoder:
+    """Test FrameDecoder with whole and split frames"""
+
+    def test_whole_frame(self):
+        """Test decoding one frame fed in one chunk"""
+        frames, decoder = _decode([_frame({"a": 1})])
+
+        assert frames == [(1, {"a": 1})]
+        assert len(decoder) == 0
+
+    def test_several_frames_in_one_chunk(self):
+        """Test that every frame in a chunk is returned, in order"""
+        frames, decoder = _decode([STREAM])
+
+        assert frames == EXPECTED
+
+    def test_partial_frame_is_kept(self):
+        """Test that an incomplete frame waits for the rest of its bytes"""
+        frame = _frame({"a": 1})
+        decoder = FrameDecoder()
+        decoder.feed(frame[:-1])
+
+        assert decoder.next_frame() is None
+        assert len(decoder) == len(frame) - 1
+        decoder.feed(frame[-1:])
+        assert decoder.next_frame() == (1, {"a": 1})
+
+    def test_split_at_every_byte(self):
+        """Test every two-chunk split of a multi-frame stream"""
+        for i in range(len(STREAM) + 1):
+            frames, decoder = _decode([STREAM[:i], STREAM[i:]])
+            assert frames == EXPECTED, i
+            assert len(decoder) == 0
+
+    def test_one_byte_at_a_time(self):
+        """Test feeding the stream one byte per chunk"""
+        frames, decoder = _decode(STREAM[i : i + 1] for i in range(len(STREAM)))
+
+        assert frames == EXPECTED
+
+    def test_random_chunking(self):
+        """Test random chunk sizes over a repeated stream"""
+        rng = random.Random(1234)
+        stream = STREAM * 20
+        for _ in range(50):
+            chunks = []
+            pos = 0
+            while pos < len(stream):
+                size = rng.randint(1, 700)
+                chunks.append(stream[pos : pos + size])
+                pos += size
+            frames, decoder = _decode(chunks)
+            assert frames == EXPECTED * 20
+
+    def test_malformed_body_is_skipped(self):
+        """Test that a body that doesn't parse doesn't block the frames after it"""
+        bad = b"{not json"
+        decoder = FrameDecoder()
+        decoder.feed(struct.pack("<II", 1, len(bad)) + bad + _frame({"a": 1}))
+
+        with pytest.raises(ValueError):
+            decoder.next_frame()
+        assert decoder.next_frame() == (1, {"a": 1})
+        decoder.feed(_frame({"b": 2}))
+        assert list(decoder) == [(1, {"b": 2})]
+
+    def test_kept_error_doesnt_pin_the_buffer(self):
+        """Test that feeding works while the caller holds a decode error"""
+        bad = b"{bad"
+        decoder = FrameDecoder()
+        decoder.feed(struct.pack("<II", 1, len(bad)) + bad)
+        try:
+            decoder.next_frame()
+        except ValueError as e:
+            last_error = e
+
+        decoder.feed(_frame({"a": 1}))
+        assert list(decoder) == [(1, {"a": 1})]
+        assert last_error.__traceback__ is not None
+
+    def test_custom_codec(self):
+        """Test that frames are decoded with the given codec"""
+        bodies = []
+        codec = Mock()
+        codec.loads.side_effect = lambda body: bodies.append(bytes(body)) or "decoded"
+        decoder = FrameDecoder(codec)
+        decoder.feed(_frame({"a": 1}))
+
+        assert list(decoder) == [(1, "decoded")]
+        assert bodies == [b'{"a": 1}']
+
+
+class TestClientOnEvent:
+    """Test Client.on_event with chunks that split frames"""
+
+    def test_split_event_is_dispatched(self, client_id):
+        """Test that an event split across chunks reaches its handler"""
+        client = Client(client_id)
+        handler = Mock()
+        client._events["activity_join"] = handler
+        frame = _frame({"evt": "ACTIVITY_JOIN", "data": {"secret": "s"}})
+
+        client.on_event(frame[:5])
+        assert not handler.called
+        client.on_event(frame[5:] + frame[:12])
+        client.on_event(frame[12:])
+
+        assert handler.call_count == 2
+        handler.assert_called_with({"secret": "s"})
+
+    def test_reply_completes_pending_request(self, client_id):
+        """Test that a reply fed to on_event resolves its request"""
+        client = Client(client_id)
+        client.sock_writer = Mock()
+        request = client.send_request(1, {"cmd": "GET_GUILDS", "nonce": "7"})
+
+        client.on_event(_frame({"cmd": "GET_GUILDS", "evt": None, "nonce": "7"}))
+
+        assert request.done()
+        assert request.result()["nonce"] == "7"
@@ -0,0 +1,120 @@
+"""Test that importing pypresence stays cheap"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative microseconds ``import pypresence`` may take under -X importtime,
+# best of a few runs. Wall-clock budgets are flaky on shared CI runners, so
+# the check only runs when a budget is set, e.g. 75000: importing everything
+# eagerly took ~145ms here and lazily ~25ms.
+IMPORT_BUDGET_US = os.environ.get("PYPRESENCE_IMPORT_BUDGET_US")
+
+# What ``from pypresence import *`` gave before the names were made lazy
+BASELINE_STAR = {
+    "BaseClient",
+    "AioClient",
+    "Client",
+    "AioPresence",
+    "Presence",
+    "ActivityType",
+    "StatusDisplayType",
+    "PyPresenceException",
+    "DiscordNotFound",
+    "InvalidPipe",
+    "InvalidArgument",
+    "ServerError",
+    "DiscordError",
+    "InvalidID",
+    "ArgumentError",
+    "EventNotFound",
+    "PipeClosed",
+}
+
+# Only needed by the async classes, the Windows pipe or registering handlers
+DEFERRED = ("asyncio", "ctypes", "inspect", "concurrent.futures", "tempfile")
+
+
+def run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time_us() -> int:
+    """Cumulative import time of the pypresence package, in microseconds"""
+    stderr = run("import pypresence", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "pypresence":
+            return int(parts[1])
+    raise AssertionError("pypresence missing from -X importtime output")
+
+
+class TestLazyImports:
+    """Test that public names load their modules on first use"""
+
+    def test_import_defers_heavy_modules(self):
+        """Test that importing the sync clients doesn't import asyncio and friends"""
+        code = (
+            "import sys, pypresence\n"
+            "from pypresence import Client, Presence, PipeClosed\n"
+            "print(' '.join(m for m in {0!r} if m in sys.modules))".format(DEFERRED)
+        )
+        assert run(code).stdout.split() == []
+
+    def test_aio_classes_load_on_access(self):
+        """Test that the async classes import asyncio when first used"""
+        code = (
+            "import sys, pypresence\n"
+            "assert 'asyncio' not in sys.modules\n"
+            "from pypresence import AioPresence\n"
+            "from pypresence.presence import AioPresence as Shim\n"
+            "assert AioPresence is Shim\n"
+            "print('asyncio' in sys.modules)"
+        )
+        assert run(code).stdout.strip() == "True"
+
+    def test_public_names_resolve(self):
+        """Test that every lazy name resolves and is listed by dir()"""
+        import pypresence
+
+        for name in pypresence._LAZY:
+            assert getattr(pypresence, name).__name__ == name
+            assert name in dir(pypresence)
+
+    def test_star_import_exports_public_names(self):
+        """Test that ``import *`` gives every public name but not the helpers"""
+        namespace = {}
+        exec("from pypresence import *", namespace)
+        names = set(namespace) - {"__builtins__"}
+
+        assert BASELINE_STAR <= names
+        assert names >= set(__import__("pypresence")._LAZY)
+        assert not {"importlib", "TYPE_CHECKING"} & names
+
+    def test_unknown_name_raises_attribute_error(self):
+        """Test that a missing name still raises AttributeError"""
+        import pypresence
+
+        with pytest.raises(AttributeError):
+            pypresence.NotAThing
+
+
+@pytest.mark.skipif(
+    IMPORT_BUDGET_US is None, reason="Set PYPRESENCE_IMPORT_BUDGET_US to run"
+)
+class TestImportTime:
+    """Test the import time of the package against a budget"""
+
+    def test_import_within_budget(self):
+        """Test that ``import pypresence`` fits in PYPRESENCE_IMPORT_BUDGET_US"""
+        best = min(import_time_us() for _ in range(3))
+        message = "import pypresence took {0}us".format(best)
+        assert best <= int(IMPORT_BUDGET_US), message
@@ -2,8 +2,9 @@
 
 import json
 import os
+import threading
 
-from pypresence.payloads import Payload
+from pypresence.payloads import NonceGenerator, Payload
 from pypresence.types import ActivityType, StatusDisplayType
 
 
@@ -213,15 +214,65 @@ class TestSetActivity:
         # Assets should be removed if all are None
         assert "assets" not in activity or activity["assets"]
 
-    def test_nonce_is_unique(self):
-        """Test that each payload gets a unique nonce"""
-        import time
+    def test_commands_drop_none_and_empty_args(self):
+        """Test that commands built pre-pruned match what remove_none gave"""
+        voice = Payload.set_user_voice_settings("1", pan_left=0.5, volume=None)
+
+        assert voice.data["args"] == {"user_id": "1", "pan": {"left": 0.5}}
+        assert "args" not in Payload.get_guilds().data
+        assert Payload.authorize("1", None).data["args"] == {"client_id": "1"}
 
+    def test_nonce_is_unique(self):
+        """Test that each payload gets a unique nonce, however fast they are built"""
         payload1 = Payload.set_activity(state="Test 1")
-        time.sleep(0.001)  # Small delay to ensure different timestamp
         payload2 = Payload.set_activity(state="Test 2")
 
         assert payload1.data["nonce"] != payload2.data["nonce"]
+        assert payload1.nonce.startswith(Payload.nonces.prefix)
+
+
+class TestNonceGenerator:
+    """Test the prefix and counter nonce generator"""
+
+    def test_nonces_count_up_after_prefix(self):
+        """Test that nonces are the prefix followed by a counter"""
+        nonces = NonceGenerator(prefix="test.")
+
+        assert [nonces.next() for _ in range(3)] == ["test.1", "test.2", "test.3"]
+
+    def test_fixed_clock_gives_stable_prefix(self):
+        """Test that the prefix comes from the pid and the injected clock"""
+        nonces = NonceGenerator(clock=lambda: 1.5)
+
+        pid, micros, _, _ = nonces.prefix.split(".")
+        assert int(pid, 16) == os.getpid()
+        assert int(micros, 16) == 1_500_000
+
+    def test_generators_never_share_a_prefix(self):
+        """Test that two generators made at the same instant still differ"""
+        first = NonceGenerator(clock=lambda: 0.0)
+        second = NonceGenerator(clock=lambda: 0.0)
+
+        assert first.prefix != second.prefix
+        assert first.next() != second.next()
+
+    def test_unique_across_threads(self):
+        """Test that concurrent callers never get the same nonce"""
+        nonces = NonceGenerator()
+        seen = [[] for _ in range(8)]
+
+        def take(out):
+            for _ in range(2000):
+                out.append(nonces.next())
+
+        threads = [threading.Thread(target=take, args=(out,)) for out in seen]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        everything = [nonce for out in seen for nonce in out]
+        assert len(set(everything)) == len(everything) == 16000
 
 
 class TestSetActivityURLFeatures:
@@ -349,3 +400,71 @@ class TestSetActivityURLFeatures:
         assert activity["buttons"] == [
             {"label": "Website", "url": "https://example.com"}
         ]
+
+
+class TestActivityTemplate:
+    """Test precompiled SET_ACTIVITY templates"""
+
+    STATIC = dict(
+        name="My Game",
+        activity_type=ActivityType.COMPETING,
+        large_image="logo",
+        large_text="Logo",
+        buttons=[{"label": "Website", "url": "https://example.com"}],
+    )
+
+    def _expected(self, **dynamic):
+        return Payload.set_activity(**self.STATIC, **dynamic).data
+
+    def test_render_matches_set_activity(self):
+        """Test that a rendered payload equals the one set_activity builds"""
+        from pypresence.payloads import ActivityTemplate
+
+        template = ActivityTemplate(**self.STATIC)
+        dynamic = dict(state="In a match", details="Round 3", start=100.7, end=200)
+
+        rendered = template.render(**dynamic)
+        expected = self._expected(**dynamic)
+        expected["nonce"] = rendered.nonce
+
+        assert json.loads(rendered.encode()) == expected
+        assert rendered.data == expected
+
+    def test_render_without_dynamic_fields(self):
+        """Test that omitted dynamic fields are left out like None values"""
+        from pypresence.payloads import ActivityTemplate
+
+        rendered = ActivityTemplate(**self.STATIC).render()
+        expected = self._expected()
+        expected["nonce"] = rendered.nonce
+
+        assert rendered.data == expected
+        assert "timestamps" not in rendered.data["args"]["activity"]
+
+    def test_render_escapes_strings(self):
+        """Test that dynamic strings are JSON-escaped"""
+        from pypresence.payloads import ActivityTemplate
+
+        state = 'Quote " and \\ backslash'
+        rendered = ActivityTemplate().render(state=state)
+
+        assert rendered.data["args"]["activity"]["state"] == state
+
+    def test_render_gives_each_payload_a_nonce(self):
+        """Test that the nonce is exposed without decoding the payload"""
+        from pypresence.payloads import ActivityTemplate, PreparedPayload
+
+        rendered = ActivityTemplate().render(state="A")
+
+        assert isinstance(rendered, PreparedPayload)
+        assert rendered._data is None
+        assert rendered.nonce == json.loads(rendered.encode())["nonce"]
+
+    def test_template_validates_static_fields_once(self):
+        """Test that bad static values fail when compiling the template"""
+        import pytest
+
+        from pypresence.payloads import ActivityTemplate
+
+        with pytest.raises(ValueError):
+            ActivityTemplate(activity_type=1)
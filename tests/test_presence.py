@@ -1,7 +1,9 @@
 """Test Presence class with mocked I/O"""
 
 import json
+import socket
 import struct
+import sys
 from unittest.mock import Mock, patch
 
 import pytest
@@ -374,3 +376,242 @@ class TestPresenceURLFeatures:
 @pytest.mark.skip(reason="async tests skipped after asyncio removal")
 class TestAioPresenceURLFeatures:
     pass
+
+
+class TestPresenceNonBlocking:
+    """Test Presence in non-blocking mode"""
+
+    def test_update_returns_pending_request(self, client_id):
+        """Test that update does not wait for the reply"""
+        from pypresence.baseclient import PendingRequest
+
+        presence = Presence(client_id, nonblocking=True)
+        presence.sock_writer = Mock()
+        presence.sock_reader = Mock()
+
+        request = presence.update(state="Testing")
+
+        assert isinstance(request, PendingRequest)
+        assert not request.done()
+        assert not presence.sock_reader.read.called
+
+
+class TestPresenceDuplicateUpdates:
+    """Test that identical updates skip the IPC round-trip"""
+
+    @patch("pypresence.baseclient.BaseClient.read_output")
+    def test_identical_update_is_skipped(self, mock_read_output, client_id):
+        """Test that repeating an update returns the cached reply"""
+        presence = Presence(client_id)
+        presence.sock_writer = Mock()
+        mock_read_output.return_value = {"evt": None, "data": {"state": "A"}}
+
+        first = presence.update(state="A", details="B")
+        second = presence.update(state="A", details="B")
+
+        assert second is first
+        assert presence.sock_writer.write.call_count == 1
+        assert presence.cache_hits == 1
+        assert presence.cache_misses == 1
+
+    @patch("pypresence.baseclient.BaseClient.read_output")
+    def test_changed_update_is_sent(self, mock_read_output, client_id):
+        """Test that a changed field triggers a new update"""
+        presence = Presence(client_id)
+        presence.sock_writer = Mock()
+        mock_read_output.return_value = {}
+
+        presence.update(state="A")
+        presence.update(state="B")
+
+        assert presence.sock_writer.write.call_count == 2
+        assert presence.cache_hits == 0
+        assert presence.cache_misses == 2
+
+    @patch("pypresence.baseclient.BaseClient.read_output")
+    def test_clear_resets_cache(self, mock_read_output, client_id):
+        """Test that an update after clear() is always sent"""
+        presence = Presence(client_id)
+        presence.sock_writer = Mock()
+        mock_read_output.return_value = {}
+
+        presence.update(state="A")
+        presence.clear()
+        presence.update(state="A")
+
+        assert presence.sock_writer.write.call_count == 3
+
+    @patch("pypresence.baseclient.BaseClient.read_output")
+    def test_failed_update_is_not_cached(self, mock_read_output, client_id):
+        """Test that an update rejected by Discord is retried"""
+        from pypresence.exceptions import ServerError
+
+        presence = Presence(client_id)
+        presence.sock_writer = Mock()
+        mock_read_output.side_effect = [ServerError("bad"), {}]
+
+        with pytest.raises(ServerError):
+            presence.update(state="A")
+        presence.update(state="A")
+
+        assert presence.sock_writer.write.call_count == 2
+
+    @patch("pypresence.baseclient.BaseClient.read_output")
+    def test_skip_duplicates_disabled(self, mock_read_output, client_id):
+        """Test that skip_duplicates=False always sends"""
+        presence = Presence(client_id, skip_duplicates=False)
+        presence.sock_writer = Mock()
+        mock_read_output.return_value = {}
+
+        presence.update(state="A")
+        presence.update(state="A")
+
+        assert presence.sock_writer.write.call_count == 2
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+class TestPresenceThreaded:
+    """Test Presence with a background I/O thread"""
+
+    @staticmethod
+    def _connect(presence):
+        """Connect over a socket pair, returning Discord's end"""
+        from pypresence.baseclient import _SocketReader, _SocketWriter
+
+        ours, discord = socket.socketpair()
+
+        def handshake():
+            presence.sock_reader = _SocketReader(ours)
+            presence.sock_writer = _SocketWriter(ours)
+
+        presence.handshake = handshake
+        presence.connect()
+        discord.settimeout(5)
+        return discord
+
+    @staticmethod
+    def _recv_frame(discord):
+        op, length = struct.unpack("<II", discord.recv(8, socket.MSG_WAITALL))
+        return op, json.loads(discord.recv(length, socket.MSG_WAITALL))
+
+    @staticmethod
+    def _send_frame(discord, payload):
+        body = json.dumps(payload).encode("utf-8")
+        discord.sendall(struct.pack("<II", 1, len(body)) + body)
+
+    def test_update_returns_future(self, client_id):
+        """Test that update returns at once and the future gets the reply"""
+        from concurrent.futures import Future
+
+        presence = Presence(client_id, threaded=True)
+        discord = self._connect(presence)
+        try:
+            future = presence.update(state="Testing")
+            assert isinstance(future, Future)
+
+            op, payload = self._recv_frame(discord)
+            assert payload["args"]["activity"]["state"] == "Testing"
+            assert not future.done()
+            reply = {"cmd": "SET_ACTIVITY", "evt": None, "nonce": payload["nonce"]}
+            self._send_frame(discord, reply)
+
+            assert future.result(timeout=5) == reply
+        finally:
+            presence._io.stop()
+            presence.sock_writer.close()
+            discord.close()
+
+    def test_server_error_fails_future(self, client_id):
+        """Test that an ERROR reply becomes the future's exception"""
+        from pypresence.exceptions import ServerError
+
+        presence = Presence(client_id, threaded=True)
+        discord = self._connect(presence)
+        try:
+            future = presence.update(state="Testing")
+            op, payload = self._recv_frame(discord)
+            error = {"evt": "ERROR", "data": {"message": "nope"}}
+            self._send_frame(discord, dict(error, nonce=payload["nonce"]))
+
+            with pytest.raises(ServerError):
+                future.result(timeout=5)
+        finally:
+            presence._io.stop()
+            presence.sock_writer.close()
+            discord.close()
+
+    def test_callbacks(self, client_id):
+        """Test that replies and events are delivered to the callbacks"""
+        import threading
+
+        responses = []
+        events = []
+        got_event = threading.Event()
+        presence = Presence(
+            client_id,
+            threaded=True,
+            response_callback=responses.append,
+            event_callback=lambda payload: (events.append(payload), got_event.set()),
+        )
+        discord = self._connect(presence)
+        try:
+            future = presence.update(state="Testing")
+            op, payload = self._recv_frame(discord)
+            self._send_frame(discord, {"evt": "READY", "nonce": None, "data": {}})
+            self._send_frame(discord, {"evt": None, "nonce": payload["nonce"]})
+
+            future.result(timeout=5)
+            assert got_event.wait(5)
+        finally:
+            presence._io.stop()
+            presence.sock_writer.close()
+            discord.close()
+
+        assert responses == [future]
+        assert events == [{"evt": "READY", "nonce": None, "data": {}}]
+
+    def test_queue_is_bounded(self, client_id):
+        """Test that submitting past queue_size raises QueueFull"""
+        from pypresence.exceptions import QueueFull
+
+        presence = Presence(client_id, threaded=True, queue_size=2)
+        presence.update(state="1")
+        presence.update(state="2")
+
+        with pytest.raises(QueueFull):
+            presence.update(state="3")
+
+    def test_pipe_closed_fails_futures(self, client_id):
+        """Test that losing the pipe fails pending and later requests"""
+        from pypresence.exceptions import PipeClosed
+
+        presence = Presence(client_id, threaded=True)
+        discord = self._connect(presence)
+        try:
+            future = presence.update(state="Testing")
+            self._recv_frame(discord)
+            discord.close()
+
+            with pytest.raises(PipeClosed):
+                future.result(timeout=5)
+            presence._io._thread.join(timeout=5)
+            with pytest.raises(PipeClosed):
+                presence.update(state="Again")
+        finally:
+            presence._io.stop()
+            presence.sock_writer.close()
+
+    def test_close_sends_queued_requests(self, client_id):
+        """Test that close() flushes the queue before hanging up"""
+        presence = Presence(client_id, threaded=True)
+        discord = self._connect(presence)
+        try:
+            presence.update(state="Last")
+            presence.close()
+
+            op, payload = self._recv_frame(discord)
+            assert payload["args"]["activity"]["state"] == "Last"
+            op, payload = self._recv_frame(discord)
+            assert op == 2
+        finally:
+            discord.close()
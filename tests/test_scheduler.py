@@ -0,0 +1,113 @@
+"""Test the coalescing update scheduler"""
+
+import time
+from unittest.mock import Mock
+
+from pypresence.scheduler import UpdateScheduler
+
+
+class TestUpdateScheduler:
+    """Test UpdateScheduler with a caller-driven tick()"""
+
+    def test_latest_update_wins(self, clock):
+        """Test that only the newest pending update is sent"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence, clock=clock)
+
+        scheduler.update(state="A")
+        scheduler.update(state="B")
+        scheduler.update(state="C")
+
+        assert scheduler.tick() is True
+        presence.update.assert_called_once_with(state="C")
+        assert scheduler.merged == 2
+        assert scheduler.sent == 1
+        assert not scheduler.pending
+
+    def test_tick_without_pending_update(self, clock):
+        """Test that tick() does nothing when nothing is queued"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence, clock=clock)
+
+        assert scheduler.tick() is False
+        assert not presence.update.called
+
+    def test_rate_limit_holds_updates_back(self, clock):
+        """Test that the bucket allows `rate` sends per `per` seconds"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence, rate=5, per=20.0, clock=clock)
+
+        for i in range(5):
+            scheduler.update(state=str(i))
+            assert scheduler.tick() is True
+
+        scheduler.update(state="late")
+        assert scheduler.tick() is False
+        assert scheduler.pending
+
+        clock.now = 3.9
+        assert scheduler.tick() is False
+        clock.now = 4.0
+        assert scheduler.tick() is True
+        presence.update.assert_called_with(state="late")
+        assert scheduler.sent == 6
+
+    def test_clear_replaces_pending_update(self, clock):
+        """Test that clear() is coalesced like an update"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence, clock=clock)
+
+        scheduler.update(state="A")
+        scheduler.clear(pid=123)
+        scheduler.tick()
+
+        presence.clear.assert_called_once_with(123)
+        assert not presence.update.called
+        assert scheduler.merged == 1
+
+    def test_stop_with_flush_ignores_rate_limit(self, clock):
+        """Test that stop(flush=True) sends the pending update"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence, rate=1, clock=clock)
+        scheduler.update(state="A")
+        scheduler.tick()
+        scheduler.update(state="B")
+
+        scheduler.stop(flush=True)
+
+        presence.update.assert_called_with(state="B")
+
+
+class TestUpdateSchedulerThread:
+    """Test UpdateScheduler with its background thread"""
+
+    def test_background_thread_sends_updates(self):
+        """Test that the background thread flushes a submitted update"""
+        presence = Mock()
+        scheduler = UpdateScheduler(presence)
+        scheduler.start()
+        try:
+            scheduler.update(state="A")
+            deadline = time.monotonic() + 2
+            while not presence.update.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+
+        presence.update.assert_called_once_with(state="A")
+
+    def test_background_errors_are_kept(self):
+        """Test that an exception in the thread is stored, not raised"""
+        presence = Mock()
+        presence.update.side_effect = RuntimeError("boom")
+        scheduler = UpdateScheduler(presence)
+        scheduler.start()
+        try:
+            scheduler.update(state="A")
+            deadline = time.monotonic() + 2
+            while scheduler.last_error is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+
+        assert isinstance(scheduler.last_error, RuntimeError)
@@ -0,0 +1,231 @@
+"""Test tracing hooks, the stats registry and the OpenMetrics exporter"""
+
+import json
+import socket
+import struct
+from unittest.mock import Mock
+
+import pytest
+
+from pypresence.baseclient import BaseClient, _SocketReader, _SocketWriter
+from pypresence.client import Client
+from pypresence.exceptions import PipeClosed, ResponseTimeout, ServerError
+from pypresence.payloads import Payload
+from pypresence.stats import Counter, Histogram, StatsRegistry, StatsTracer
+from pypresence.tracing import Tracer
+
+
+class RecordingTracer(Tracer):
+    """Tracer that keeps every hook call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def on_send(self, trace):
+        self.calls.append(("send", trace))
+
+    def on_frame(self, trace):
+        self.calls.append(("frame", trace))
+
+    def on_response(self, trace):
+        self.calls.append(("response", trace))
+
+    def on_error(self, trace):
+        self.calls.append(("error", trace))
+
+    def hooks(self):
+        return [hook for hook, trace in self.calls]
+
+    def traces(self, hook):
+        return [trace for name, trace in self.calls if name == hook]
+
+
+def frame(payload, op=1):
+    body = json.dumps(payload).encode("utf-8")
+    return struct.pack("<II", op, len(body)) + body
+
+
+@pytest.fixture
+def pipe():
+    left, right = socket.socketpair()
+    with left, right:
+        yield left, right
+
+
+def connect(client, sock):
+    client.sock_reader = _SocketReader(sock)
+    client.sock_writer = _SocketWriter(sock)
+
+
+class TestTracingHooks:
+    """Test which hooks fire and what they carry"""
+
+    def test_request_round_trip(self, client_id, pipe):
+        """Test on_send, on_frame and on_response for one command"""
+        tracer = RecordingTracer()
+        client = BaseClient(client_id, tracer=tracer)
+        connect(client, pipe[0])
+        payload = Payload.get_guild("1")
+        reply = frame({"cmd": "GET_GUILD", "evt": None, "nonce": payload.nonce})
+        pipe[1].sendall(reply)
+
+        client.send_request(1, payload).result()
+
+        assert tracer.hooks() == ["send", "frame", "response"]
+        sent = tracer.traces("send")[0]
+        assert (sent.op, sent.cmd, sent.nonce) == (1, "GET_GUILD", payload.nonce)
+        assert sent.size == 8 + len(payload.encode())
+        assert sent.encode_time >= 0 and sent.write_time >= 0
+        read = tracer.traces("frame")[0]
+        assert read.size == len(reply)
+        assert read.decode_time >= 0
+        response = tracer.traces("response")[0]
+        assert response.cmd == "GET_GUILD"
+        assert response.latency >= 0
+
+    def test_error_reply(self, client_id, pipe):
+        """Test that ERROR replies reach on_error as ServerError"""
+        tracer = RecordingTracer()
+        client = BaseClient(client_id, tracer=tracer)
+        connect(client, pipe[0])
+        error = {"code": 4000, "message": "Bad guild"}
+        pipe[1].sendall(
+            frame({"cmd": "GET_GUILD", "evt": "ERROR", "nonce": "1", "data": error})
+        )
+
+        with pytest.raises(ServerError):
+            client.send_request(1, {"cmd": "GET_GUILD", "nonce": "1"}).result()
+
+        error = tracer.traces("error")[0]
+        assert isinstance(error.error, ServerError)
+        assert error.cmd == "GET_GUILD"
+
+    def test_timeout(self, client_id, pipe):
+        """Test that expired requests reach on_error as ResponseTimeout"""
+        tracer = RecordingTracer()
+        client = BaseClient(client_id, tracer=tracer)
+        connect(client, pipe[0])
+
+        with pytest.raises(ResponseTimeout):
+            client._command({"cmd": "GET_GUILD", "nonce": "1"}, timeout=0.01)
+
+        error = tracer.traces("error")[0]
+        assert isinstance(error.error, ResponseTimeout)
+        assert (error.cmd, error.nonce) == ("GET_GUILD", "1")
+        assert error.latency >= 0.01
+
+    def test_pipe_closed(self, client_id, pipe):
+        """Test that a closed pipe reaches on_error"""
+        tracer = RecordingTracer()
+        client = BaseClient(client_id, tracer=tracer)
+        connect(client, pipe[0])
+        pipe[1].close()
+
+        with pytest.raises(PipeClosed):
+            client.read_output()
+        assert isinstance(tracer.traces("error")[0].error, PipeClosed)
+
+    def test_batch(self, client_id, pipe):
+        """Test that every frame of a batch is traced"""
+        tracer = RecordingTracer()
+        client = BaseClient(client_id, tracer=tracer)
+        connect(client, pipe[0])
+
+        client.send_batch([{"cmd": "GET_GUILD", "nonce": str(i)} for i in range(3)])
+
+        sent = tracer.traces("send")
+        assert [trace.nonce for trace in sent] == ["0", "1", "2"]
+        assert len({trace.write_time for trace in sent}) == 1
+
+    def test_on_event_frames(self, client_id):
+        """Test that frames fed to Client.on_event are traced"""
+        tracer = RecordingTracer()
+        client = Client(client_id, tracer=tracer)
+        data = frame({"cmd": "DISPATCH", "evt": "ACTIVITY_JOIN", "data": {}})
+
+        client.on_event(data)
+
+        read = tracer.traces("frame")[0]
+        assert (read.evt, read.size) == ("ACTIVITY_JOIN", len(data))
+
+    def test_no_tracer(self, client_id):
+        """Test that untraced clients don't time or record requests"""
+        client = BaseClient(client_id)
+        client.sock_writer = Mock()
+
+        request = client.send_request(1, {"cmd": "TEST", "nonce": "1"})
+
+        assert client.tracer is None
+        assert request.sent_at is None and request.cmd is None
+
+
+class TestStatsRegistry:
+    """Test counters, histograms and the exporter"""
+
+    def test_counter(self):
+        """Test counting per label set"""
+        counter = Counter("frames", "Frames.", ("op",))
+        counter.inc(1, ("1",))
+        counter.inc(2, ("1",))
+        counter.inc(1, ("3",))
+
+        assert counter.get(("1",)) == 3
+        assert counter.get(("3",)) == 1
+        assert counter.get(("9",)) == 0
+
+    def test_histogram_buckets(self):
+        """Test that observations land in the first bucket they fit"""
+        histogram = Histogram("latency", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.values[()][0] == [2, 1, 1]
+        assert histogram.count() == 4
+        assert histogram.sum() == pytest.approx(2.65)
+
+    def test_registry_reuses_metrics(self):
+        """Test that registering a name twice returns the same metric"""
+        registry = StatsRegistry()
+        assert registry.counter("a", "A.") is registry.counter("a", "A.")
+        with pytest.raises(ValueError):
+            registry.histogram("a", "A.")
+
+    def test_openmetrics(self):
+        """Test the exported text format"""
+        registry = StatsRegistry()
+        registry.counter("pp_frames", "Frames.", ("op",)).inc(2, ("1",))
+        histogram = registry.histogram(
+            "pp_latency_seconds", 'Line\n"quoted"', ("cmd",), (0.1, 1.0)
+        )
+        histogram.observe(0.05, ("SET_ACTIVITY",))
+        histogram.observe(0.5, ("SET_ACTIVITY",))
+
+        assert registry.to_openmetrics() == (
+            "# TYPE pp_frames counter\n"
+            "# HELP pp_frames Frames.\n"
+            'pp_frames_total{op="1"} 2\n'
+            "# TYPE pp_latency_seconds histogram\n"
+            '# HELP pp_latency_seconds Line\\n\\"quoted\\"\n'
+            'pp_latency_seconds_bucket{cmd="SET_ACTIVITY",le="0.1"} 1\n'
+            'pp_latency_seconds_bucket{cmd="SET_ACTIVITY",le="1.0"} 2\n'
+            'pp_latency_seconds_bucket{cmd="SET_ACTIVITY",le="+Inf"} 2\n'
+            'pp_latency_seconds_count{cmd="SET_ACTIVITY"} 2\n'
+            'pp_latency_seconds_sum{cmd="SET_ACTIVITY"} 0.55\n'
+            "# EOF\n"
+        )
+
+    def test_stats_tracer(self, client_id, pipe):
+        """Test that StatsTracer counts a traced round trip"""
+        stats = StatsTracer()
+        client = BaseClient(client_id, tracer=stats)
+        connect(client, pipe[0])
+        pipe[1].sendall(frame({"cmd": "GET_GUILD", "evt": None, "nonce": "1"}))
+
+        client.send_request(1, {"cmd": "GET_GUILD", "nonce": "1"}).result()
+
+        assert stats.frames_sent.get(("1",)) == 1
+        assert stats.frames_received.get(("1",)) == 1
+        assert stats.response_latency.count(("GET_GUILD",)) == 1
+        text = stats.registry.to_openmetrics()
+        assert 'pypresence_response_latency_seconds_count{cmd="GET_GUILD"} 1' in text
+        assert text.endswith("# EOF\n")
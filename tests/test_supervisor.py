@@ -0,0 +1,296 @@
+"""Test the reconnect supervisor"""
+
+import os
+import socket
+import sys
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from pypresence.client import Client
+from pypresence.exceptions import DiscordNotFound, InvalidID, PipeClosed
+from pypresence.presence import Presence
+from pypresence.supervisor import ReconnectSupervisor
+from pypresence.utils import invalidate_ipc_path_cache
+
+
+class MaxJitter:
+    """Always picks the longest delay of the jitter range"""
+
+    def random(self):
+        return 1.0
+
+
+def _presence(connected=True):
+    presence = Mock()
+    presence.sock_writer = Mock() if connected else None
+    presence._last_args = None
+    presence._event_args = {}
+    presence.connection_timeout = 30
+    return presence
+
+
+class TestReconnectSupervisor:
+    """Test ReconnectSupervisor with a caller-driven tick()"""
+
+    def test_update_passes_through(self, clock):
+        """Test that calls go straight to a connected client"""
+        presence = _presence()
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        assert supervisor.update(state="A") is presence.update.return_value
+        presence.update.assert_called_once_with(state="A")
+        assert supervisor.connected
+
+    def test_pipe_closed_marks_disconnected(self, clock):
+        """Test that PipeClosed is swallowed and the pipe is closed"""
+        presence = _presence()
+        writer = presence.sock_writer
+        presence.update.side_effect = PipeClosed
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        assert supervisor.update(state="A") is None
+        assert not supervisor.connected
+        assert supervisor.stats.disconnects == 1
+        writer.close.assert_called_once()
+
+    def test_calls_skipped_while_disconnected(self, clock):
+        """Test that nothing is sent to a client that is down"""
+        presence = _presence(connected=False)
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        assert supervisor.call(presence.poll) is None
+        assert supervisor.update(state="A") is None
+        assert not presence.poll.called
+        assert not presence.update.called
+
+    def test_backoff_between_attempts(self, clock):
+        """Test that failed attempts are spaced by a growing delay"""
+        presence = _presence(connected=False)
+        presence.connect.side_effect = DiscordNotFound
+        supervisor = ReconnectSupervisor(
+            presence, min_delay=1.0, max_delay=4.0, clock=clock, rng=MaxJitter()
+        )
+
+        attempts = []
+        for step in range(80):
+            clock.now = step / 4
+            if presence.connect.call_count != len(attempts):
+                attempts.append(clock.now)
+            supervisor.tick()
+
+        assert attempts[:5] == [0.25, 1.25, 3.25, 7.25, 11.25]
+        assert supervisor.stats.failed_attempts == presence.connect.call_count
+        assert isinstance(supervisor.last_error, DiscordNotFound)
+
+    def test_jitter_stays_within_range(self, clock):
+        """Test that each delay is between half and all of the backoff"""
+        presence = _presence(connected=False)
+        presence.connect.side_effect = DiscordNotFound
+        supervisor = ReconnectSupervisor(presence, min_delay=2.0, clock=clock)
+
+        supervisor.tick()
+        assert 1.0 <= supervisor._next_attempt <= 2.0
+
+    def test_replays_last_activity(self, clock):
+        """Test that the activity Discord had is sent again on reconnect"""
+        presence = _presence()
+        presence._last_args = {"pid": 1, "activity": {"state": "A"}}
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        supervisor.disconnected()
+        assert supervisor.tick() is True
+
+        presence.connect.assert_called_once()
+        payload = presence.update.call_args.kwargs["payload_override"]
+        assert payload["cmd"] == "SET_ACTIVITY"
+        assert payload["args"] == {"pid": 1, "activity": {"state": "A"}}
+        assert supervisor.connected
+
+    def test_update_while_down_replaces_replay(self, clock):
+        """Test that the newest update is the one restored"""
+        presence = _presence()
+        presence._last_args = {"pid": 1, "activity": {"state": "A"}}
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        supervisor.disconnected()
+        supervisor.update(state="B")
+        supervisor.tick()
+
+        presence.update.assert_called_once_with(state="B")
+
+    def test_clear_while_down_is_replayed(self, clock):
+        """Test that clearing while down clears after reconnecting"""
+        presence = _presence()
+        presence._last_args = {"pid": 1, "activity": {"state": "A"}}
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        supervisor.disconnected()
+        supervisor.clear(pid=5)
+        supervisor.tick()
+
+        presence.clear.assert_called_once_with(pid=5)
+        assert not presence.update.called
+
+    def test_resubscribes_registered_events(self, client_id, clock):
+        """Test that Client.register_event subscriptions are restored"""
+        client = Client(client_id)
+        client._command = Mock()
+        client.sock_writer = Mock()
+        client.register_event("ACTIVITY_JOIN", lambda data: None)
+        client.register_event("VOICE_STATE_CREATE", lambda data: None, {"id": "1"})
+        client.unregister_event("ACTIVITY_JOIN")
+        client.start = Mock()
+        client.subscribe = Mock()
+        supervisor = ReconnectSupervisor(client, clock=clock)
+
+        supervisor.disconnected()
+        assert supervisor.tick() is True
+
+        client.start.assert_called_once()
+        client.subscribe.assert_called_once_with("voice_state_create", {"id": "1"})
+
+    def test_downtime_stats(self, clock):
+        """Test that downtime is measured from disconnect to reconnect"""
+        presence = _presence()
+        presence.connect.side_effect = [DiscordNotFound, None]
+        supervisor = ReconnectSupervisor(
+            presence, min_delay=1.0, clock=clock, rng=MaxJitter()
+        )
+
+        clock.now = 10.0
+        supervisor.disconnected()
+        supervisor.tick()
+        clock.now = 11.5
+        assert supervisor.tick() is True
+
+        assert supervisor.stats.reconnects == 1
+        assert supervisor.stats.failed_attempts == 1
+        assert supervisor.stats.last_downtime == 1.5
+        assert supervisor.stats.downtime == 1.5
+
+    def test_first_connect_is_not_a_reconnect(self, clock):
+        """Test that connecting a fresh client isn't counted as a reconnect"""
+        presence = _presence(connected=False)
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        assert supervisor.tick() is True
+        assert supervisor.stats.reconnects == 0
+        assert supervisor.stats.downtime == 0.0
+
+    def test_update_during_replay_is_sent(self, clock):
+        """Test that an update racing the end of a reconnect isn't lost"""
+        presence = _presence()
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+        supervisor.disconnected()
+        supervisor.update(state="old")
+        reconnect = supervisor._reconnect
+
+        def racing_reconnect():
+            # Another thread updates as soon as the replay has been sent
+            reconnect()
+            racer = threading.Thread(target=supervisor.update, kwargs={"state": "new"})
+            racer.start()
+            racer.join(5)
+
+        supervisor._reconnect = racing_reconnect
+
+        assert supervisor.tick() is True
+        assert [c.kwargs for c in presence.update.call_args_list] == [
+            {"state": "old"},
+            {"state": "new"},
+        ]
+        assert supervisor._replay is None
+        assert supervisor._reconnecting is False
+
+    def test_invalid_id_is_raised(self, clock):
+        """Test that errors a retry can't fix are not swallowed"""
+        presence = _presence(connected=False)
+        presence.connect.side_effect = InvalidID
+        supervisor = ReconnectSupervisor(presence, clock=clock)
+
+        with pytest.raises(InvalidID):
+            supervisor.tick()
+
+
+class TestReconnectSupervisorThread:
+    """Test ReconnectSupervisor reconnecting in the background"""
+
+    def test_thread_reconnects(self):
+        """Test that the background thread restores the connection"""
+        presence = _presence()
+        supervisor = ReconnectSupervisor(presence, min_delay=0.01)
+        supervisor.start()
+        try:
+            supervisor.disconnected()
+            for _ in range(200):
+                if supervisor.connected:
+                    break
+                time.sleep(0.005)
+        finally:
+            supervisor.stop()
+
+        assert supervisor.connected
+        assert supervisor.stats.reconnects == 1
+
+    def test_thread_stops_on_fatal_error(self):
+        """Test that the thread gives up on errors a retry can't fix"""
+        presence = _presence(connected=False)
+        presence.connect.side_effect = InvalidID
+        supervisor = ReconnectSupervisor(presence)
+        supervisor.start()
+        supervisor._thread.join(timeout=2)
+
+        assert isinstance(supervisor.last_error, InvalidID)
+        supervisor.stop()
+
+    def test_update_during_stalled_reconnect(self):
+        """Test that update() doesn't wait for a handshake in progress"""
+        presence = _presence()
+        release = threading.Event()
+        presence.connect.side_effect = lambda: release.wait(5)
+        supervisor = ReconnectSupervisor(presence, min_delay=0.01)
+        supervisor.start()
+        try:
+            supervisor.disconnected()
+            while not presence.connect.called:
+                time.sleep(0.001)
+
+            start = time.monotonic()
+            assert supervisor.update(state="B") is None
+            assert time.monotonic() - start < 0.1
+        finally:
+            release.set()
+            for _ in range(200):
+                if supervisor.connected:
+                    break
+                time.sleep(0.005)
+            supervisor.stop()
+
+        assert supervisor.connected
+        presence.update.assert_called_once_with(state="B")
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="Uses a UNIX socket")
+    def test_handshake_timeout(self, client_id, tmp_path, monkeypatch):
+        """Test that a Discord that never answers is given up on quickly"""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(os.path.join(str(tmp_path), "discord-ipc-0"))
+        listener.listen(1)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        invalidate_ipc_path_cache()
+        presence = Presence(client_id, connection_timeout=30)
+        supervisor = ReconnectSupervisor(presence, handshake_timeout=0.1)
+        try:
+            start = time.monotonic()
+            assert not supervisor.tick()
+            assert time.monotonic() - start < 2
+        finally:
+            if presence.sock_writer is not None:
+                presence.sock_writer.close()
+            listener.close()
+            invalidate_ipc_path_cache()
+
+        assert isinstance(supervisor.last_error, OSError)
+        assert presence.connection_timeout == 30
@@ -1,6 +1,9 @@
 """Test utility functions"""
 
+import socket
 import sys
+from collections import OrderedDict
+from unittest.mock import Mock
 
 import pytest
 
@@ -117,3 +120,308 @@ class TestIPCPath:
             path = get_ipc_path(pipe)
             # Will be None if Discord is not running on that pipe
             assert path is None or "discord-ipc-" in str(path)
+
+
+class TestRemoveNoneNesting:
+    """Test remove_none on lists and deep nesting"""
+
+    def test_cleans_dicts_inside_lists(self):
+        """Test that dicts inside lists are cleaned but kept in the list"""
+        d = {"buttons": [{"label": "A", "url": None}, {"label": None}], "x": None}
+        result = remove_none(d)
+
+        assert result == {"buttons": [{"label": "A"}, {}]}
+
+    def test_removes_dicts_emptied_several_levels_deep(self):
+        """Test that emptiness propagates up through nested dicts"""
+        d = {"keep": 1, "a": {"b": {"c": {"d": None}}, "e": {}}}
+        result = remove_none(d)
+
+        assert result == {"keep": 1}
+
+    def test_no_recursion_limit(self):
+        """Test that very deep dicts don't hit the recursion limit"""
+        d = current = {}
+        for _ in range(sys.getrecursionlimit() * 2):
+            current["next"] = current = {"value": None}
+
+        assert remove_none(d) == {}
+
+    def test_cleans_dict_subclasses(self):
+        """Test that nested dict subclasses are walked like plain dicts"""
+        d = {"cmd": "TEST", "args": OrderedDict(a=None, b=OrderedDict(c=None))}
+
+        assert remove_none(d) == {"cmd": "TEST"}
+
+    def test_modifies_in_place(self):
+        """Test that the same dict objects are returned, not copies"""
+        inner = {"a": 1, "b": None}
+        d = {"inner": inner}
+        result = remove_none(d)
+
+        assert result is d
+        assert result["inner"] is inner
+
+
+class TestPruned:
+    """Test building dicts without None values"""
+
+    def test_pruned_drops_none_and_empty_dicts(self):
+        """Test that None values and empty dicts are never stored"""
+        from pypresence.utils import pruned
+
+        result = pruned(a=1, b=None, c={}, d=[], e=0, f=pruned(g=None))
+
+        assert result == {"a": 1, "d": [], "e": 0}
+
+
+class TestCopyJson:
+    """Test copying nested dicts and lists"""
+
+    def test_copy_shares_no_containers(self):
+        """Test that changing the original's lists and dicts leaves the copy alone"""
+        from pypresence.utils import copy_json
+
+        original = {"party": {"size": [1, 4]}, "buttons": [{"label": "A"}]}
+        copy = copy_json(original)
+        original["party"]["size"][0] = 2
+        original["buttons"][0]["label"] = "B"
+
+        assert copy == {"party": {"size": [1, 4]}, "buttons": [{"label": "A"}]}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+class TestIPCPathCache:
+    """Test caching of the discovered IPC path"""
+
+    @pytest.fixture(autouse=True)
+    def clean_cache(self):
+        from pypresence.utils import invalidate_ipc_path_cache
+
+        invalidate_ipc_path_cache()
+        yield
+        invalidate_ipc_path_cache()
+
+    @staticmethod
+    def _listen(path):
+        import socket
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(path))
+        server.listen()
+        return server
+
+    def test_cached_path_skips_scan(self, tmp_path, monkeypatch):
+        """Test that a still-valid cached path is returned without scanning"""
+        from pypresence import utils
+
+        path = tmp_path / "discord-ipc-0"
+        with self._listen(path):
+            scan = Mock(return_value=str(path))
+            monkeypatch.setattr(utils, "_scan_ipc_path", scan)
+
+            assert utils.get_ipc_path(0) == str(path)
+            assert utils.get_ipc_path(0) == str(path)
+            assert scan.call_count == 1
+
+    def test_recreated_socket_invalidates_cache(self, tmp_path, monkeypatch):
+        """Test that a new socket file at the same path forces a rescan"""
+        import os
+
+        from pypresence import utils
+
+        path = tmp_path / "discord-ipc-0"
+        scan = Mock(return_value=str(path))
+        monkeypatch.setattr(utils, "_scan_ipc_path", scan)
+
+        with self._listen(path):
+            utils.get_ipc_path(0)
+        os.unlink(path)
+        with self._listen(path):
+            # Force a different inode even if the filesystem reuses it
+            utils._ipc_path_cache[0] = (str(path), (0, 0, 0))
+            utils.get_ipc_path(0)
+
+        assert scan.call_count == 2
+
+    def test_missing_socket_invalidates_cache(self, tmp_path, monkeypatch):
+        """Test that a cached path whose socket is gone is rescanned"""
+        from pypresence import utils
+
+        path = tmp_path / "discord-ipc-0"
+        with self._listen(path):
+            monkeypatch.setattr(utils, "_scan_ipc_path", Mock(return_value=str(path)))
+            utils.get_ipc_path(0)
+        path.unlink()
+        monkeypatch.setattr(utils, "_scan_ipc_path", Mock(return_value=None))
+
+        assert utils.get_ipc_path(0) is None
+        assert 0 not in utils._ipc_path_cache
+
+    def test_warm_cache_always_scans(self, tmp_path, monkeypatch):
+        """Test that warming rescans and fills the cache"""
+        from pypresence import utils
+
+        path = tmp_path / "discord-ipc-0"
+        with self._listen(path):
+            scan = Mock(return_value=str(path))
+            monkeypatch.setattr(utils, "_scan_ipc_path", scan)
+
+            assert utils.warm_ipc_path_cache(0) == str(path)
+            assert utils.warm_ipc_path_cache(0) == str(path)
+            assert scan.call_count == 2
+            assert utils._ipc_path_cache[0][0] == str(path)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+class TestIPCProbe:
+    """Test probing every candidate IPC socket at once"""
+
+    @staticmethod
+    def _listen(path):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(path))
+        server.listen()
+        return server
+
+    @pytest.fixture
+    def runtime_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        return tmp_path
+
+    def test_stale_socket_is_not_healthy(self, runtime_dir):
+        """Test that a socket file with no listener fails the test"""
+        from pypresence.utils import test_ipc_path
+
+        path = runtime_dir / "discord-ipc-0"
+        self._listen(path).close()
+
+        assert test_ipc_path(str(path)) is False
+
+    def test_probe_skips_stale_sockets(self, runtime_dir):
+        """Test that only sockets with a listener are returned"""
+        from pypresence.utils import probe_ipc_paths
+
+        self._listen(runtime_dir / "discord-ipc-0").close()
+        with self._listen(runtime_dir / "discord-ipc-1"):
+            assert probe_ipc_paths() == [str(runtime_dir / "discord-ipc-1")]
+
+    def test_probe_ranks_in_candidate_order(self, runtime_dir):
+        """Test that results follow directory and pipe number priority"""
+        from pypresence.utils import probe_ipc_paths
+
+        (runtime_dir / "snap.discord").mkdir()
+        snap = runtime_dir / "snap.discord" / "discord-ipc-0"
+        with self._listen(snap), self._listen(
+            runtime_dir / "discord-ipc-2"
+        ), self._listen(runtime_dir / "discord-ipc-1"):
+            assert probe_ipc_paths() == [
+                str(runtime_dir / "discord-ipc-1"),
+                str(runtime_dir / "discord-ipc-2"),
+                str(snap),
+            ]
+
+    def test_probe_filters_by_pipe(self, runtime_dir):
+        """Test that a pipe number limits the candidates"""
+        from pypresence.utils import probe_ipc_paths
+
+        with self._listen(runtime_dir / "discord-ipc-0"), self._listen(
+            runtime_dir / "discord-ipc-1"
+        ):
+            assert probe_ipc_paths(1) == [str(runtime_dir / "discord-ipc-1")]
+
+    def test_probe_with_no_candidates(self, runtime_dir):
+        """Test that an empty runtime dir gives no paths"""
+        from pypresence.utils import probe_ipc_paths
+
+        assert probe_ipc_paths() == []
+
+    def test_parallel_get_ipc_path(self, runtime_dir):
+        """Test that parallel discovery returns the best healthy path"""
+        from pypresence.utils import get_ipc_path
+
+        self._listen(runtime_dir / "discord-ipc-0").close()
+        with self._listen(runtime_dir / "discord-ipc-3"):
+            path = get_ipc_path(use_cache=False, parallel=True)
+
+        assert path == str(runtime_dir / "discord-ipc-3")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix-specific test")
+class TestIPCSocket:
+    """Test discovery handing back its connection"""
+
+    @pytest.fixture(autouse=True)
+    def runtime_dir(self, tmp_path, monkeypatch):
+        from pypresence.utils import invalidate_ipc_path_cache
+
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        invalidate_ipc_path_cache()
+        yield tmp_path
+        invalidate_ipc_path_cache()
+
+    @staticmethod
+    def _listen(path):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(path))
+        server.listen()
+        server.setblocking(False)
+        return server
+
+    @staticmethod
+    def _accepted(server):
+        count = 0
+        while True:
+            try:
+                conn, _ = server.accept()
+            except BlockingIOError:
+                return count
+            conn.close()
+            count += 1
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_connects_once(self, runtime_dir, parallel):
+        """Test that discovery plus handshake costs a single connection"""
+        from pypresence.utils import get_ipc_socket
+
+        path = runtime_dir / "discord-ipc-0"
+        with self._listen(path) as server:
+            found, sock = get_ipc_socket(parallel=parallel)
+            with sock:
+                assert found == str(path)
+                assert sock.getblocking()
+                assert self._accepted(server) == 1
+
+    def test_cached_path_connects_once(self, runtime_dir):
+        """Test that a cached path is connected to without rescanning"""
+        from pypresence.utils import get_ipc_path, get_ipc_socket
+
+        path = runtime_dir / "discord-ipc-0"
+        with self._listen(path) as server:
+            get_ipc_path()
+            self._accepted(server)
+            found, sock = get_ipc_socket()
+            with sock:
+                assert found == str(path)
+                assert self._accepted(server) == 1
+
+    def test_parallel_closes_other_sockets(self, runtime_dir):
+        """Test that only the chosen probe connection stays open"""
+        from pypresence.utils import get_ipc_socket
+
+        with self._listen(runtime_dir / "discord-ipc-0"), self._listen(
+            runtime_dir / "discord-ipc-1"
+        ) as other:
+            found, sock = get_ipc_socket(parallel=True)
+            with sock:
+                assert found == str(runtime_dir / "discord-ipc-0")
+                conn, _ = other.accept()
+                with conn:
+                    conn.setblocking(True)
+                    assert conn.recv(1) == b""
+
+    def test_not_found(self):
+        """Test that nothing is returned without a listener"""
+        from pypresence.utils import get_ipc_socket
+
+        assert get_ipc_socket() == (None, None)